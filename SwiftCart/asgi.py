@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SwiftCart.settings')
 
 application = get_asgi_application()
+
+# Each server worker imports this module, build its typeahead index before taking requests
+from products.suggest import suggestion_index  # noqa: E402
+
+suggestion_index.warm()
@@ -200,6 +200,17 @@ CORS_ALLOW_CREDENTIALS = True
 
 # Paystack Settings
 PAYSTACK_SECRET_KEY = config('PAYSTACK_SECRET_KEY', default='')
+# Point at a local stub (python manage.py paystack_stub) for offline testing
+PAYSTACK_BASE_URL = config('PAYSTACK_BASE_URL', default='https://api.paystack.co').rstrip('/')
+PAYSTACK_CONNECT_TIMEOUT = config('PAYSTACK_CONNECT_TIMEOUT', default=3.05, cast=float)
+PAYSTACK_READ_TIMEOUT = config('PAYSTACK_READ_TIMEOUT', default=10, cast=float)
+PAYSTACK_POOL_SIZE = config('PAYSTACK_POOL_SIZE', default=20, cast=int)
+# Verification is idempotent, so transient failures are retried with jittered backoff
+PAYSTACK_VERIFY_RETRIES = config('PAYSTACK_VERIFY_RETRIES', default=2, cast=int)
+PAYSTACK_RETRY_BACKOFF = config('PAYSTACK_RETRY_BACKOFF', default=0.5, cast=float)
+# Fail fast for PAYSTACK_BREAKER_RESET_TIMEOUT seconds after this many consecutive failures
+PAYSTACK_BREAKER_THRESHOLD = config('PAYSTACK_BREAKER_THRESHOLD', default=5, cast=int)
+PAYSTACK_BREAKER_RESET_TIMEOUT = config('PAYSTACK_BREAKER_RESET_TIMEOUT', default=30, cast=float)
 
 # SendGrid Settings
 SENDGRID_API_KEY = config('SENDGRID_API_KEY', default='')
@@ -313,10 +324,64 @@ CACHES = {
     }
 }
 
-# Use in-memory cache for tests
-if "test" in sys.argv:
+# Per-process L1 cache in front of Redis for product detail responses (0 disables it)
+PRODUCT_CACHE_LOCAL_ENTRIES = config('PRODUCT_CACHE_LOCAL_ENTRIES', default=1024, cast=int)
+PRODUCT_CACHE_LOCAL_TIMEOUT = config('PRODUCT_CACHE_LOCAL_TIMEOUT', default=30, cast=int)
+
+# Cache the rendered (and gzipped) JSON body of product responses instead of the serializer data
+PRODUCT_CACHE_RENDERED = config('PRODUCT_CACHE_RENDERED', default=True, cast=bool)
+
+# Effective product prices are cached this long, or until the flash sale ends if sooner
+PRICE_CACHE_TIMEOUT = config('PRICE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Paginated COUNT(*) results are cached per filter for this many seconds
+COUNT_CACHE_TIMEOUT = config('COUNT_CACHE_TIMEOUT', default=60, cast=int)
+# On PostgreSQL, counts estimated above this many rows use the planner estimate (0 disables it)
+COUNT_ESTIMATE_THRESHOLD = config('COUNT_ESTIMATE_THRESHOLD', default=10000, cast=int)
+
+# Celery (background tasks such as payment verification)
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
+CELERY_ACCEPT_CONTENT = [config('CELERY_ACCEPT_CONTENT', default='json')]
+CELERY_TASK_SERIALIZER = config('CELERY_TASK_SERIALIZER', default='json')
+CELERY_TIMEZONE = config('CELERY_TIMEZONE', default='UTC')
+# Run tasks inline instead of through the broker (local development without a worker)
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
+
+# Expired, unpaid orders give their reserved stock back on this schedule
+CELERY_BEAT_SCHEDULE = {
+    'release-expired-reservations': {
+        'task': 'orders.tasks.release_expired_reservations_task',
+        'schedule': config('ORDER_RESERVATION_SWEEP_INTERVAL', default=60, cast=int),
+    },
+    'flush-redis-carts': {
+        'task': 'cart.tasks.flush_carts_task',
+        'schedule': config('CART_FLUSH_INTERVAL', default=60, cast=int),
+    },
+}
+ORDER_RESERVATION_SWEEP_BATCH = config('ORDER_RESERVATION_SWEEP_BATCH', default=500, cast=int)
+# Expired orders keep their stock this many seconds after a payment was initiated for them
+ORDER_RESERVATION_PAYMENT_GRACE = config('ORDER_RESERVATION_PAYMENT_GRACE', default=1800, cast=int)
+
+# Optional Redis store for active carts (empty keeps carts in the database only). Changed
+# carts are written behind to the database every CART_FLUSH_INTERVAL seconds and at checkout
+CART_REDIS_URL = config('CART_REDIS_URL', default='')
+CART_REDIS_TTL = config('CART_REDIS_TTL', default=7 * 24 * 3600, cast=int)
+CART_FLUSH_BATCH = config('CART_FLUSH_BATCH', default=500, cast=int)
+
+# Payment verification task: attempts after the first, and seconds a queued verification
+# suppresses re-enqueueing the same reference while clients poll
+PAYMENT_VERIFY_MAX_RETRIES = config('PAYMENT_VERIFY_MAX_RETRIES', default=5, cast=int)
+PAYMENT_VERIFY_DEDUPE_TIMEOUT = config('PAYMENT_VERIFY_DEDUPE_TIMEOUT', default=30, cast=int)
+
+# Use in-memory cache and eager tasks for tests (manage.py test or pytest)
+if "test" in sys.argv or "pytest" in sys.modules:
     CACHES = {
         "default": {
             "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         }
-    }
\ No newline at end of file
+    }
+    CELERY_BROKER_URL = "memory://"
+    CELERY_RESULT_BACKEND = "cache+memory://"
+    CELERY_TASK_ALWAYS_EAGER = True
+    CART_REDIS_URL = ""
\ No newline at end of file
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SwiftCart.settings')
 
 application = get_wsgi_application()
+
+# Each server worker imports this module, build its typeahead index before taking requests
+from products.suggest import suggestion_index  # noqa: E402
+
+suggestion_index.warm()
@@ -15,7 +15,7 @@ class AdminDashboardAnalyticsView(APIView):
     def get(self, request):
         analytics = {
             "total_users": User.objects.count(),
-            "verified_users": User.objects.filter(is_verified=True).count(),
+            "verified_users": User.objects.filter(is_active=True).count(),
             "total_products": Product.objects.count(),
             "published_products": Product.objects.filter(is_published=True).count(),
             "total_orders": Order.objects.count(),
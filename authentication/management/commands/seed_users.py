@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Seed the pool of load-test users used by performance-test/scenarios.js"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=50)
+        parser.add_argument("--email-pattern", default="loadtest+{i}@example.com")
+        parser.add_argument("--password", default="LoadTest1@")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Seeding load-test users...")
+
+        emails = [options["email_pattern"].format(i=i) for i in range(options["count"])]
+        existing = set(User.objects.filter(email__in=emails).values_list("email", flat=True))
+
+        # Hash once; every pool user shares the password
+        password = make_password(options["password"])
+        User.objects.bulk_create([
+            User(email=email, username=email.split("@")[0], password=password)
+            for email in emails
+            if email not in existing
+        ])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(emails) - len(existing)} users created, {len(existing)} already present"
+        ))
@@ -248,3 +248,16 @@ class TestPasswordReset:
         # Confirm user can login with new password
         relog = api_client.post(reverse('authentication:login'), {"email": user.email, "password": payload['new_password']}, format='json')
         assert relog.status_code == status.HTTP_200_OK
+
+
+class TestSeedUsers:
+    @pytest.mark.django_db
+    def test_seed_users_creates_pool_that_can_login(self, api_client):
+        from django.core.management import call_command
+
+        call_command('seed_users', count=3)
+        call_command('seed_users', count=3)  # idempotent
+        assert User.objects.filter(email__startswith='loadtest+').count() == 3
+
+        res = api_client.post(reverse('authentication:login'), {"email": "loadtest+2@example.com", "password": "LoadTest1@"}, format='json')
+        assert res.status_code == status.HTTP_200_OK
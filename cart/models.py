@@ -1,14 +1,66 @@
 from django.db import models
+from django.db.models import Count, DecimalField, F, Prefetch, Sum, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
+from products.pricing import annotate_final_price, final_price_expression
 import uuid
 
 
+def prefetch_cart_items(cart, now=None):
+    """
+    Loads the cart's items with their products and categories in one joined query,
+    each priced in SQL against a single `now`, so serializing the cart (lines and
+    totals) does not query again.
+    """
+    queryset = annotate_final_price(
+        CartItem.objects.select_related('product__category').order_by('created_at'),
+        now or timezone.now(),
+        prefix='product__',
+    )
+    prefetch_related_objects([cart], Prefetch('items', queryset=queryset))
+
+    # Nested product representations report the same price as the line
+    for item in cart.items.all():
+        item.product.effective_price = item.effective_price
+    return cart
+
+
+def load_cart_delta(cart, item_id, now=None):
+    """
+    What changed after a mutation, without loading the other lines: the line `item_id`
+    (None once removed) priced like prefetch_cart_items() prices it, the cart totals
+    from one aggregate query, and the cart version.
+    """
+    now = now or timezone.now()
+    item = annotate_final_price(
+        CartItem.objects.select_related('product__category').filter(cart=cart, pk=item_id),
+        now,
+        prefix='product__',
+    ).first()
+    if item is not None:
+        item.product.effective_price = item.effective_price
+
+    totals = cart.items.aggregate(
+        total_items=Count('id'),
+        subtotal=Coalesce(
+            Sum(F('quantity') * final_price_expression(now, prefix='product__')),
+            Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+    return {'item': item, 'item_id': item_id, **totals, 'version': cart.version}
+
+
 class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
 
     is_active = models.BooleanField(default=True) # Indicates if the cart is active
 
+    # Bumped by every mutation, so clients holding partial (delta) responses can tell whether they missed one
+    version = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -17,6 +69,18 @@ class Cart(models.Model):
     
     def __str__(self):
         return f"Cart for {self.user.email}"
+
+    def lock(self):
+        """
+        Locks the cart row until the surrounding transaction ends, so concurrent
+        mutations of this cart apply one at a time, and loads its current version.
+        """
+        self.version = Cart.objects.select_for_update().filter(pk=self.pk).values_list('version', flat=True).get()
+
+    def bump_version(self):
+        """Records a mutation; call under lock()"""
+        self.version += 1
+        Cart.objects.filter(pk=self.pk).update(version=self.version, updated_at=timezone.now())
     
     @property
     def total_items(self):
@@ -42,6 +106,13 @@ class CartItem(models.Model):
     def __str__(self):
         return f"{self.quantity}x {self.product.name}"
     
+    @property
+    def unit_price(self):
+        # Set by prefetch_cart_items(); a lone item is priced from its product
+        if hasattr(self, 'effective_price'):
+            return self.effective_price
+        return self.product.final_price
+
     @property
     def total_price(self):
-        return self.product.final_price * self.quantity
+        return self.unit_price * self.quantity
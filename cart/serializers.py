@@ -2,7 +2,7 @@
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
 from drf_spectacular.types import OpenApiTypes
-from .models import Cart, CartItem
+from .models import Cart, CartItem, prefetch_cart_items
 from products.serializers.serializers import ProductSerializer
 
 
@@ -25,7 +25,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         """
         Returns line total as a string with 2 decimal places (common for money)
         """
-        total = obj.quantity * obj.product.price
+        total = obj.quantity * obj.unit_price
         return f"{total:.2f}"  # return total if price is Decimal
 
 
@@ -39,24 +39,49 @@ class CartSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = (
-            'id', 'items', 'total_items', 'subtotal',
+            'id', 'items', 'total_items', 'subtotal', 'version',
             'created_at', 'updated_at'
         )
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'version', 'created_at', 'updated_at')
+
+    def loaded_items(self, obj):
+        """
+        Cart lines loaded by prefetch_cart_items(), loading them if the caller did not.
+        Totals are computed from these rows instead of querying again.
+        """
+        if 'items' not in getattr(obj, '_prefetched_objects_cache', {}):
+            prefetch_cart_items(obj)
+        return obj.items.all()
+
+    def to_representation(self, instance):
+        self.loaded_items(instance)
+        return super().to_representation(instance)
 
     @extend_schema_field(OpenApiTypes.INT)
     def get_total_items(self, obj) -> int:
-        return obj.items.count()
+        return len(self.loaded_items(obj))
 
     @extend_schema_field(OpenApiTypes.DECIMAL)
     def get_subtotal(self, obj) -> str:
         total = sum(
-            item.quantity * item.product.price
-            for item in obj.items.all()
+            item.quantity * item.unit_price
+            for item in self.loaded_items(obj)
         )
         return f"{total:.2f}"
 
 
+class CartDeltaSerializer(serializers.Serializer):
+    """
+    Compact answer to a cart mutation: the changed line (null once removed),
+    the recomputed totals and the cart version clients reconcile against.
+    """
+    item = CartItemSerializer(allow_null=True)
+    item_id = serializers.UUIDField()
+    total_items = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    version = serializers.IntegerField()
+
+
 class AddCartItemSerializer(serializers.Serializer):
     product_id = serializers.UUIDField()
     quantity = serializers.IntegerField(min_value=1, default=1)
@@ -78,5 +103,15 @@ class RemoveCartItemSerializer(serializers.Serializer):
         return super().to_representation(instance)
 
 
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'update', 'remove'])
+    product_id = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=0, default=1)
+
+
+class BatchCartSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
+
+
 class ClearCartSerializer(serializers.Serializer):
     pass
\ No newline at end of file
@@ -0,0 +1,355 @@
+import threading
+import uuid
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from products.models import Product
+from products.pricing import annotate_final_price
+from .models import Cart, CartItem
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+"""
+Optional hot store for active carts, enabled by setting CART_REDIS_URL.
+
+Each cart lives in a Redis hash `cart:<user id>` mapping product id -> quantity, next to
+bookkeeping fields prefixed with `_`: the cart's database id, a version counter bumped by
+every mutation, and the created/updated times of the cart and of each line (ISO 8601),
+so carts read from Redis serialize like carts read from the tables. Mutations are one pipelined round-trip (HINCRBY/HSET/HDEL). The carts and
+cart_items tables stay the source of truth at checkout: flush() writes a hash behind to
+them, called by checkout before it reads the cart and by a periodic task for every cart
+changed since the last run.
+"""
+
+META_PREFIX = '_'
+CART_ID_FIELD = '_cart'
+VERSION_FIELD = '_v'
+CREATED_FIELD = '_created'
+UPDATED_FIELD = '_updated'
+DIRTY_KEY = 'cart:dirty'
+
+
+def line_fields(product_id):
+    """The (created, updated) time fields of a cart line"""
+    return f"_c:{product_id}", f"_u:{product_id}"
+
+
+def lines(data):
+    """{product id (str): quantity} from a raw cart hash"""
+    return {field: int(value) for field, value in data.items() if not field.startswith(META_PREFIX)}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class CartConflict(Exception):
+    """The cart kept changing under a read-modify-write until its attempts ran out"""
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = redis.Redis.from_url(settings.CART_REDIS_URL, decode_responses=True)
+        return _client
+
+
+def reset_client():
+    """Drops the Redis client (settings changes, tests)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def get_cart_store():
+    """The Redis cart store when CART_REDIS_URL is set, None to use the database directly"""
+    if not settings.CART_REDIS_URL:
+        return None
+    return RedisCartStore(get_client())
+
+
+class RedisCartStore:
+    def __init__(self, client):
+        self.client = client
+
+    def key(self, user_id):
+        return f"cart:{user_id}"
+
+    def load(self, user_id):
+        """
+        Returns the raw hash of a user's cart, filling it from the database first if it
+        is cold (never loaded, or expired after being flushed).
+        """
+        data = self.client.hgetall(self.key(user_id))
+        if not data:
+            self.hydrate(user_id)
+            data = self.client.hgetall(self.key(user_id))
+        return data
+
+    def hydrate(self, user_id):
+        key = self.key(user_id)
+        with self.client.pipeline() as pipe:
+            try:
+                # A concurrent hydration or mutation wins; ours is then discarded
+                pipe.watch(key)
+                if pipe.exists(key):
+                    return
+                cart, _ = Cart.objects.get_or_create(user_id=user_id)
+                mapping = {
+                    CART_ID_FIELD: str(cart.pk),
+                    VERSION_FIELD: cart.version,
+                    CREATED_FIELD: cart.created_at.isoformat(),
+                    UPDATED_FIELD: cart.updated_at.isoformat(),
+                }
+                items = cart.items.values_list('product_id', 'quantity', 'created_at', 'updated_at')
+                for product_id, quantity, created_at, updated_at in items:
+                    created_field, updated_field = line_fields(product_id)
+                    mapping[str(product_id)] = quantity
+                    mapping[created_field] = created_at.isoformat()
+                    mapping[updated_field] = updated_at.isoformat()
+                pipe.multi()
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, settings.CART_REDIS_TTL)
+                pipe.execute()
+            except redis.WatchError:
+                pass
+
+    def quantities(self, user_id):
+        """{product id (str): quantity} for a user's cart"""
+        return lines(self.load(user_id))
+
+    def mutate(self, user_id, *commands):
+        """
+        Applies `commands` ((method name, args) pairs) to the cart hash in one
+        MULTI/EXEC round-trip, bumping its version and updated time and marking it
+        for the next flush. Returns the commands' results.
+        """
+        key = self.key(user_id)
+        if not self.client.exists(key):
+            self.hydrate(user_id)
+
+        with self.client.pipeline() as pipe:
+            for name, *args in commands:
+                getattr(pipe, name)(key, *args)
+            pipe.hincrby(key, VERSION_FIELD, 1)
+            pipe.hset(key, UPDATED_FIELD, timezone.now().isoformat())
+            pipe.expire(key, settings.CART_REDIS_TTL)
+            pipe.sadd(DIRTY_KEY, str(user_id))
+            return pipe.execute()[:len(commands)]
+
+    def replace(self, user_id, compute, attempts=5):
+        """
+        Atomic read-modify-write of the cart lines: `compute` maps the current quantities
+        ({product id (str): quantity}) to the new ones, or returns None to write nothing.
+        The hash is WATCHed from the read to the MULTI/EXEC write, and `compute` is run
+        again on a fresh read if anything changed the cart in between. Returns whether
+        the new quantities were applied; raises CartConflict when attempts run out.
+        """
+        key = self.key(user_id)
+        with self.client.pipeline() as pipe:
+            for _ in range(attempts):
+                try:
+                    pipe.watch(key)
+                    data = pipe.hgetall(key)
+                    if not data:
+                        pipe.unwatch()
+                        self.hydrate(user_id)
+                        continue
+
+                    current = lines(data)
+                    quantities = compute(current)
+                    if quantities is None:
+                        pipe.unwatch()
+                        return False
+
+                    changed = {field: quantity for field, quantity in quantities.items() if current.get(field) != quantity}
+                    removed = [field for field in current if field not in quantities]
+                    if not changed and not removed:
+                        pipe.unwatch()
+                        return True
+
+                    now = timezone.now().isoformat()
+                    mapping = {UPDATED_FIELD: now, **changed}
+                    for field in changed:
+                        created_field, updated_field = line_fields(field)
+                        mapping[updated_field] = now
+                        if field not in current:
+                            mapping[created_field] = now
+                    removed_fields = [name for field in removed for name in (field, *line_fields(field))]
+
+                    pipe.multi()
+                    pipe.hset(key, mapping=mapping)
+                    if removed_fields:
+                        pipe.hdel(key, *removed_fields)
+                    pipe.hincrby(key, VERSION_FIELD, 1)
+                    pipe.expire(key, settings.CART_REDIS_TTL)
+                    pipe.sadd(DIRTY_KEY, str(user_id))
+                    pipe.execute()
+                    return True
+                except redis.WatchError:
+                    continue
+        raise CartConflict(f"Cart of user {user_id} changed during {attempts} attempts")
+
+    def touch_line(self, product_id):
+        """Commands stamping a line's times: created on its first write, updated on every one"""
+        created_field, updated_field = line_fields(product_id)
+        now = timezone.now().isoformat()
+        return ('hsetnx', created_field, now), ('hset', updated_field, now)
+
+    def add(self, user_id, product_id, quantity):
+        """Adds `quantity` (possibly negative) of a product; returns the new quantity"""
+        quantity, *_ = self.mutate(user_id, ('hincrby', str(product_id), quantity), *self.touch_line(product_id))
+        if quantity <= 0:
+            self.remove(user_id, product_id)
+        return quantity
+
+    def set(self, user_id, product_id, quantity):
+        """Sets a product's quantity; zero or less removes the line"""
+        if quantity <= 0:
+            self.remove(user_id, product_id)
+        else:
+            self.mutate(user_id, ('hset', str(product_id), quantity), *self.touch_line(product_id))
+
+    def remove(self, user_id, product_id):
+        """Removes a product's line; returns whether it was in the cart"""
+        removed, _ = self.mutate(user_id, ('hdel', str(product_id)), ('hdel', *line_fields(product_id)))
+        return bool(removed)
+
+    def clear(self, user_id):
+        fields = [name for field in self.quantities(user_id) for name in (field, *line_fields(field))]
+        if fields:
+            self.mutate(user_id, ('hdel', *fields))
+
+    def get_cart(self, user):
+        """
+        Builds the user's Cart with its lines prefetched, as prefetch_cart_items() does,
+        from the hash and a single priced product query. Lines are identified by their
+        product id and ordered by when they were added; products no longer published
+        drop out of the cart.
+        """
+        data = self.load(user.pk)
+        cart = Cart(
+            id=uuid.UUID(data[CART_ID_FIELD]),
+            user=user,
+            version=int(data.get(VERSION_FIELD, 0)),
+            created_at=parse_datetime(data.get(CREATED_FIELD, '')),
+            updated_at=parse_datetime(data.get(UPDATED_FIELD, '')),
+        )
+
+        quantities = lines(data)
+        products = annotate_final_price(
+            Product.objects.select_related('category').filter(pk__in=list(quantities), is_published=True),
+            timezone.now(),
+        )
+        items = []
+        for product in products:
+            created_field, updated_field = line_fields(product.pk)
+            item = CartItem(
+                id=product.pk, cart=cart, product=product, quantity=quantities[str(product.pk)],
+                created_at=parse_datetime(data.get(created_field, '')),
+                updated_at=parse_datetime(data.get(updated_field, '')),
+            )
+            item.effective_price = product.effective_price
+            items.append(item)
+        items.sort(key=lambda item: data.get(line_fields(item.pk)[0], ''))
+
+        cart._prefetched_objects_cache = {'items': items}
+        return cart
+
+    def get_delta(self, user, product_id):
+        """The changed line (None once removed), totals and version, as load_cart_delta() returns them"""
+        cart = self.get_cart(user)
+        items = cart.items.all()
+        return {
+            'item': next((item for item in items if str(item.pk) == str(product_id)), None),
+            'item_id': product_id,
+            'total_items': len(items),
+            'subtotal': sum(item.total_price for item in items),
+            'version': cart.version,
+        }
+
+    def flush(self, user_id):
+        """
+        Writes a user's cart hash behind to carts/cart_items in one transaction, with
+        the created/updated times the hash recorded: new lines are inserted, lines whose
+        quantity or times changed are updated, and lines no longer in the hash are deleted.
+        """
+        # Unmark first, so a mutation racing with this flush marks the cart again
+        self.client.srem(DIRTY_KEY, str(user_id))
+        data = self.client.hgetall(self.key(user_id))
+        if not data:
+            # Cold: nothing was changed since the tables were read
+            return
+
+        cart_id = data[CART_ID_FIELD]
+        version = int(data.get(VERSION_FIELD, 0))
+        quantities = {uuid.UUID(field): quantity for field, quantity in lines(data).items() if quantity > 0}
+        existing = set(Product.objects.filter(pk__in=quantities).values_list('pk', flat=True))
+
+        now = timezone.now()
+
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(user_id=user_id, defaults={'id': cart_id})
+            Cart.objects.filter(pk=cart.pk).update(
+                version=version, updated_at=parse_datetime(data.get(UPDATED_FIELD, '')) or now
+            )
+            cart.items.exclude(product_id__in=existing).delete()
+            stored = {
+                product_id: (pk, (quantity, created_at, updated_at))
+                for pk, product_id, quantity, created_at, updated_at in cart.items.values_list(
+                    'pk', 'product_id', 'quantity', 'created_at', 'updated_at'
+                )
+            }
+
+            added, changed = [], []
+            for product_id, quantity in quantities.items():
+                if product_id not in existing:
+                    continue
+                created_field, updated_field = line_fields(product_id)
+                line = CartItem(
+                    cart=cart, product_id=product_id, quantity=quantity,
+                    created_at=parse_datetime(data.get(created_field, '')) or now,
+                    updated_at=parse_datetime(data.get(updated_field, '')) or now,
+                )
+                row = stored.get(product_id)
+                if row is None:
+                    added.append(line)
+                elif row[1] != (line.quantity, line.created_at, line.updated_at):
+                    line.pk = row[0]
+                    changed.append(line)
+
+            # bulk_create stamps the auto_now(_add) fields with the current time (on the
+            # instances too); bulk_update writes values as given, restoring the hash's times
+            times = [(line.created_at, line.updated_at) for line in added]
+            CartItem.objects.bulk_create(
+                added,
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+            for line, (created_at, updated_at) in zip(added, times):
+                line.created_at, line.updated_at = created_at, updated_at
+            CartItem.objects.bulk_update(added + changed, ['quantity', 'created_at', 'updated_at'])
+
+    def flush_dirty(self, limit):
+        """Flushes up to `limit` carts changed since their last flush; returns how many"""
+        flushed = 0
+        for user_id in self.client.spop(DIRTY_KEY, limit) or []:
+            try:
+                self.flush(user_id)
+            except Exception:
+                # Keep it queued for the next run
+                self.client.sadd(DIRTY_KEY, user_id)
+                logger.exception(f"Failed to flush cart of user {user_id}")
+            else:
+                flushed += 1
+        return flushed
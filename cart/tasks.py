@@ -0,0 +1,30 @@
+from celery import shared_task
+from django.conf import settings
+
+from .store import get_cart_store
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_carts_task():
+    """
+    Periodic write-behind (see CELERY_BEAT_SCHEDULE) of Redis-held carts changed since
+    the last run into carts/cart_items. Does nothing without the Redis cart store.
+    """
+    store = get_cart_store()
+    if store is None:
+        return 0
+
+    total = 0
+    while True:
+        flushed = store.flush_dirty(settings.CART_FLUSH_BATCH)
+        total += flushed
+        # A short batch means the queue is drained (or the rest failed and stays queued)
+        if flushed < settings.CART_FLUSH_BATCH:
+            break
+    if total:
+        logger.info(f"Flushed {total} carts to the database")
+    return total
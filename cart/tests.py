@@ -360,4 +360,371 @@ def test_add_item_with_invalid_product_id():
     })
 
     assert response.status_code == 404
-    assert 'No Product matches the given query.' in response.data['detail']
\ No newline at end of file
+    assert 'No Product matches the given query.' in response.data['detail']
+
+"""Tests for the number of queries used to serialize the cart."""
+@pytest.mark.django_db
+def test_cart_list_query_count_does_not_grow_with_items(django_assert_max_num_queries):
+    client = APIClient()
+    user = User.objects.create_user(
+        email='testuser@example.com',
+        username='testuser',
+        password='testpass'
+    )
+    client.force_authenticate(user=user)
+
+    category = Category.objects.create(name="Electronics")
+    cart = Cart.objects.create(user=user)
+    for i in range(5):
+        product = Product.objects.create(
+            category=category,
+            name=f"Product {i}",
+            price=100,
+            in_stock=10,
+            is_published=True
+        )
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+
+    # Cart, then its items joined with products and categories
+    with django_assert_max_num_queries(2):
+        response = client.get('/api/cart/')
+
+    assert response.status_code == 200
+    assert len(response.data['items']) == 5
+    assert response.data['subtotal'] == "500.00"
+
+
+@pytest.mark.django_db
+def test_cart_mutations_echo_cart_in_constant_queries(django_assert_max_num_queries):
+    client = APIClient()
+    user = User.objects.create_user(
+        email='testuser@example.com',
+        username='testuser',
+        password='testpass'
+    )
+    client.force_authenticate(user=user)
+
+    category = Category.objects.create(name="Electronics")
+    cart = Cart.objects.create(user=user)
+    products = [
+        Product.objects.create(category=category, name=f"Product {i}", price=100, in_stock=10, is_published=True)
+        for i in range(20)
+    ]
+    CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=2) for product in products[1:]])
+    item = CartItem.objects.filter(cart=cart).first()
+
+    with django_assert_max_num_queries(13):
+        response = client.post('/api/cart/add-item', {"product_id": products[0].id, "quantity": 1})
+    assert response.data['total_items'] == 20
+    assert response.data['subtotal'] == "3900.00"
+
+    with django_assert_max_num_queries(8):
+        response = client.patch('/api/cart/update-item', {"item_id": str(item.id), "quantity": 3})
+    assert response.data['subtotal'] == "4000.00"
+
+
+"""Tests for flash-sale pricing in the cart."""
+@pytest.mark.django_db
+def test_cart_totals_use_flash_price():
+    from datetime import timedelta
+    from django.utils import timezone
+
+    client = APIClient()
+    user = User.objects.create_user(email='testuser@example.com', username='testuser', password='testpass')
+    client.force_authenticate(user=user)
+
+    category = Category.objects.create(name="Electronics")
+    product = Product.objects.create(
+        category=category, name="Blender", price=100, in_stock=10, is_published=True,
+        flash_price=60, flash_sale_ends_at=timezone.now() + timedelta(hours=1),
+    )
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, product=product, quantity=2)
+
+    response = client.get('/api/cart/')
+    assert response.data['items'][0]['total_price'] == "120.00"
+    assert response.data['subtotal'] == "120.00"
+
+
+"""Tests for the Redis cart store and its write-behind to the database."""
+@pytest.fixture
+def redis_cart_store(settings, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from cart import store
+
+    settings.CART_REDIS_URL = "redis://localhost:6379/2"
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(store, '_client', client)
+    yield store.RedisCartStore(client)
+    store.reset_client()
+
+
+@pytest.fixture
+def shopper():
+    user = User.objects.create_user(email='testuser@example.com', username='testuser', password='testpass')
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return user, client
+
+
+@pytest.mark.django_db
+def test_redis_cart_mutations_skip_the_cart_tables_until_checkout(redis_cart_store, shopper, django_assert_max_num_queries):
+    user, client = shopper
+    category = Category.objects.create(name="Electronics")
+    product = Product.objects.create(category=category, name="Kettle", price=100, in_stock=10, is_published=True)
+    client.get('/api/cart/')
+
+    # Product lookup, then the priced products of the cart
+    with django_assert_max_num_queries(2):
+        response = client.post('/api/cart/add-item', {"product_id": product.id, "quantity": 2})
+    client.post('/api/cart/add-item', {"product_id": product.id, "quantity": 1})
+
+    assert response.status_code == 200
+    assert client.get('/api/cart/').data['subtotal'] == "300.00"
+    assert not CartItem.objects.exists()
+
+    response = client.post('/api/orders/create', {"shipping_address": "1 Main Street", "phone_number": "08000000000"})
+    assert response.status_code == 201
+    assert CartItem.objects.get(cart__user=user, product=product).quantity == 3
+    product.refresh_from_db()
+    assert product.in_stock == 7
+
+
+@pytest.mark.django_db
+def test_redis_cart_loads_existing_lines_and_writes_back_changes(redis_cart_store, shopper):
+    user, client = shopper
+    category = Category.objects.create(name="Electronics")
+    kept, dropped = [
+        Product.objects.create(category=category, name=f"Product {i}", price=100, in_stock=10, is_published=True)
+        for i in range(2)
+    ]
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, product=kept, quantity=1)
+    CartItem.objects.create(cart=cart, product=dropped, quantity=1)
+
+    response = client.get('/api/cart/')
+    assert str(response.data['id']) == str(cart.id)
+    assert {item['id'] for item in response.data['items']} == {str(kept.id), str(dropped.id)}
+
+    client.patch('/api/cart/update-item', {"item_id": str(kept.id), "quantity": 4})
+    client.delete('/api/cart/remove-item', {"item_id": str(dropped.id)})
+    assert client.delete('/api/cart/remove-item', {"item_id": str(dropped.id)}).status_code == 404
+
+    redis_cart_store.flush(user.pk)
+    assert dict(cart.items.values_list('product_id', 'quantity')) == {kept.id: 4}
+
+
+@pytest.mark.django_db
+def test_redis_cart_serializes_timestamps_like_the_database(redis_cart_store, shopper, stocked_products):
+    from rest_framework import serializers
+
+    user, client = shopper
+    first, second = stocked_products[:2]
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, product=first, quantity=1)
+
+    loaded = client.get('/api/cart/').data
+    assert loaded['created_at'] == serializers.DateTimeField().to_representation(cart.created_at)
+    assert all(item['created_at'] and item['updated_at'] for item in loaded['items'])
+
+    client.post('/api/cart/add-item', {"product_id": second.id, "quantity": 1})
+    client.patch('/api/cart/update-item', {"item_id": str(first.id), "quantity": 3})
+    body = client.get('/api/cart/').data
+
+    assert body['created_at'] == loaded['created_at']
+    assert body['updated_at'] > loaded['updated_at']
+    assert [item['id'] for item in body['items']] == [str(first.id), str(second.id)]
+    assert body['items'][0]['created_at'] == loaded['items'][0]['created_at']
+    assert body['items'][0]['updated_at'] > loaded['items'][0]['updated_at']
+
+
+@pytest.mark.django_db
+def test_redis_cart_flush_keeps_line_times_and_order(redis_cart_store, shopper, stocked_products):
+    user, client = shopper
+    first, second, kept = stocked_products[:3]
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, product=first, quantity=1)
+    untouched = CartItem.objects.create(cart=cart, product=kept, quantity=1)
+
+    client.post('/api/cart/add-item', {"product_id": second.id, "quantity": 1})
+    client.patch('/api/cart/update-item', {"item_id": str(first.id), "quantity": 3})
+    shown = client.get('/api/cart/').data['items']
+
+    redis_cart_store.flush(user.pk)
+    assert CartItem.objects.get(pk=untouched.pk).updated_at == untouched.updated_at
+
+    # Expired hash: the cart is read back from the tables
+    redis_cart_store.client.delete(redis_cart_store.key(user.pk))
+    reloaded = client.get('/api/cart/').data['items']
+    assert [(item['id'], item['quantity'], item['created_at'], item['updated_at']) for item in reloaded] == [
+        (item['id'], item['quantity'], item['created_at'], item['updated_at']) for item in shown
+    ]
+
+
+@pytest.mark.django_db
+def test_redis_cart_rejects_adds_beyond_stock(redis_cart_store, shopper):
+    user, client = shopper
+    category = Category.objects.create(name="Electronics")
+    product = Product.objects.create(category=category, name="Kettle", price=100, in_stock=3, is_published=True)
+
+    client.post('/api/cart/add-item', {"product_id": product.id, "quantity": 2})
+    response = client.post('/api/cart/add-item', {"product_id": product.id, "quantity": 2})
+
+    assert response.status_code == 400
+    assert redis_cart_store.quantities(user.pk) == {str(product.id): 2}
+
+
+@pytest.mark.django_db
+def test_flush_task_writes_changed_carts_once(redis_cart_store, shopper):
+    from cart.tasks import flush_carts_task
+
+    user, client = shopper
+    category = Category.objects.create(name="Electronics")
+    product = Product.objects.create(category=category, name="Kettle", price=100, in_stock=10, is_published=True)
+    client.post('/api/cart/add-item', {"product_id": product.id, "quantity": 2})
+
+    assert flush_carts_task() == 1
+    assert CartItem.objects.get(cart__user=user).quantity == 2
+    assert flush_carts_task() == 0
+
+    client.delete('/api/cart/empty')
+    assert flush_carts_task() == 1
+    assert not CartItem.objects.exists()
+
+
+"""Tests for the batch cart endpoint."""
+@pytest.fixture
+def stocked_products():
+    category = Category.objects.create(name="Electronics")
+    return [
+        Product.objects.create(category=category, name=f"Product {i}", price=100, in_stock=5, is_published=True)
+        for i in range(4)
+    ]
+
+
+@pytest.mark.django_db
+def test_batch_applies_operations_in_order_with_constant_queries(shopper, stocked_products, django_assert_max_num_queries):
+    user, client = shopper
+    kept, updated, removed, new = stocked_products
+    cart = Cart.objects.create(user=user)
+    for product in (kept, updated, removed):
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+
+    operations = [
+        {"op": "add", "product_id": str(new.id), "quantity": 2},
+        {"op": "add", "product_id": str(new.id), "quantity": 1},
+        {"op": "update", "product_id": str(updated.id), "quantity": 4},
+        {"op": "remove", "product_id": str(removed.id)},
+    ]
+    # One query per kind of write, however many operations the batch holds
+    with django_assert_max_num_queries(11):
+        response = client.post('/api/cart/batch', {"operations": operations}, format='json')
+
+    assert response.status_code == 200
+    assert response.data['subtotal'] == "800.00"
+    assert dict(cart.items.values_list('product_id', 'quantity')) == {kept.id: 1, updated.id: 4, new.id: 3}
+
+
+@pytest.mark.django_db
+def test_batch_is_all_or_nothing(shopper, stocked_products):
+    user, client = shopper
+    product, other = stocked_products[:2]
+
+    response = client.post('/api/cart/batch', {"operations": [
+        {"op": "add", "product_id": str(product.id), "quantity": 2},
+        {"op": "add", "product_id": str(other.id), "quantity": 6},
+    ]}, format='json')
+    assert response.status_code == 400
+    assert response.data['unavailable'] == [{'product_id': str(other.id), 'available': 5}]
+    assert not CartItem.objects.exists()
+
+    response = client.post('/api/cart/batch', {"operations": [
+        {"op": "add", "product_id": str(product.id)},
+        {"op": "add", "product_id": "9e8d3c64-8a34-4b2b-9bdf-9e2b1cdb11aa"},
+    ]}, format='json')
+    assert response.status_code == 400
+    assert response.data['product_ids'] == ["9e8d3c64-8a34-4b2b-9bdf-9e2b1cdb11aa"]
+    assert not CartItem.objects.exists()
+
+
+@pytest.mark.django_db
+def test_batch_with_redis_cart_store(redis_cart_store, shopper, stocked_products):
+    user, client = shopper
+    first, second = stocked_products[:2]
+    client.post('/api/cart/add-item', {"product_id": first.id, "quantity": 1})
+
+    response = client.post('/api/cart/batch', {"operations": [
+        {"op": "remove", "product_id": str(first.id)},
+        {"op": "update", "product_id": str(second.id), "quantity": 3},
+    ]}, format='json')
+
+    assert response.status_code == 200
+    assert [item['id'] for item in response.data['items']] == [str(second.id)]
+    assert redis_cart_store.quantities(user.pk) == {str(second.id): 3}
+
+
+"""Tests for delta responses to cart mutations."""
+@pytest.mark.django_db
+def test_delta_responses_carry_only_the_changed_line(shopper, stocked_products, django_assert_max_num_queries):
+    user, client = shopper
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=1) for product in stocked_products[1:]])
+    product = stocked_products[0]
+
+    response = client.post('/api/cart/add-item?response=delta', {"product_id": product.id, "quantity": 2})
+    assert response.status_code == 200
+    assert set(response.data) == {'message', 'item', 'item_id', 'total_items', 'subtotal', 'version'}
+    assert response.data['item']['product']['id'] == str(product.id)
+    assert response.data['item']['quantity'] == 2
+    assert response.data['total_items'] == 4
+    assert response.data['subtotal'] == "500.00"
+    assert response.data['version'] == 1
+
+    item_id = response.data['item_id']
+    with django_assert_max_num_queries(9):
+        response = client.patch('/api/cart/update-item?response=delta', {"item_id": str(item_id), "quantity": 0})
+    assert response.data['item'] is None
+    assert str(response.data['item_id']) == str(item_id)
+    assert response.data['subtotal'] == "300.00"
+    assert response.data['version'] == 2
+
+    # The full cart reports the same version
+    assert client.get('/api/cart/').data['version'] == 2
+
+
+@pytest.mark.django_db
+def test_delta_responses_with_redis_cart_store(redis_cart_store, shopper, stocked_products):
+    user, client = shopper
+    first, second = stocked_products[:2]
+    client.post('/api/cart/add-item', {"product_id": first.id, "quantity": 1})
+
+    response = client.post('/api/cart/add-item?response=delta', {"product_id": second.id, "quantity": 2})
+    assert response.data['item']['id'] == str(second.id)
+    assert response.data['total_items'] == 2
+    assert response.data['subtotal'] == "300.00"
+    assert response.data['version'] == 2
+
+    # The version survives the write-behind and a cold reload
+    redis_cart_store.flush(user.pk)
+    redis_cart_store.client.delete(redis_cart_store.key(user.pk))
+    assert client.get('/api/cart/').data['version'] == 2
+
+
+@pytest.mark.django_db
+def test_redis_batch_replays_when_the_cart_changes_before_it_is_written(redis_cart_store, shopper, stocked_products):
+    user, client = shopper
+    first, second = (str(product.id) for product in stocked_products[:2])
+    redis_cart_store.add(user.pk, first, 1)
+
+    seen = []
+
+    def compute(current):
+        if not seen:
+            # Another request adds to the cart between the read and the write
+            redis_cart_store.add(user.pk, second, 2)
+        seen.append(dict(current))
+        return {**current, first: current[first] + 1}
+
+    assert redis_cart_store.replace(user.pk, compute)
+    assert seen == [{first: 1}, {first: 1, second: 2}]
+    assert redis_cart_store.quantities(user.pk) == {first: 2, second: 2}
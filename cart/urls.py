@@ -10,5 +10,6 @@ urlpatterns = [
         path('update-item', CartViewSet.as_view({'patch': 'update_item'}), name='cart-update-item'),
         path('remove-item', CartViewSet.as_view({'delete': 'remove_item'}), name='cart-remove-item'),
         path('empty', CartViewSet.as_view({'delete': 'clear'}), name='cart-clear'),
+        path('batch', CartViewSet.as_view({'post': 'batch'}), name='cart-batch'),
     ], 'cart'), namespace='cart')),
 ]
\ No newline at end of file
@@ -1,26 +1,69 @@
 from email.mime import message
+import uuid
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from .models import Cart, CartItem
+from django.db import transaction
+from django.utils import timezone
+from .models import Cart, CartItem, load_cart_delta, prefetch_cart_items
+from .store import CartConflict, get_cart_store
 from products.models import Product
 
 from .serializers import (CartSerializer, 
                           RemoveCartItemSerializer, 
                           AddCartItemSerializer, 
                           UpdateCartItemSerializer,
-                          ClearCartSerializer)
+                          ClearCartSerializer,
+                          BatchCartSerializer,
+                          CartDeltaSerializer)
 
 
 from drf_spectacular.utils import OpenApiExample
 from drf_spectacular.utils import extend_schema
 
-# ViewSet for managing the shopping cart
+def apply_cart_operations(quantities, operations):
+    """
+    Replays batch `operations` in order over `quantities` ({product_id: quantity})
+    and returns the resulting quantities; lines at zero are removed.
+    """
+    quantities = dict(quantities)
+    for operation in operations:
+        product_id = operation['product_id']
+        if operation['op'] == 'add':
+            quantities[product_id] = quantities.get(product_id, 0) + operation['quantity']
+        elif operation['op'] == 'update':
+            quantities[product_id] = operation['quantity']
+        else:
+            quantities[product_id] = 0
+    return {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+
+
+# ViewSet for managing the shopping cart.
+# With the Redis cart store enabled (CART_REDIS_URL) carts are read and changed in Redis
+# and written behind to the database; a line's `id` is then its product id.
 
 class CartViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
+
+    def mutation_response(self, request, message, store, cart=None, item_id=None):
+        """
+        Answers add_item/update_item with the full cart, or with `?response=delta` only the
+        changed line, the recomputed totals and the cart version, whose size does not grow
+        with the cart.
+        """
+        if request.query_params.get('response') == 'delta':
+            if store is not None:
+                delta = store.get_delta(request.user, item_id)
+            else:
+                delta = load_cart_delta(cart, item_id)
+            data = CartDeltaSerializer(delta).data
+        else:
+            if store is not None:
+                cart = store.get_cart(request.user)
+            data = CartSerializer(cart).data
+        return Response({"message": message, **data}, status=status.HTTP_200_OK)
     
     # Retrieve the current user's cart
     
@@ -30,8 +73,12 @@ class CartViewSet(viewsets.ViewSet):
         description="Retrieve the authenticated user's cart."
     )
     def list(self, request):
+        store = get_cart_store()
+        if store is not None:
+            return Response(CartSerializer(store.get_cart(request.user)).data)
+
         cart, created = Cart.objects.get_or_create(user=request.user)
-        serializer = CartSerializer(cart)
+        serializer = CartSerializer(prefetch_cart_items(cart))
         return Response(serializer.data)
 
     # Add a product to the cart
@@ -49,12 +96,11 @@ class CartViewSet(viewsets.ViewSet):
                 request_only=True,
             )
         ],
-        description="Add a product to the cart or increase its quantity."
+        description="Add a product to the cart or increase its quantity. Pass `?response=delta` to get only the changed line, totals and cart version back."
     )
 
     @action(detail=False, methods=['post'])
     def add_item(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
         product_id = request.data.get('product_id')
         quantity = int(request.data.get('quantity', 1))
         
@@ -73,27 +119,35 @@ class CartViewSet(viewsets.ViewSet):
         if quantity > product.in_stock:
             return Response({'error': 'Insufficient stock, available quantity is ' + str(product.in_stock)}, status=status.HTTP_400_BAD_REQUEST)
 
-        cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
-        
-        # Update quantity if item already exists in cart
-        if not created:
-            cart_item.quantity += quantity
-            if cart_item.quantity > product.in_stock:
+        store = get_cart_store()
+        if store is not None:
+            # HINCRBY is atomic, so concurrent adds need no lock; an add that overshoots is undone
+            if store.add(request.user.pk, product.pk, quantity) > product.in_stock:
+                store.add(request.user.pk, product.pk, -quantity)
                 return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
-            cart_item.save()
+            return self.mutation_response(request, "Item added to cart successfully", store, item_id=product.pk)
         else:
-            cart_item.quantity = quantity
-            cart_item.save()
+            cart, created = Cart.objects.get_or_create(user=request.user)
 
-        # Return the updated cart, serialized
-        serializer = CartSerializer(cart)
-        return Response(
-            {
-                "message": "Item added to cart successfully",
-                **serializer.data
-         },
-        status=status.HTTP_200_OK
-    )
+            # Lock this user's cart so concurrent adds cannot lose a quantity update;
+            # stock itself is only reserved when the order is created
+            with transaction.atomic():
+                cart.lock()
+                cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
+                
+                # Update quantity if item already exists in cart
+                if not created:
+                    cart_item.quantity += quantity
+                    if cart_item.quantity > product.in_stock:
+                        return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
+                    cart_item.save()
+                else:
+                    cart_item.quantity = quantity
+                    cart_item.save()
+                cart.bump_version()
+
+        # Return the updated cart (or just the change), serialized
+        return self.mutation_response(request, "Item added to cart successfully", store, cart, cart_item.pk)
 
 
     # Update the quantity of an item in the cart
@@ -111,36 +165,44 @@ class CartViewSet(viewsets.ViewSet):
                 request_only=True,
             )
         ],
-        description="Update the quantity of an item in the cart. Set quantity to 0 to remove it."
+        description="Update the quantity of an item in the cart. Set quantity to 0 to remove it. Pass `?response=delta` to get only the changed line, totals and cart version back."
     )
     @action(detail=False, methods=['patch'])
     def update_item(self, request):
-        cart = get_object_or_404(Cart, user=request.user)
         item_id = request.data.get('item_id')
         quantity = request.data.get('quantity')
         
         if not item_id or quantity is None:
             return Response({'error': 'item_id and quantity are required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+
+        store = get_cart_store()
+        if store is not None:
+            if str(item_id) not in store.quantities(request.user.pk):
+                return Response({'detail': 'No CartItem matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+            product = get_object_or_404(Product, id=item_id)
+            if int(quantity) > product.in_stock:
+                return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
+            store.set(request.user.pk, product.pk, int(quantity))
+            return self.mutation_response(request, "Cart item updated successfully", store, item_id=product.pk)
+
+        cart = get_object_or_404(Cart, user=request.user)
+        cart_item = get_object_or_404(CartItem.objects.select_related('product'), id=item_id, cart=cart)
         
         if int(quantity) > cart_item.product.in_stock:
             return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if int(quantity) <= 0:
-            cart_item.delete()
-        else:
-            cart_item.quantity = quantity
-            cart_item.save()
+        # Deleting the line clears its pk, and the delta still has to name it
+        item_id = cart_item.pk
+        with transaction.atomic():
+            cart.lock()
+            if int(quantity) <= 0:
+                cart_item.delete()
+            else:
+                cart_item.quantity = quantity
+                cart_item.save()
+            cart.bump_version()
         
-        serializer = CartSerializer(cart)
-        return Response(
-            {
-                "message": "Cart item updated successfully",
-                **serializer.data
-            },
-            status=status.HTTP_200_OK
-        )
+        return self.mutation_response(request, "Cart item updated successfully", store, cart, item_id)
 
     # Remove an item from the cart
     @extend_schema(
@@ -160,14 +222,22 @@ class CartViewSet(viewsets.ViewSet):
     )
     @action(detail=False, methods=['delete'])
     def remove_item(self, request):
-        cart = get_object_or_404(Cart, user=request.user)
         item_id = request.data.get('item_id')
         
         if not item_id:
             return Response({'error': 'item_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
-        cart_item.delete()
+
+        store = get_cart_store()
+        if store is not None:
+            if not store.remove(request.user.pk, item_id):
+                return Response({'detail': 'No CartItem matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            cart = get_object_or_404(Cart, user=request.user)
+            cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+            with transaction.atomic():
+                cart.lock()
+                cart_item.delete()
+                cart.bump_version()
 
         return Response(
             {
@@ -192,8 +262,15 @@ class CartViewSet(viewsets.ViewSet):
     )
     @action(detail=False, methods=['delete'])
     def clear(self, request):
-        cart = get_object_or_404(Cart, user=request.user)
-        cart.items.all().delete()
+        store = get_cart_store()
+        if store is not None:
+            store.clear(request.user.pk)
+        else:
+            cart = get_object_or_404(Cart, user=request.user)
+            with transaction.atomic():
+                cart.lock()
+                cart.items.all().delete()
+                cart.bump_version()
         
         return Response(
             {
@@ -201,4 +278,116 @@ class CartViewSet(viewsets.ViewSet):
 
             },
             status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        )
+
+    # Apply several cart changes in one request
+    @extend_schema(
+        tags=["Carts"],
+        request=BatchCartSerializer,
+        responses={200: CartSerializer},
+        examples=[
+            OpenApiExample(
+                name="Sync Offline Basket",
+                value={
+                    "operations": [
+                        {"op": "add", "product_id": "9e8d3c64-8a34-4b2b-9bdf-9e2b1cdb11aa", "quantity": 2},
+                        {"op": "update", "product_id": "5b1f0a7e-2c41-4e7b-8d2a-6f3e9c0d1b22", "quantity": 1},
+                        {"op": "remove", "product_id": "c3a9e4d1-7f62-4b18-a5c0-2e8d6b4f9a33"}
+                    ]
+                },
+                request_only=True,
+            )
+        ],
+        description="Apply add/update/remove operations (by product) in order, all or nothing, and return the cart once."
+    )
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        serializer = BatchCartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['operations']
+
+        # Every product named by the batch, in one query; only removals may name unavailable ones
+        product_ids = {operation['product_id'] for operation in operations}
+        products = Product.objects.filter(id__in=product_ids, is_published=True).in_bulk()
+        unknown = {
+            operation['product_id'] for operation in operations
+            if operation['op'] != 'remove' and operation['product_id'] not in products
+        }
+        if unknown:
+            return Response(
+                {'error': 'Products not found', 'product_ids': sorted(str(pk) for pk in unknown)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        def check_stock(quantities):
+            short = [
+                {'product_id': str(pk), 'available': products[pk].in_stock}
+                for pk, quantity in quantities.items()
+                if pk in products and quantity > products[pk].in_stock
+            ]
+            if short:
+                return Response({'error': 'Insufficient stock', 'unavailable': short}, status=status.HTTP_400_BAD_REQUEST)
+
+        store = get_cart_store()
+        if store is not None:
+            outcome = {}
+
+            def compute(current):
+                quantities = apply_cart_operations(
+                    {uuid.UUID(pk): quantity for pk, quantity in current.items()}, operations
+                )
+                outcome['error'] = check_stock(quantities)
+                if outcome['error']:
+                    return None
+                return {str(pk): quantity for pk, quantity in quantities.items()}
+
+            # The batch is replayed if another request changes the cart before it is written
+            try:
+                store.replace(request.user.pk, compute)
+            except CartConflict:
+                return Response({'error': 'Cart is being changed concurrently, please retry'}, status=status.HTTP_409_CONFLICT)
+            if outcome['error']:
+                return outcome['error']
+            cart = store.get_cart(request.user)
+        else:
+            cart, created = Cart.objects.get_or_create(user=request.user)
+            with transaction.atomic():
+                # Same per-cart lock as add_item
+                cart.lock()
+                items = {item.product_id: item for item in cart.items.all()}
+                quantities = apply_cart_operations(
+                    {pk: item.quantity for pk, item in items.items()}, operations
+                )
+                error = check_stock(quantities)
+                if error:
+                    return error
+
+                now = timezone.now()
+                to_create, to_update = [], []
+                for pk, quantity in quantities.items():
+                    item = items.get(pk)
+                    if item is None:
+                        to_create.append(CartItem(cart=cart, product=products[pk], quantity=quantity))
+                    elif item.quantity != quantity:
+                        item.quantity = quantity
+                        item.updated_at = now
+                        to_update.append(item)
+
+                removed = [item.pk for pk, item in items.items() if pk not in quantities]
+                if removed:
+                    CartItem.objects.filter(pk__in=removed).delete()
+                if to_update:
+                    CartItem.objects.bulk_update(to_update, ['quantity', 'updated_at'])
+                if to_create:
+                    CartItem.objects.bulk_create(to_create)
+                if removed or to_update or to_create:
+                    cart.bump_version()
+            prefetch_cart_items(cart)
+
+        return Response(
+            {
+                "message": "Cart updated successfully",
+                **CartSerializer(cart).data
+            },
+            status=status.HTTP_200_OK
+        )
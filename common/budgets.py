@@ -0,0 +1,87 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import json
+import math
+import os
+import tempfile
+import time
+
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def measure(call, runs=20, setup=None):
+    """
+    Runs `call` `runs` times in-process, each after an optional untimed `setup`,
+    and returns the last response with the max query count and latency percentiles (ms).
+    """
+    durations, queries, response = [], [], None
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = call()
+            durations.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured.captured_queries))
+    return response, {
+        'runs': runs,
+        'max_queries': max(queries),
+        'p50_ms': round(percentile(durations, 0.50), 2),
+        'p95_ms': round(percentile(durations, 0.95), 2),
+    }
+
+
+class BudgetReport:
+    """
+    Collects per-endpoint measurements against their budgets and writes them as JSON
+    (BUDGET_REPORT env var, default swiftcart-budget-report.json in the temp directory, never
+    inside the repo) so runs can be diffed between releases. Latency is always reported but
+    only enforced with BUDGET_ENFORCE_LATENCY=1, since wall-clock p95 on shared CI runners is
+    noisy; latency budgets are scaled by BUDGET_LATENCY_FACTOR for slow machines.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get(
+            'BUDGET_REPORT', os.path.join(tempfile.gettempdir(), 'swiftcart-budget-report.json')
+        )
+        self.latency_factor = float(os.environ.get('BUDGET_LATENCY_FACTOR', 1))
+        self.enforce_latency = os.environ.get('BUDGET_ENFORCE_LATENCY', '').lower() in ('1', 'true', 'yes')
+        self.seed = {}
+        self.endpoints = {}
+
+    def record(self, name, stats, max_queries, p95_ms):
+        p95_budget = p95_ms * self.latency_factor
+        entry = {
+            **stats,
+            'query_budget': max_queries,
+            'p95_budget_ms': p95_budget,
+            'latency_enforced': self.enforce_latency,
+            'passed': stats['max_queries'] <= max_queries and (
+                not self.enforce_latency or stats['p95_ms'] <= p95_budget
+            ),
+        }
+        self.endpoints[name] = entry
+        return entry
+
+    def as_dict(self):
+        return {
+            'generated_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'seed': self.seed,
+            'endpoints': dict(sorted(self.endpoints.items())),
+        }
+
+    def write(self):
+        if not self.endpoints:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w') as handle:
+            json.dump(self.as_dict(), handle, indent=2)
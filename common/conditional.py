@@ -0,0 +1,70 @@
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+import hashlib
+
+
+"""
+Conditional GET (ETag / If-None-Match, Last-Modified / If-Modified-Since) for DRF views.
+The validators come from a single aggregate over the queryset, so an unchanged resource
+returns 304 Not Modified without running the serializer.
+"""
+class ConditionalGetMixin:
+    # Field bumped on every write (auto_now), used for Last-Modified
+    conditional_timestamp_field = 'updated_at'
+
+    def get_conditional_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_conditional_aggregate(self):
+        """
+        Row count and latest timestamp of the queryset, computed once per request.
+        """
+        if getattr(self, '_conditional_aggregate', None) is None:
+            self._conditional_aggregate = self.get_conditional_queryset().order_by().aggregate(
+                count=Count('pk'),
+                last_modified=Max(self.conditional_timestamp_field),
+            )
+        return self._conditional_aggregate
+
+    def get_pagination_count(self):
+        """
+        The aggregate already counted the list, so CachedCountPagination uses that total
+        instead of running (or caching) a COUNT of its own.
+        """
+        return self.get_conditional_aggregate()['count']
+
+    def get_conditional_state(self):
+        """
+        Returns (etag, last_modified) for the current request. The row count is part of
+        the ETag so deletions change it even when the latest timestamp does not.
+        """
+        state = self.get_conditional_aggregate()
+        last_modified = int(state['last_modified'].timestamp()) if state['last_modified'] else None
+        raw = f"{self.request.get_full_path()}:{state['count']}:{state['last_modified'] and state['last_modified'].isoformat()}"
+        etag = f'"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+        return etag, last_modified
+
+    def conditional(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_conditional_state()
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from functools import partial
+import hashlib
+import json
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_count(queryset):
+    """
+    Returns the planner's row estimate for a queryset (PostgreSQL EXPLAIN), without scanning it.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator whose total count is cached per normalized filter (the SQL of the
+    unordered queryset) for COUNT_CACHE_TIMEOUT seconds. On PostgreSQL, results larger
+    than COUNT_ESTIMATE_THRESHOLD use the planner estimate instead of COUNT(*).
+    """
+    count_is_exact = True
+
+    def __init__(self, *args, count_version=None, known_count=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_version = count_version
+        self.known_count = known_count
+
+    def get_count_cache_key(self):
+        # Key on what the COUNT query depends on: annotations only selected for display
+        # (e.g. prices computed against the request time) and deferred columns are left out
+        queryset = self.object_list.order_by().values('pk')
+        queryset.query.set_annotation_mask(())
+        sql, params = queryset.query.sql_with_params()
+        raw = f"{queryset.db}:{self.count_version}:{sql}:{params}"
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return f"pagination_count_{digest}"
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if not hasattr(self.object_list, "query"):
+            return super().count
+
+        key = self.get_count_cache_key()
+        cached = cache.get(key)
+        if cached is not None:
+            total, self.count_is_exact = cached
+            return total
+
+        total = None
+        threshold = settings.COUNT_ESTIMATE_THRESHOLD
+        if threshold and connections[self.object_list.db].vendor == "postgresql":
+            try:
+                estimate = estimate_count(self.object_list)
+                if estimate >= threshold:
+                    total, self.count_is_exact = estimate, False
+            except Exception:
+                logger.warning("Count estimate failed, falling back to COUNT(*)", exc_info=True)
+
+        if total is None:
+            total, self.count_is_exact = self.object_list.count(), True
+
+        cache.set(key, (total, self.count_is_exact), timeout=settings.COUNT_CACHE_TIMEOUT)
+        return total
+
+
+class CachedCountPagination(PageNumberPagination):
+    """
+    Page number pagination backed by CachedCountPaginator. Responses report whether
+    `count` is exact in `count_is_exact`. Views may define `get_count_version()`
+    (e.g. a cache generation) so writes invalidate cached counts before the TTL, or
+    `get_pagination_count()` when they already know the total (no COUNT, no cache).
+    """
+    django_paginator_class = CachedCountPaginator
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count_version = view.get_count_version() if hasattr(view, 'get_count_version') else None
+        known_count = view.get_pagination_count() if hasattr(view, 'get_pagination_count') else None
+        self.django_paginator_class = partial(
+            CachedCountPaginator, count_version=count_version, known_count=known_count
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_is_exact': self.page.paginator.count_is_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_exact'] = {
+            'type': 'boolean',
+            'example': True,
+        }
+        return response_schema
@@ -0,0 +1,29 @@
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsetMixin:
+    """
+    Narrows a serializer to the field names passed in `context['fields']` (e.g. from `?fields=id,name`).
+    Views opt in by putting the requested names in the serializer context.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if not requested:
+            return
+
+        unknown = set(requested) - set(self.fields)
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+        for name in set(self.fields) - set(requested):
+            self.fields.pop(name)
+
+
+def parse_fields_param(request, param='fields'):
+    """
+    Returns the list of field names in a comma separated query param, or None when absent.
+    """
+    raw = request.query_params.get(param, '') if request is not None else ''
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    return names or None
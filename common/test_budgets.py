@@ -0,0 +1,194 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+from cart.models import Cart, CartItem
+from common.budgets import BudgetReport, measure
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+
+User = get_user_model()
+
+"""
+Query-count and latency budgets for the main API endpoints, measured in-process
+against seeded volumes. Results are written to a JSON report (see common/budgets.py).
+"""
+
+PRODUCTS = 2000
+CART_ITEMS = 200
+ORDERS = 200
+ITEMS_PER_ORDER = 3
+
+# endpoint -> (max queries, p95 latency in ms)
+BUDGETS = {
+    'products_list': (3, 150),
+    'products_detail': (2, 100),
+    'cart_list': (4, 400),
+    'cart_add': (13, 500),
+    'orders_create': (16, 500),
+    'orders_list': (5, 200),
+    'payments_initiate': (8, 150),
+    'analytics_dashboard': (12, 300),
+}
+
+
+@pytest.fixture(scope='module')
+def budget_report():
+    report = BudgetReport()
+    yield report
+    report.write()
+
+
+@pytest.fixture
+def seeded(budget_report):
+    user = User.objects.create_user(email='budget@example.com', username='budget', password='pass')
+    admin = User.objects.create_user(email='admin@example.com', username='admin', password='pass', is_staff=True)
+
+    categories = [Category.objects.create(name=f"Category {i}") for i in range(10)]
+    Product.objects.bulk_create([
+        Product(
+            category=categories[i % len(categories)],
+            name=f"Product {i}",
+            description="Seeded for the budget suite",
+            brand=f"Brand {i % 25}",
+            price=Decimal(1000 + i),
+            in_stock=1000,
+            rating=i % 5,
+        )
+        for i in range(PRODUCTS)
+    ])
+    products = list(Product.objects.order_by('name')[:max(CART_ITEMS, ITEMS_PER_ORDER) + 1])
+
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, product=product, quantity=1) for product in products[:CART_ITEMS]
+    ])
+
+    orders = Order.objects.bulk_create([
+        Order(
+            user=user,
+            order_number=f"ORD_SWC-BUDGET{i}",
+            subtotal=300,
+            total_amount=303,
+            price_locked_until=timezone.now() + timedelta(minutes=15),
+        )
+        for i in range(ORDERS)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, product_name=product.name, quantity=1, unit_price=product.price)
+        for order in orders
+        for product in products[:ITEMS_PER_ORDER]
+    ])
+
+    budget_report.seed = {
+        'products': PRODUCTS,
+        'cart_items': CART_ITEMS,
+        'orders': ORDERS,
+        'order_items': ORDERS * ITEMS_PER_ORDER,
+    }
+    return {'user': user, 'admin': admin, 'cart': cart, 'products': products, 'orders': orders}
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def check_budget(report, name, stats):
+    entry = report.record(name, stats, *BUDGETS[name])
+    assert entry['max_queries'] <= entry['query_budget'], entry
+    if report.enforce_latency:
+        assert entry['p95_ms'] <= entry['p95_budget_ms'], entry
+
+
+"""Tests for the product endpoint budgets (cold cache on every run)."""
+@pytest.mark.django_db
+def test_products_list_budget(seeded, budget_report):
+    client = APIClient()
+    response, stats = measure(lambda: client.get('/api/products/'), setup=cache.clear)
+    assert response.status_code == 200
+    check_budget(budget_report, 'products_list', stats)
+
+
+@pytest.mark.django_db
+def test_products_detail_budget(seeded, budget_report):
+    client = APIClient()
+    product = seeded['products'][0]
+    response, stats = measure(lambda: client.get(f'/api/products/{product.id}'), setup=cache.clear)
+    assert response.status_code == 200
+    check_budget(budget_report, 'products_detail', stats)
+
+
+"""Tests for the cart endpoint budgets."""
+@pytest.mark.django_db
+def test_cart_list_budget(seeded, budget_report):
+    client = client_for(seeded['user'])
+    response, stats = measure(lambda: client.get('/api/cart/'))
+    assert response.status_code == 200
+    assert len(response.data['items']) == CART_ITEMS
+    check_budget(budget_report, 'cart_list', stats)
+
+
+@pytest.mark.django_db
+def test_cart_add_budget(seeded, budget_report):
+    client = client_for(seeded['user'])
+    product = seeded['products'][-1]
+    response, stats = measure(
+        lambda: client.post('/api/cart/add-item', {'product_id': product.id, 'quantity': 1})
+    )
+    assert response.status_code == 200
+    check_budget(budget_report, 'cart_add', stats)
+
+
+"""Tests for the order endpoint budgets."""
+@pytest.mark.django_db
+def test_orders_create_budget(seeded, budget_report):
+    client = client_for(seeded['user'])
+    cart = seeded['cart']
+
+    def reactivate_cart():
+        Cart.objects.filter(pk=cart.pk).update(is_active=True)
+
+    response, stats = measure(
+        lambda: client.post('/api/orders/create', {
+            'shipping_address': "1 Main Street",
+            'phone_number': "08000000000",
+        }),
+        runs=10,
+        setup=reactivate_cart,
+    )
+    assert response.status_code == 201
+    check_budget(budget_report, 'orders_create', stats)
+
+
+@pytest.mark.django_db
+def test_orders_list_budget(seeded, budget_report):
+    client = client_for(seeded['user'])
+    response, stats = measure(lambda: client.get('/api/orders/orders'))
+    assert response.status_code == 200
+    assert response.data['count'] == ORDERS
+    check_budget(budget_report, 'orders_list', stats)
+
+
+"""Tests for the payment initiation budget, against the local Paystack stub."""
+@pytest.mark.django_db
+def test_payments_initiate_budget(seeded, budget_report, paystack_stub):
+    client = client_for(seeded['user'])
+    order = seeded['orders'][0]
+    response, stats = measure(lambda: client.post('/api/payments/initiate', {'order_id': order.id}))
+    assert response.status_code == 200
+    check_budget(budget_report, 'payments_initiate', stats)
+
+
+"""Tests for the analytics dashboard budget."""
+@pytest.mark.django_db
+def test_analytics_dashboard_budget(seeded, budget_report):
+    client = client_for(seeded['admin'])
+    response, stats = measure(lambda: client.get('/api/analytics/dashboard'))
+    assert response.status_code == 200
+    assert response.data['data']['total_products'] == PRODUCTS
+    check_budget(budget_report, 'analytics_dashboard', stats)
@@ -0,0 +1,17 @@
+import pytest
+from payments.paystack_service import reset_client
+from payments.paystack_stub import PaystackStub
+
+
+@pytest.fixture
+def paystack_stub(settings):
+    """
+    Runs a local Paystack stub for the test and points PAYSTACK_BASE_URL at it.
+    Tweak fault injection through its attributes (latency, error_rate, timeout_rate, ...).
+    """
+    with PaystackStub(hang=2.0, seed=0) as stub:
+        settings.PAYSTACK_BASE_URL = stub.url
+        settings.PAYSTACK_RETRY_BACKOFF = 0
+        reset_client()
+        yield stub
+    reset_client()
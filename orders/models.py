@@ -54,6 +54,9 @@ class Order(models.Model):
     # ---- Price lock window ----
     price_locked_until = models.DateTimeField(null=True, blank=True)
 
+    # Stock for the items is held for this order until it is cancelled or its lock expires unpaid
+    stock_reserved = models.BooleanField(default=False)
+
     # ---- Audit ----
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -63,6 +66,7 @@ class Order(models.Model):
         indexes = [
             models.Index(fields=["order_number"]),
             models.Index(fields=["status", "payment_status"]),
+            models.Index(fields=["stock_reserved", "price_locked_until"]),
         ]
 
     # String representation, price lock methods
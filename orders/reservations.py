@@ -0,0 +1,79 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from payments.models import Payment
+from products.inventory import release_stock
+
+from .models import Order, OrderItem
+
+
+def order_quantities(order_ids):
+    """
+    Units per product across the given orders, as {product_id: units}.
+    """
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('product_id')
+        .annotate(units=Sum('quantity'))
+        .values_list('product_id', 'units')
+    )
+    return dict(rows)
+
+
+def release_order_stock(order, status=None):
+    """
+    Returns an order's reserved stock, optionally moving it to `status`. The
+    `stock_reserved` flag is cleared with a conditional UPDATE first, so stock is
+    released at most once even if a cancel races the expiry sweep.
+    """
+    fields = {'stock_reserved': False, 'updated_at': timezone.now()}
+    if status:
+        fields['status'] = status
+
+    with transaction.atomic():
+        released = Order.objects.filter(pk=order.pk, stock_reserved=True).update(**fields)
+        if not released and status:
+            Order.objects.filter(pk=order.pk).update(status=status, updated_at=fields['updated_at'])
+        if released:
+            release_stock(order_quantities([order.pk]))
+
+    order.refresh_from_db(fields=['status', 'stock_reserved', 'updated_at'])
+    return bool(released)
+
+
+def release_expired_reservations(now=None, batch_size=None):
+    """
+    Expires unpaid pending orders whose price lock has passed and returns their stock,
+    one batch at a time in a fixed number of queries. Orders with a payment initiated
+    within ORDER_RESERVATION_PAYMENT_GRACE seconds are still being paid and keep their
+    stock. Rows locked by a concurrent sweep are skipped. Returns the number of orders expired.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.ORDER_RESERVATION_SWEEP_BATCH
+    paying = Payment.objects.filter(
+        status="initiated",
+        created_at__gte=now - timedelta(seconds=settings.ORDER_RESERVATION_PAYMENT_GRACE),
+    ).values('order_id')
+
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(
+                stock_reserved=True,
+                status=Order.Status.PENDING,
+                payment_status=Order.PaymentStatus.PENDING,
+                price_locked_until__lt=now,
+            )
+            .exclude(pk__in=paying)
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+
+        Order.objects.filter(pk__in=order_ids).update(
+            status=Order.Status.EXPIRED, stock_reserved=False, updated_at=now
+        )
+        release_stock(order_quantities(order_ids))
+    return len(order_ids)
@@ -0,0 +1,24 @@
+from celery import shared_task
+
+from .reservations import release_expired_reservations
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def release_expired_reservations_task():
+    """
+    Periodic sweep (see CELERY_BEAT_SCHEDULE) returning the stock of unpaid orders
+    whose price lock expired.
+    """
+    total = 0
+    while True:
+        expired = release_expired_reservations()
+        total += expired
+        if not expired:
+            break
+    if total:
+        logger.info(f"Released stock of {total} expired orders")
+    return total
@@ -1,3 +1,319 @@
-from django.test import TestCase
+import pytest
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from orders.models import Order
 
-# Create your tests here.
+User = get_user_model()
+
+"""
+Tests for Order functionality.
+"""
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(
+        email='testuser@example.com',
+        username='testuser',
+        password='testpass'
+    )
+
+
+def create_order(user, number):
+    return Order.objects.create(
+        user=user,
+        order_number=f"ORD_SWC-{number}",
+        subtotal=100,
+        total_amount=101,
+    )
+
+
+"""Tests for conditional GET on the order list and detail."""
+@pytest.mark.django_db
+def test_order_list_returns_304_when_unchanged(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    create_order(user, "A1")
+
+    first = client.get('/api/orders/orders')
+    assert first.status_code == 200
+    assert "Last-Modified" in first
+
+    response = client.get('/api/orders/orders', HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_order_detail_etag_changes_when_order_is_updated(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    order = create_order(user, "A2")
+
+    first = client.get(f'/api/orders/{order.id}')
+    assert first.status_code == 200
+
+    order.status = Order.Status.PROCESSING
+    order.save(update_fields=["status", "updated_at"])
+
+    response = client.get(f'/api/orders/{order.id}', HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 200
+    assert response.data['status'] == "processing"
+
+
+"""Tests for the number of queries used by the order endpoints."""
+@pytest.mark.django_db
+def test_order_create_query_count_does_not_grow_with_items(user, django_assert_max_num_queries):
+    from cart.models import Cart, CartItem
+    from products.models import Category, Product
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    category = Category.objects.create(name="Electronics")
+    cart = Cart.objects.create(user=user)
+    for i in range(5):
+        product = Product.objects.create(category=category, name=f"Product {i}", price=100, in_stock=10)
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+
+    with django_assert_max_num_queries(14):
+        response = client.post('/api/orders/create', {
+            "shipping_address": "1 Main Street",
+            "phone_number": "08000000000",
+        })
+
+    assert response.status_code == 201
+    assert len(response.data['items']) == 5
+
+
+@pytest.mark.django_db
+def test_order_list_query_count_is_constant(user, django_assert_max_num_queries):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    for i in range(5):
+        create_order(user, f"L{i}")
+
+    with django_assert_max_num_queries(4):
+        response = client.get('/api/orders/orders')
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_order_list_counts_rows_once(user):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    for i in range(3):
+        create_order(user, f"N{i}")
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/api/orders/orders')
+
+    assert response.data['count'] == 3
+    assert sum('COUNT(' in query['sql'].upper() for query in queries.captured_queries) == 1
+
+
+@pytest.mark.django_db
+def test_order_list_count_follows_new_orders_at_once(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    create_order(user, "C1")
+    assert client.get('/api/orders/orders').data['count'] == 1
+
+    create_order(user, "C2")
+    response = client.get('/api/orders/orders', {'page_size': 1, 'page': 2})
+    assert response.status_code == 200
+    assert response.data['count'] == 2
+
+
+"""Tests for stock reservation on order creation, cancel and expiry."""
+@pytest.fixture
+def cart_with_items(user):
+    from cart.models import Cart, CartItem
+    from products.models import Category, Product
+
+    category = Category.objects.create(name="Electronics")
+    products = [
+        Product.objects.create(category=category, name=f"Product {i}", price=100, in_stock=5)
+        for i in range(2)
+    ]
+    cart = Cart.objects.create(user=user)
+    for product in products:
+        CartItem.objects.create(cart=cart, product=product, quantity=2)
+    return products
+
+
+def checkout(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client.post('/api/orders/create', {
+        "shipping_address": "1 Main Street",
+        "phone_number": "08000000000",
+    })
+
+
+@pytest.mark.django_db
+def test_order_create_reserves_stock(user, cart_with_items):
+    response = checkout(user)
+
+    assert response.status_code == 201
+    assert Order.objects.get(pk=response.data['id']).stock_reserved
+    for product in cart_with_items:
+        product.refresh_from_db()
+        assert product.in_stock == 3
+
+
+@pytest.mark.django_db
+def test_order_create_fails_without_reserving_when_any_product_is_short(user, cart_with_items):
+    short = cart_with_items[1]
+    short.in_stock = 1
+    short.save()
+
+    response = checkout(user)
+
+    assert response.status_code == 409
+    assert response.data['unavailable'] == [{'product_id': str(short.id), 'name': short.name, 'available': 1}]
+    assert not Order.objects.exists()
+    cart_with_items[0].refresh_from_db()
+    assert cart_with_items[0].in_stock == 5
+
+
+@pytest.mark.django_db
+def test_reserve_stock_never_oversells():
+    from products.inventory import InsufficientStock, reserve_stock
+    from products.models import Category, Product
+
+    product = Product.objects.create(category=Category.objects.create(name="Hot"), name="Hot SKU", price=1, in_stock=3)
+
+    reserve_stock({product.pk: 2})
+    with pytest.raises(InsufficientStock):
+        reserve_stock({product.pk: 2})
+    reserve_stock({product.pk: 1})
+
+    product.refresh_from_db()
+    assert product.in_stock == 0
+
+
+@pytest.mark.django_db
+def test_cancel_releases_stock_once(user, cart_with_items):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    order_id = checkout(user).data['id']
+
+    assert client.post(f'/api/orders/{order_id}/cancel').status_code == 200
+    assert client.post(f'/api/orders/{order_id}/cancel').status_code == 400
+
+    for product in cart_with_items:
+        product.refresh_from_db()
+        assert product.in_stock == 5
+
+
+@pytest.mark.django_db
+def test_expired_unpaid_orders_release_stock(user, cart_with_items):
+    from django.utils import timezone
+    from datetime import timedelta
+    from orders.tasks import release_expired_reservations_task
+
+    order = Order.objects.get(pk=checkout(user).data['id'])
+    paid = create_order(user, "PAID")
+    Order.objects.filter(pk=paid.pk).update(
+        stock_reserved=True, payment_status=Order.PaymentStatus.SUCCESS,
+        price_locked_until=timezone.now() - timedelta(minutes=1),
+    )
+
+    assert release_expired_reservations_task.delay().get() == 0
+    Order.objects.filter(pk=order.pk).update(price_locked_until=timezone.now() - timedelta(minutes=1))
+    assert release_expired_reservations_task.delay().get() == 1
+
+    order.refresh_from_db()
+    assert order.status == Order.Status.EXPIRED
+    assert not order.stock_reserved
+    assert Order.objects.get(pk=paid.pk).stock_reserved
+    for product in cart_with_items:
+        product.refresh_from_db()
+        assert product.in_stock == 5
+
+
+"""Tests for flash-sale prices in order snapshots."""
+@pytest.mark.django_db
+def test_order_create_snapshots_flash_price(user, cart_with_items):
+    from datetime import timedelta
+    from decimal import Decimal
+    from django.utils import timezone
+
+    sale = cart_with_items[0]
+    sale.flash_price = 70
+    sale.flash_sale_ends_at = timezone.now() + timedelta(hours=1)
+    sale.save()
+
+    response = checkout(user)
+
+    assert response.status_code == 201
+    order = Order.objects.get(pk=response.data['id'])
+    lines = {item.product_id: item for item in order.items.all()}
+    assert lines[sale.pk].unit_price == Decimal("70.00")
+    assert lines[sale.pk].line_total == Decimal("140.00")
+    assert lines[cart_with_items[1].pk].unit_price == Decimal("100.00")
+    assert order.subtotal == Decimal("340.00")
+
+
+"""Tests for payments landing around the end of the price lock."""
+@pytest.mark.django_db
+def test_sweep_keeps_stock_of_orders_being_paid(user, cart_with_items):
+    from django.utils import timezone
+    from datetime import timedelta
+    from orders.reservations import release_expired_reservations
+    from payments.models import Payment
+
+    order = Order.objects.get(pk=checkout(user).data['id'])
+    Payment.objects.create(user=user, order=order, amount=order.total_amount, reference="PAY-SWEEP", status="initiated")
+    Order.objects.filter(pk=order.pk).update(price_locked_until=timezone.now() - timedelta(minutes=1))
+
+    assert release_expired_reservations() == 0
+    assert Order.objects.get(pk=order.pk).stock_reserved
+
+
+@pytest.mark.django_db
+def test_payment_after_sweep_takes_stock_again(user, cart_with_items):
+    from django.utils import timezone
+    from datetime import timedelta
+    from orders.reservations import release_expired_reservations
+    from payments.models import Payment
+    from payments.services import complete_payment
+
+    order = Order.objects.get(pk=checkout(user).data['id'])
+    Order.objects.filter(pk=order.pk).update(price_locked_until=timezone.now() - timedelta(minutes=1))
+    assert release_expired_reservations() == 1
+
+    payment = Payment.objects.create(user=user, order=order, amount=order.total_amount, reference="PAY-LATE", status="initiated")
+    complete_payment(payment)
+
+    order.refresh_from_db()
+    assert order.status == Order.Status.PROCESSING
+    assert order.stock_reserved
+    for product in cart_with_items:
+        product.refresh_from_db()
+        assert product.in_stock == 3
+
+
+@pytest.mark.django_db
+def test_payment_after_sweep_cancels_order_when_stock_was_sold(user, cart_with_items):
+    from django.utils import timezone
+    from datetime import timedelta
+    from orders.reservations import release_expired_reservations
+    from payments.models import Payment
+    from payments.services import complete_payment
+    from products.models import Product
+
+    order = Order.objects.get(pk=checkout(user).data['id'])
+    Order.objects.filter(pk=order.pk).update(price_locked_until=timezone.now() - timedelta(minutes=1))
+    assert release_expired_reservations() == 1
+    Product.objects.filter(pk=cart_with_items[0].pk).update(in_stock=1)
+
+    payment = Payment.objects.create(user=user, order=order, amount=order.total_amount, reference="PAY-SOLD", status="initiated")
+    complete_payment(payment)
+
+    order.refresh_from_db()
+    assert order.status == Order.Status.CANCELLED
+    assert not order.stock_reserved
+    assert Product.objects.get(pk=cart_with_items[1].pk).in_stock == 5
@@ -8,16 +8,23 @@ from django.shortcuts import get_object_or_404
 from django.db import transaction
 from .models import Order, OrderItem
 from cart.models import Cart
+from cart.store import get_cart_store
 from .serializers import OrderSerializer, CreateOrderSerializer
 from drf_spectacular.utils import extend_schema
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
+from common.conditional import ConditionalGetMixin
+from common.pagination import CachedCountPagination
+from products.inventory import InsufficientStock, reserve_stock
+from products.pricing import effective_prices
+from .reservations import release_order_stock
 
 @extend_schema(tags=['Orders'],)
-class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+class OrderViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CachedCountPagination
     
     """Ensures users only see their own orders."""
     def get_queryset(self):
@@ -28,6 +35,11 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
         """Create order from cart"""
         serializer = CreateOrderSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+
+        # Write a Redis-held cart behind to the tables before reading them
+        store = get_cart_store()
+        if store is not None:
+            store.flush(request.user.pk)
         
         cart = get_object_or_404(Cart, user=request.user)
 
@@ -50,52 +62,81 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
         lock_duration = timedelta(minutes=15)
 
         # Create order within a transaction
-        with transaction.atomic():
-            # Calculate subtotal for order
-            subtotal = sum(
-                cart_item.product.price * cart_item.quantity 
-                for cart_item in cart.items.all()
-            )
+        try:
+            with transaction.atomic():
+                # Load the cart lines and their products once
+                cart_items = list(cart.items.select_related('product'))
 
-            TAX_RATE = Decimal("0.01")
-            tax = subtotal * TAX_RATE
-            shipping_cost = Decimal("0.00")
-            total_amount = subtotal + shipping_cost + tax
-            
-            # Create order
-            order = Order.objects.create(
+                # Snapshot effective (flash-sale aware) prices, all as of one instant
+                prices = effective_prices({cart_item.product_id for cart_item in cart_items}, timezone.now())
 
-                    user=request.user,
-                    order_number=f"ORD_SWC-{uuid.uuid4().hex[:10].upper()}",
-                    subtotal=subtotal,
-                    tax=tax,
-                    total_amount=total_amount,          
-                    price_locked_until=timezone.now() + lock_duration,
-                    shipping_address=serializer.validated_data.get(
-                        "shipping_address", "123 Main Street"
-                    ),
-                    phone_number=serializer.validated_data.get("phone_number", "234567890")
+                # Calculate subtotal for order
+                subtotal = sum(
+                    prices[cart_item.product_id] * cart_item.quantity 
+                    for cart_item in cart_items
+                )
+
+                TAX_RATE = Decimal("0.01")
+                tax = subtotal * TAX_RATE
+                shipping_cost = Decimal("0.00")
+                total_amount = subtotal + shipping_cost + tax
+                
+                # Create order; its stock is held until the price lock expires
+                order = Order.objects.create(
+
+                        user=request.user,
+                        order_number=f"ORD_SWC-{uuid.uuid4().hex[:10].upper()}",
+                        subtotal=subtotal,
+                        tax=tax,
+                        total_amount=total_amount,          
+                        price_locked_until=timezone.now() + lock_duration,
+                        stock_reserved=True,
+                        shipping_address=serializer.validated_data.get(
+                            "shipping_address", "123 Main Street"
+                        ),
+                        phone_number=serializer.validated_data.get("phone_number", "234567890")
 
-            )
-            
-            # Create order items from cart
-            for cart_item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    product_name=cart_item.product.name,
-                    quantity=cart_item.quantity,
-                    unit_price=cart_item.product.price
                 )
-            
-            # Clear the cart after order creation
-            cart.is_active = False
-            cart.save(update_fields=['is_active'])
-            
+                
+                # Create order items from cart
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product=cart_item.product,
+                        product_name=cart_item.product.name,
+                        quantity=cart_item.quantity,
+                        unit_price=prices[cart_item.product_id],
+                        line_total=prices[cart_item.product_id] * cart_item.quantity
+                    )
+                    for cart_item in cart_items
+                ])
+
+                # Reserve stock last, so the product rows stay locked only until commit
+                quantities = {}
+                for cart_item in cart_items:
+                    quantities[cart_item.product_id] = quantities.get(cart_item.product_id, 0) + cart_item.quantity
+                reserve_stock(quantities)
+                
+                # Clear the cart after order creation
+                cart.is_active = False
+                cart.save(update_fields=['is_active'])
+        except InsufficientStock as exc:
+            names = {cart_item.product_id: cart_item.product.name for cart_item in cart_items}
             return Response(
-                OrderSerializer(order).data,
-                status=status.HTTP_201_CREATED
+                {
+                    'error': 'Insufficient stock',
+                    'unavailable': [
+                        {'product_id': str(pk), 'name': names.get(pk), 'available': available}
+                        for pk, available in exc.shortages.items()
+                    ],
+                },
+                status=status.HTTP_409_CONFLICT
             )
+
+        return Response(
+            OrderSerializer(order).data,
+            status=status.HTTP_201_CREATED
+        )
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -114,15 +155,8 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        with transaction.atomic():
-            # Restore stock
-            for item in order.items.all():
-                product = item.product
-                product.stock_quantity += item.quantity
-                product.save()
-            
-            order.status = 'cancelled'
-            order.save()
+        # Return the reserved stock
+        release_order_stock(order, status=Order.Status.CANCELLED)
         
         return Response(
             OrderSerializer(order).data,
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from payments.paystack_stub import PaystackStub
+
+
+class Command(BaseCommand):
+    help = "Run a local Paystack stub for load and integration testing (set PAYSTACK_BASE_URL to its URL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8090)
+        parser.add_argument("--latency-ms", type=float, default=0, help="Fixed delay added to every response")
+        parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra delay, up to this value")
+        parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered with a 500")
+        parser.add_argument("--timeout-rate", type=float, default=0, help="Fraction of requests held for --hang-seconds")
+        parser.add_argument("--hang-seconds", type=float, default=30)
+        parser.add_argument("--decline-rate", type=float, default=0, help="Fraction of verifications reporting a failed charge")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        stub = PaystackStub(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency_ms"] / 1000,
+            jitter=options["jitter_ms"] / 1000,
+            error_rate=options["error_rate"],
+            timeout_rate=options["timeout_rate"],
+            hang=options["hang_seconds"],
+            decline_rate=options["decline_rate"],
+            seed=options["seed"],
+        )
+        stub.start()
+        self.stdout.write(self.style.SUCCESS(f"Paystack stub listening on {stub.url}"))
+        self.stdout.write(f"Run the API with PAYSTACK_BASE_URL={stub.url}")
+        try:
+            stub.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.stop()
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaystackEvent',
+            fields=[
+                ('event_id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'paystack_events',
+            },
+        ),
+    ]
@@ -35,3 +35,15 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"{self.order.order_number} - {self.status}"
+
+
+class PaystackEvent(models.Model):
+    """Webhook events already applied, keyed by `<event>:<transaction id>` for deduplication"""
+    event_id = models.CharField(max_length=64, primary_key=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'paystack_events'
+
+    def __str__(self):
+        return self.event_id
@@ -1,77 +1,233 @@
 import requests
 from django.conf import settings
-import uuid
+from requests.adapters import HTTPAdapter
+import hashlib
+import hmac
+import random
+import threading
+import time
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PaystackError(Exception):
+    """Paystack answered with an error, or could not be reached"""
+
+
+class PaystackUnavailable(PaystackError):
+    """Paystack timed out, failed with a 5xx, or the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `threshold` consecutive gateway failures. Once `reset_timeout`
+    seconds have passed, a single trial request is let through: success closes
+    the circuit, failure opens it again.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+_session = None
+_breaker = None
+_client_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Process-wide keep-alive session, so Paystack calls reuse pooled connections
+    instead of paying a TCP+TLS handshake each time.
+    """
+    global _session
+    with _client_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=settings.PAYSTACK_POOL_SIZE,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def get_breaker():
+    global _breaker
+    with _client_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                threshold=settings.PAYSTACK_BREAKER_THRESHOLD,
+                reset_timeout=settings.PAYSTACK_BREAKER_RESET_TIMEOUT,
+            )
+        return _breaker
+
+
+def reset_client():
+    """Drops the pooled session and breaker state (settings changes, tests)."""
+    global _session, _breaker
+    with _client_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _breaker = None
+
+
+def verify_webhook_signature(body, signature):
+    """
+    Checks the `x-paystack-signature` header: the HMAC-SHA512 of the raw request body
+    keyed with the secret key. No call to Paystack is needed.
+    """
+    if not signature or not settings.PAYSTACK_SECRET_KEY:
+        return False
+    expected = hmac.new(settings.PAYSTACK_SECRET_KEY.encode("utf-8"), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
 
 
 class PaystackService:
     """Service for handling Paystack payment operations"""
-    
-    BASE_URL = "https://api.paystack.co"
-    
+
     def __init__(self):
+        self.base_url = settings.PAYSTACK_BASE_URL
         self.secret_key = settings.PAYSTACK_SECRET_KEY
         self.headers = {
             "Authorization": f"Bearer {self.secret_key}",
             "Content-Type": "application/json"
         }
-    
-    def initialize_payment(self, email, amount, order_id):
+        self.timeout = (settings.PAYSTACK_CONNECT_TIMEOUT, settings.PAYSTACK_READ_TIMEOUT)
+        self.session = get_session()
+        self.breaker = get_breaker()
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+        return random.uniform(0, settings.PAYSTACK_RETRY_BACKOFF * 2 ** (attempt - 1))
+
+    def request(self, method, path, retries=0, **kwargs):
+        """
+        Sends a request through the pooled session and returns the decoded JSON body.
+
+        Timeouts, connection errors and 5xx responses count against the circuit breaker
+        and are retried up to `retries` times (only pass retries for idempotent calls).
+        Raises PaystackUnavailable when they persist or the circuit is open.
         """
-        Initialize a payment transaction
-        
+        url = f"{self.base_url}{path}"
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(self.backoff(attempt))
+            if not self.breaker.allow():
+                raise PaystackUnavailable("Paystack circuit breaker is open")
+
+            try:
+                response = self.session.request(
+                    method, url, headers=self.headers, timeout=self.timeout, **kwargs
+                )
+            except requests.RequestException as exc:
+                self.breaker.record_failure()
+                error = PaystackUnavailable(f"Paystack request failed: {exc}")
+            else:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise PaystackError(f"Invalid Paystack response ({response.status_code})")
+                self.breaker.record_failure()
+                error = PaystackUnavailable(f"Paystack returned {response.status_code}")
+
+            logger.warning(f"{method} {path} attempt {attempt + 1} failed: {error}")
+        raise error
+
+    def initialize_payment(self, email, amount, reference, callback_url, metadata=None):
+        """
+        Initialize a payment transaction (not retried, so a charge is never initialized twice)
+
         Args:
             email: Customer's email
-            amount: Amount in kobo (multiply naira by 100)
-            order_id: Order reference ID
-        
+            amount: Amount in naira, sent to Paystack in kobo
+            reference: Unique payment reference
+            callback_url: URL Paystack redirects the customer to
+            metadata: Optional extra data stored with the transaction
+
         Returns:
             dict: Response from Paystack API
         """
-        url = f"{self.BASE_URL}/transaction/initialize"
-        
-        # Generate unique reference
-        reference = f"ORD-{order_id}-{uuid.uuid4().hex[:8].upper()}"
-        
         payload = {
             "email": email,
             "amount": int(amount * 100),  # Convert to kobo
             "reference": reference,
-            "callback_url": f"{settings.FRONTEND_URL}/payment/callback",
-            "metadata": {
-                "order_id": str(order_id)
-            }
+            "callback_url": callback_url,
         }
-        
-        response = requests.post(url, json=payload, headers=self.headers)
-        return response.json()
-    
+        if metadata:
+            payload["metadata"] = metadata
+
+        return self.request("POST", "/transaction/initialize", json=payload)
+
     def verify_payment(self, reference):
         """
-        Verify a payment transaction
-        
+        Verify a payment transaction, retrying transient failures with jittered backoff
+
         Args:
             reference: Payment reference
-        
+
         Returns:
             dict: Response from Paystack API
         """
-        url = f"{self.BASE_URL}/transaction/verify/{reference}"
-        response = requests.get(url, headers=self.headers)
-        return response.json()
-    
+        return self.request(
+            "GET", f"/transaction/verify/{reference}", retries=settings.PAYSTACK_VERIFY_RETRIES
+        )
+
     def get_payment_status(self, reference):
         """
         Get payment status
-        
+
         Args:
             reference: Payment reference
-        
+
         Returns:
             str: Payment status (success, failed, pending)
         """
         result = self.verify_payment(reference)
-        
+
         if result.get('status') and result.get('data'):
             return result['data'].get('status', 'pending')
-        
+
         return 'failed'
@@ -0,0 +1,163 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+import uuid
+
+
+class PaystackStub:
+    """
+    Lightweight stand-in for the Paystack API, serving `POST /transaction/initialize`
+    and `GET /transaction/verify/<reference>` from memory so payments can be load-tested
+    and integration-tested without a network.
+
+    Faults are injected per request: `latency` (+ random `jitter`) seconds of delay,
+    `error_rate` of 500 responses, `timeout_rate` of requests held for `hang` seconds
+    (long enough to trip the client timeout) and `decline_rate` of verifications
+    reporting a failed charge. Setting `checkout_status` (e.g. "ongoing", "abandoned")
+    reports every transaction as still on the checkout page. Point PAYSTACK_BASE_URL at
+    `url` to use it.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 timeout_rate=0.0, hang=30.0, decline_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.decline_rate = decline_rate
+        self.checkout_status = None
+        self.random = random.Random(seed)
+        self.transactions = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                stub.handle(self, "POST")
+
+            def do_GET(self):
+                stub.handle(self, "GET")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def wait(self):
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def handle(self, handler, method):
+        path = handler.path.split("?")[0].rstrip("/")
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = json.loads(handler.rfile.read(length) or b"{}") if length else {}
+        with self._lock:
+            self.requests.append((method, path))
+            roll = self.random.random()
+            delay = self.latency + self.random.random() * self.jitter
+
+        if roll < self.timeout_rate:
+            time.sleep(self.hang)
+        elif delay:
+            time.sleep(delay)
+
+        if roll < self.timeout_rate + self.error_rate:
+            return self.respond(handler, 500, {"status": False, "message": "Stub server error"})
+        if method == "POST" and path == "/transaction/initialize":
+            return self.respond(handler, 200, self.initialize(body))
+        if method == "GET" and path.startswith("/transaction/verify/"):
+            reference = path.rsplit("/", 1)[1]
+            status, payload = self.verify(reference)
+            return self.respond(handler, status, payload)
+        return self.respond(handler, 404, {"status": False, "message": "Not found"})
+
+    def initialize(self, body):
+        reference = body.get("reference") or uuid.uuid4().hex
+        access_code = uuid.uuid4().hex[:15]
+        with self._lock:
+            self.transactions[reference] = {
+                "amount": int(body.get("amount") or 0),
+                "email": body.get("email"),
+                "access_code": access_code,
+            }
+        return {
+            "status": True,
+            "message": "Authorization URL created",
+            "data": {
+                "authorization_url": f"{self.url}/checkout/{access_code}",
+                "access_code": access_code,
+                "reference": reference,
+            },
+        }
+
+    def verify(self, reference):
+        with self._lock:
+            transaction = self.transactions.get(reference)
+            declined = self.random.random() < self.decline_rate
+            checkout_status = self.checkout_status
+        if transaction is None:
+            return 400, {"status": False, "message": "Transaction reference not found"}
+        if checkout_status:
+            charge_status, gateway_response = checkout_status, "The transaction was not completed"
+        elif declined:
+            charge_status, gateway_response = "failed", "Declined"
+        else:
+            charge_status, gateway_response = "success", "Successful"
+        return 200, {
+            "status": True,
+            "message": "Verification successful",
+            "data": {
+                "id": abs(hash(reference)) % 10 ** 9,
+                "status": charge_status,
+                "reference": reference,
+                "amount": transaction["amount"],
+                "currency": "NGN",
+                "gateway_response": gateway_response,
+                "customer": {"email": transaction["email"]},
+            },
+        }
+
+    @staticmethod
+    def respond(handler, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        try:
+            handler.send_response(status)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. timed out on a hung request)
+            pass
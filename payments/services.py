@@ -0,0 +1,141 @@
+from django.db import transaction
+from django.utils import timezone
+from cart.models import Cart, CartItem
+from orders.models import Order
+from orders.reservations import order_quantities
+from products.inventory import InsufficientStock, reserve_stock
+
+from .models import Payment, PaystackEvent
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def reserve_released_orders(order_ids, now):
+    """
+    Takes stock again for paid orders whose reservation was released (their price lock
+    expired before the payment landed). An order that can no longer be filled is
+    cancelled and logged for a refund instead of being shipped from stock sold since.
+    """
+    for order_id in Order.objects.filter(pk__in=order_ids, stock_reserved=False).values_list("pk", flat=True):
+        try:
+            reserve_stock(order_quantities([order_id]))
+        except InsufficientStock as exc:
+            Order.objects.filter(pk=order_id).update(status=Order.Status.CANCELLED, updated_at=now)
+            logger.error(f"Order {order_id} was paid after its stock was released and is short on {len(exc.shortages)} product(s); refund required")
+        else:
+            Order.objects.filter(pk=order_id).update(stock_reserved=True, updated_at=now)
+
+
+def complete_payments(payment_ids):
+    """
+    Marks payments successful, moves their orders to processing and clears the
+    customers' active carts, in a constant number of queries (plus a few per order
+    whose stock had already been released). Payments that already succeeded are
+    skipped, so repeated calls are harmless. Returns the completed count.
+    """
+    with transaction.atomic():
+        pending = list(
+            Payment.objects.select_for_update()
+            .filter(pk__in=payment_ids)
+            .exclude(status="success")
+            .values_list("pk", "order_id", "user_id")
+        )
+        if not pending:
+            return 0
+
+        ids, order_ids, user_ids = (set(column) for column in zip(*pending))
+        now = timezone.now()
+        Payment.objects.filter(pk__in=ids).update(status="success", updated_at=now)
+        Order.objects.filter(pk__in=order_ids).update(
+            payment_status="completed", status="processing", updated_at=now
+        )
+        reserve_released_orders(order_ids, now)
+
+        # Clear users' active carts
+        CartItem.objects.filter(cart__user_id__in=user_ids, cart__is_active=True).delete()
+        Cart.objects.filter(user_id__in=user_ids, is_active=True).update(is_active=False, updated_at=now)
+    return len(ids)
+
+
+def complete_payment(payment):
+    """
+    Marks a payment successful, moves its order to processing and clears the
+    customer's active cart. Safe to call more than once for the same payment.
+    """
+    complete_payments([payment.pk])
+    payment.refresh_from_db(fields=["status"])
+    return payment
+
+
+def fail_payment(payment):
+    """
+    Marks a payment failed unless it already succeeded.
+    """
+    Payment.objects.filter(pk=payment.pk).exclude(status="success").update(status="failed")
+    payment.refresh_from_db(fields=["status"])
+    return payment
+
+
+# Paystack transaction statuses that end a payment attempt without a charge. Anything
+# else but "success" (ongoing, pending, abandoned, ...) means the customer may still pay.
+FAILED_CHARGE_STATUSES = ("failed", "reversed")
+
+
+def apply_verification(payment, result):
+    """
+    Applies a Paystack verify response to the payment and returns its new status.
+    A transaction still in progress leaves the payment unsettled.
+    """
+    data = result.get("data") or {}
+    if not result.get("status"):
+        return payment.status
+    if data.get("status") == "success":
+        return complete_payment(payment).status
+    if data.get("status") in FAILED_CHARGE_STATUSES:
+        return fail_payment(payment).status
+    return payment.status
+
+
+def event_key(event):
+    data = event.get("data") or {}
+    if not isinstance(data, dict) or data.get("id") is None:
+        return None
+    return f"{event.get('event')}:{data['id']}"[:64]
+
+
+def apply_webhook_events(events):
+    """
+    Applies a batch of Paystack webhook events, skipping ones already recorded in
+    PaystackEvent. `charge.success` events whose amount matches the payment complete
+    it; the whole batch costs a fixed number of queries and no outbound HTTP.
+    """
+    keyed = {}
+    for event in events:
+        key = event_key(event) if isinstance(event, dict) else None
+        if key:
+            keyed[key] = event
+
+    seen = set(PaystackEvent.objects.filter(event_id__in=keyed).values_list("event_id", flat=True))
+    fresh = {key: event for key, event in keyed.items() if key not in seen}
+
+    charges = {
+        event["data"].get("reference"): event["data"]
+        for event in fresh.values()
+        if event.get("event") == "charge.success" and event["data"].get("status") == "success"
+    }
+    payment_ids = []
+    for pk, reference, amount in Payment.objects.filter(reference__in=charges).values_list("pk", "reference", "amount"):
+        if int(amount * 100) == int(charges[reference].get("amount") or 0):
+            payment_ids.append(pk)
+        else:
+            logger.warning(f"Ignoring charge.success for {reference}: amount does not match payment")
+
+    with transaction.atomic():
+        PaystackEvent.objects.bulk_create(
+            [PaystackEvent(event_id=key) for key in fresh], ignore_conflicts=True
+        )
+        completed = complete_payments(payment_ids)
+
+    return {"received": len(keyed), "duplicates": len(seen), "completed": completed}
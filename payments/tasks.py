@@ -0,0 +1,58 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+import random
+
+from .models import Payment
+from .paystack_service import PaystackService, PaystackUnavailable
+from .services import apply_verification
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ("success", "failed")
+
+
+def queued_key(reference):
+    return f"payment_verify_queued_{reference}"
+
+
+def enqueue_verification(reference):
+    """
+    Queues verification of a payment unless one is already queued for it, so polling
+    clients and repeated Paystack callbacks do not pile up duplicate tasks.
+    """
+    if cache.add(queued_key(reference), 1, timeout=settings.PAYMENT_VERIFY_DEDUPE_TIMEOUT):
+        verify_payment_task.delay(reference)
+        return True
+    return False
+
+
+@shared_task(bind=True, max_retries=None, acks_late=True)
+def verify_payment_task(self, reference):
+    """
+    Verifies a payment with Paystack and applies the result. Gateway outages are retried
+    with jittered exponential backoff up to PAYMENT_VERIFY_MAX_RETRIES times; the payment
+    is left untouched if they persist, so a later poll or callback can verify it again.
+    A failed payment is verified again too (the callback re-checks it), only success is final here.
+    """
+    payment = Payment.objects.filter(reference=reference).first()
+    if payment is None or payment.status == "success":
+        cache.delete(queued_key(reference))
+        return payment.status if payment else None
+
+    try:
+        result = PaystackService().verify_payment(reference)
+    except PaystackUnavailable as exc:
+        if self.request.retries >= settings.PAYMENT_VERIFY_MAX_RETRIES:
+            logger.error(f"Giving up verifying payment {reference}: {exc}")
+            cache.delete(queued_key(reference))
+            return payment.status
+        countdown = random.uniform(0, 2 ** self.request.retries)
+        raise self.retry(exc=exc, countdown=countdown)
+
+    status = apply_verification(payment, result)
+    cache.delete(queued_key(reference))
+    logger.info(f"Payment {reference} verified: {status}")
+    return status
@@ -1,3 +1,319 @@
-from django.test import TestCase
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from orders.models import Order
+from payments.models import Payment
 
-# Create your tests here.
+User = get_user_model()
+
+"""
+Tests for Payment functionality, against the local Paystack stub.
+"""
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(
+        email='testuser@example.com',
+        username='testuser',
+        password='testpass'
+    )
+
+
+@pytest.fixture
+def order(user):
+    return Order.objects.create(
+        user=user,
+        order_number="ORD_SWC-PAY1",
+        subtotal=100,
+        total_amount=101,
+        price_locked_until=timezone.now() + timedelta(minutes=15),
+    )
+
+
+def initiate(user, order):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client.post('/api/payments/initiate', {'order_id': order.id})
+
+
+"""Tests for initiating and confirming a payment."""
+@pytest.mark.django_db
+def test_initiate_returns_authorization_url_from_gateway(paystack_stub, user, order):
+    response = initiate(user, order)
+
+    assert response.status_code == 200
+    assert response.data['authorization_url'].startswith(paystack_stub.url)
+    assert paystack_stub.transactions[response.data['reference']]['amount'] == 10100
+
+
+@pytest.mark.django_db
+def test_callback_marks_order_paid_after_verification(paystack_stub, user, order):
+    reference = initiate(user, order).data['reference']
+
+    response = APIClient().get('/api/payments/paystack/callback', {'reference': reference})
+
+    # Tasks run eagerly in tests, so the queued verification has already settled
+    assert response.status_code == 200
+    assert response.data['status'] == "success"
+    order.refresh_from_db()
+    assert order.payment_status == "completed"
+    assert ('GET', f'/transaction/verify/{reference}') in paystack_stub.requests
+
+
+@pytest.mark.django_db
+def test_callback_fails_declined_charge(paystack_stub, user, order):
+    reference = initiate(user, order).data['reference']
+    paystack_stub.decline_rate = 1.0
+
+    response = APIClient().get('/api/payments/paystack/callback', {'reference': reference})
+
+    assert response.status_code == 200
+    assert response.data['status'] == "failed"
+    assert Payment.objects.get(reference=reference).status == "failed"
+
+
+@pytest.mark.django_db
+def test_initiate_leaves_paid_order_with_lapsed_lock_alone(user, order):
+    from products.models import Category, Product
+    from orders.models import OrderItem
+
+    product = Product.objects.create(category=Category.objects.create(name="Kitchen"), name="Kettle", price=100, in_stock=5)
+    OrderItem.objects.create(order=order, product=product, quantity=3, unit_price=100, line_total=300)
+    Order.objects.filter(pk=order.pk).update(
+        status=Order.Status.PROCESSING, payment_status=Order.PaymentStatus.SUCCESS, stock_reserved=True,
+        price_locked_until=timezone.now() - timedelta(minutes=1),
+    )
+
+    response = initiate(user, order)
+
+    assert response.status_code == 400
+    order.refresh_from_db()
+    assert order.status == Order.Status.PROCESSING
+    assert order.stock_reserved
+    product.refresh_from_db()
+    assert product.in_stock == 5
+
+
+@pytest.mark.django_db
+def test_initiate_reports_gateway_errors(paystack_stub, user, order):
+    paystack_stub.error_rate = 1.0
+
+    response = initiate(user, order)
+
+    assert response.status_code == 503
+
+
+"""Tests for the pooled gateway client: timeouts, retries and circuit breaker."""
+@pytest.mark.django_db
+def test_initiate_times_out_instead_of_hanging(paystack_stub, settings, user, order):
+    settings.PAYSTACK_READ_TIMEOUT = 0.2
+    paystack_stub.timeout_rate = 1.0
+
+    response = initiate(user, order)
+
+    assert response.status_code == 503
+    # Initialization is not idempotent, so it is never retried
+    assert paystack_stub.requests.count(('POST', '/transaction/initialize')) == 1
+
+
+@pytest.mark.django_db
+def test_verify_retries_transient_failures(paystack_stub, settings, user, order):
+    settings.PAYSTACK_VERIFY_RETRIES = 2
+    settings.PAYMENT_VERIFY_MAX_RETRIES = 0
+    reference = initiate(user, order).data['reference']
+    paystack_stub.error_rate = 1.0
+
+    response = APIClient().get('/api/payments/paystack/callback', {'reference': reference})
+
+    assert response.status_code == 202
+    assert response.data['status'] == "pending"
+    assert paystack_stub.requests.count(('GET', f'/transaction/verify/{reference}')) == 3
+    assert Payment.objects.get(reference=reference).status == "initiated"
+
+
+@pytest.mark.django_db
+def test_circuit_breaker_fails_fast_then_recovers(paystack_stub, settings):
+    from payments.paystack_service import PaystackService, PaystackUnavailable, get_breaker
+
+    settings.PAYSTACK_BREAKER_THRESHOLD = 2
+    settings.PAYSTACK_BREAKER_RESET_TIMEOUT = 60
+    settings.PAYSTACK_VERIFY_RETRIES = 0
+    paystack_stub.error_rate = 1.0
+
+    for _ in range(2):
+        with pytest.raises(PaystackUnavailable):
+            PaystackService().verify_payment("REF")
+    with pytest.raises(PaystackUnavailable):
+        PaystackService().verify_payment("REF")
+    assert len(paystack_stub.requests) == 2
+
+    # After the reset timeout a trial request closes the circuit again
+    paystack_stub.error_rate = 0.0
+    get_breaker().opened_at -= 60
+    assert PaystackService().verify_payment("REF")['status'] is False
+    assert get_breaker().state == "closed"
+
+
+def test_session_is_shared_across_service_instances():
+    from payments.paystack_service import PaystackService
+
+    assert PaystackService().session is PaystackService().session
+
+
+"""Tests for the asynchronous verification pipeline."""
+@pytest.mark.django_db
+def test_verification_task_retries_until_gateway_recovers(paystack_stub, settings, user, order):
+    from payments.tasks import verify_payment_task
+
+    settings.PAYSTACK_VERIFY_RETRIES = 0
+    settings.PAYMENT_VERIFY_MAX_RETRIES = 3
+    reference = initiate(user, order).data['reference']
+    # Fail twice, then succeed
+    paystack_stub.error_rate = 1.0
+    original = paystack_stub.handle
+
+    def flaky(handler, method):
+        if len(paystack_stub.requests) >= 3:
+            paystack_stub.error_rate = 0.0
+        return original(handler, method)
+
+    paystack_stub.handle = flaky
+
+    assert verify_payment_task.delay(reference).get() == "success"
+    assert paystack_stub.requests.count(('GET', f'/transaction/verify/{reference}')) == 3
+
+
+@pytest.mark.django_db
+def test_polling_queues_one_verification_per_reference(paystack_stub, settings, user, order, monkeypatch):
+    from payments import tasks
+
+    reference = initiate(user, order).data['reference']
+    queued = []
+    monkeypatch.setattr(tasks.verify_payment_task, 'delay', queued.append)
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    for _ in range(3):
+        response = client.get('/api/payments/verify', {'reference': reference})
+        assert response.status_code == 202
+
+    assert queued == [reference]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("checkout_status", ["ongoing", "pending", "abandoned"])
+def test_polling_during_checkout_leaves_payment_unsettled(paystack_stub, user, order, checkout_status):
+    reference = initiate(user, order).data['reference']
+    paystack_stub.checkout_status = checkout_status
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    response = client.get('/api/payments/verify', {'reference': reference})
+
+    assert response.status_code == 202
+    assert Payment.objects.get(reference=reference).status == "initiated"
+
+    paystack_stub.checkout_status = None
+    response = APIClient().get('/api/payments/paystack/callback', {'reference': reference})
+    assert response.status_code == 200
+    assert response.data['status'] == "success"
+
+
+@pytest.mark.django_db
+def test_callback_verifies_failed_payment_again(paystack_stub, user, order):
+    reference = initiate(user, order).data['reference']
+    Payment.objects.filter(reference=reference).update(status="failed")
+
+    response = APIClient().get('/api/payments/paystack/callback', {'reference': reference})
+
+    assert response.data['status'] == "success"
+    order.refresh_from_db()
+    assert order.payment_status == "completed"
+
+
+@pytest.mark.django_db
+def test_polling_is_limited_to_own_payments(paystack_stub, user, order):
+    reference = initiate(user, order).data['reference']
+    other = User.objects.create_user(email='other@example.com', username='other', password='pass')
+    client = APIClient()
+    client.force_authenticate(user=other)
+
+    assert client.get('/api/payments/verify', {'reference': reference}).status_code == 404
+
+
+"""Tests for the Paystack webhook."""
+def post_webhook(payload, secret="sk_test_webhook", signature=None):
+    import hashlib
+    import hmac
+    import json
+
+    body = json.dumps(payload).encode()
+    if signature is None:
+        signature = hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+    return APIClient().post(
+        '/api/payments/paystack/webhook', body,
+        content_type='application/json', HTTP_X_PAYSTACK_SIGNATURE=signature,
+    )
+
+
+def charge_success(payment, transaction_id, amount=None):
+    return {
+        'event': "charge.success",
+        'data': {
+            'id': transaction_id,
+            'status': "success",
+            'reference': payment.reference,
+            'amount': amount if amount is not None else int(payment.amount * 100),
+        },
+    }
+
+
+@pytest.fixture
+def webhook_payments(settings, user):
+    settings.PAYSTACK_SECRET_KEY = "sk_test_webhook"
+    payments = []
+    for i in range(3):
+        order = Order.objects.create(
+            user=user, order_number=f"ORD_SWC-HOOK{i}", subtotal=100, total_amount=101,
+            price_locked_until=timezone.now() + timedelta(minutes=15), stock_reserved=True,
+        )
+        payments.append(Payment.objects.create(
+            user=user, order=order, amount=101, reference=f"PAY-HOOK{i}", status="initiated"
+        ))
+    return payments
+
+
+@pytest.mark.django_db
+def test_webhook_rejects_invalid_signature(webhook_payments):
+    response = post_webhook(charge_success(webhook_payments[0], 1), signature="forged")
+
+    assert response.status_code == 401
+    assert Payment.objects.get(pk=webhook_payments[0].pk).status == "initiated"
+
+
+@pytest.mark.django_db
+def test_webhook_applies_charge_success_in_bulk_once(webhook_payments, django_assert_max_num_queries):
+    events = [charge_success(payment, i) for i, payment in enumerate(webhook_payments)]
+
+    # The query count does not depend on the number of events
+    with django_assert_max_num_queries(14):
+        response = post_webhook(events)
+
+    assert response.status_code == 200
+    assert response.data == {'received': 3, 'duplicates': 0, 'completed': 3}
+    assert set(Order.objects.values_list('payment_status', flat=True)) == {"completed"}
+
+    # Paystack redelivers events; they are recognised and skipped
+    response = post_webhook(events[0])
+    assert response.data == {'received': 1, 'duplicates': 1, 'completed': 0}
+
+
+@pytest.mark.django_db
+def test_webhook_ignores_charge_with_mismatched_amount(webhook_payments):
+    response = post_webhook(charge_success(webhook_payments[0], 7, amount=100))
+
+    assert response.data['completed'] == 0
+    assert Payment.objects.get(pk=webhook_payments[0].pk).status == "initiated"
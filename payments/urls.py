@@ -1,7 +1,7 @@
 from django.urls import path, include
 from . import views
 from rest_framework.routers import DefaultRouter
-from .views import PaymentViewSet, VerifyPaymentViewSet, paystack_callback
+from .views import PaymentViewSet, VerifyPaymentViewSet, paystack_callback, paystack_webhook
 
 app_name = 'payments'
 
@@ -10,4 +10,5 @@ urlpatterns = [
     path("initiate", PaymentViewSet.as_view({'post': 'initiate'}), name="initiate-payment"),
     path("verify", VerifyPaymentViewSet.as_view({'get': 'verify'}), name="verify-payment"),
     path("paystack/callback", paystack_callback, name="paystack-callback"),
+    path("paystack/webhook", paystack_webhook, name="paystack-webhook"),
 ]
\ No newline at end of file
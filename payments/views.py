@@ -7,21 +7,22 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 import uuid
 from django.shortcuts import redirect
-from django.conf import settings
-import requests
-from django.db import transaction
-from cart.models import Cart
 from django.urls import reverse
 from drf_spectacular.utils import extend_schema
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+import json
 
 from .models import Payment
+from .paystack_service import PaystackService, PaystackError, PaystackUnavailable, verify_webhook_signature
+from .services import apply_webhook_events
+from .tasks import FINAL_STATUSES, enqueue_verification
 from .serializers import (
     PaymentSerializer,
     InitiatePaymentSerializer,
     RetryPaymentSerializer,
 )
 from orders.models import Order
+from orders.reservations import release_order_stock
 
 @extend_schema(tags=['Payments'])
 class PaymentViewSet(viewsets.ViewSet):
@@ -46,19 +47,18 @@ class PaymentViewSet(viewsets.ViewSet):
         if not order:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # Check if order has expired
-        if timezone.now() > order.price_locked_until:
-            order.status = "expired"
-            order.save(update_fields=["status"])
+        # Ensure order is still awaiting payment; anything else is left untouched
+        if order.status != Order.Status.PENDING or order.payment_status != Order.PaymentStatus.PENDING:
             return Response(
-                {"error": "Order has expired. Please create a new order."},
+                {"error": f"Order cannot be paid for (current status: {order.status})"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Ensure order is still pending
-        if order.status.lower() != "pending":
+        # Check if order has expired
+        if timezone.now() > order.price_locked_until:
+            release_order_stock(order, status=Order.Status.EXPIRED)
             return Response(
-                {"error": f"Order cannot be paid for (current status: {order.status})"},
+                {"error": "Order has expired. Please create a new order."},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
@@ -84,27 +84,21 @@ class PaymentViewSet(viewsets.ViewSet):
         # Build callback URL
         callback_url = request.build_absolute_uri(reverse("payments:paystack-callback"))
 
-        # Prepare Paystack payload
-        payload = {
-            "email": request.user.email,
-            "amount": int(order.total_amount * 100),  # Paystack expects kobo
-            "reference": str(payment.reference),
-            "callback_url": callback_url,
-        }
-
-        headers = {
-            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json",
-        }
-
         # Initialize Paystack transaction
-        response = requests.post(
-            "https://api.paystack.co/transaction/initialize",
-            json=payload,
-            headers=headers,
-            timeout=30,
-        )
-        data = response.json()
+        try:
+            data = PaystackService().initialize_payment(
+                email=request.user.email,
+                amount=order.total_amount,  # snapshot amount
+                reference=str(payment.reference),
+                callback_url=callback_url,
+            )
+        except PaystackUnavailable:
+            return Response(
+                {"error": "Payment gateway unavailable, please retry shortly"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except PaystackError:
+            data = {}
 
         if not data.get("status"):
             return Response({"error": "Payment initialization failed"}, status=status.HTTP_400_BAD_REQUEST)
@@ -123,54 +117,40 @@ class PaymentViewSet(viewsets.ViewSet):
         )
     
 
+def payment_status_response(payment):
+    """
+    Current state of a payment: 200 once verification settled it, 202 while it is queued.
+    """
+    payment.refresh_from_db(fields=["status"])
+    settled = payment.status in FINAL_STATUSES
+    return Response(
+        {
+            "reference": payment.reference,
+            "status": payment.status if settled else "pending",
+            "order_id": str(payment.order_id),
+        },
+        status=status.HTTP_200_OK if settled else status.HTTP_202_ACCEPTED
+    )
+
+
 @extend_schema(tags=['Payments'])
 class VerifyPaymentViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     @action(detail=False, methods=["get"])
     def verify(self, request):
+        """
+        Poll a payment's status; queues a verification with Paystack while it is unsettled.
+        """
         reference = request.query_params.get("reference")
 
-        payment = get_object_or_404(Payment, reference=reference)
+        payment = get_object_or_404(Payment, reference=reference, user=request.user)
 
-        headers = {
-            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-        }
+        if payment.status not in FINAL_STATUSES:
+            enqueue_verification(reference)
 
-        response = requests.get(
-            f"https://api.paystack.co/transaction/verify/{reference}",
-            headers=headers,
-        )
-
-        data = response.json()
-
-        if data["data"]["status"] == "success":
-            payment.status = "successful"
-            payment.gateway_response = data
-            payment.save()
-
-            order = payment.order
-            order.payment_status = "completed"
-            order.status = "processing"
-            order.save(update_fields=["payment_status", "status"])
-
-            return Response({"message": "Payment successful"})
+        return payment_status_response(payment)
 
-        payment.status = "failed"
-        payment.gateway_response = data
-        payment.save()
-
-        return Response({"message": "Payment failed"})
-
-
-def verify_paystack_payment(reference):
-    url = f"https://api.paystack.co/transaction/verify/{reference}"
-    headers = {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-    }
-    resp = requests.get(url, headers=headers, timeout=30)
-    data = resp.json()
-    return data
 
 @extend_schema(tags=['Payments'])
 @api_view(["GET"])
@@ -185,62 +165,44 @@ def paystack_callback(request):
         )
 
     # Fetch payment object
-    try:
-        payment = Payment.objects.select_related("order", "user").get(
-            reference=reference
-        )
-    except Payment.DoesNotExist:
+    payment = Payment.objects.filter(reference=reference).first()
+    if payment is None:
         return Response(
             {"error": "Payment not found"},
             status=status.HTTP_404_NOT_FOUND
         )
 
-    # Idempotency check (Paystack may retry callback)
-    if payment.status == "success":
+    # Verification runs in a worker; Paystack may retry the callback, so queue it once.
+    # A payment failed by an earlier check is verified again: the customer may have paid since
+    if payment.status != "success":
+        enqueue_verification(reference)
+
+    return payment_status_response(payment)
+
+
+@extend_schema(tags=['Payments'], request=None, responses=None)
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])  # Authenticated by the HMAC signature instead
+def paystack_webhook(request):
+    """
+    Receives Paystack events (one event, or a list of them). Duplicate deliveries are
+    ignored and charge.success completes the payment without calling Paystack back.
+    """
+    signature = request.headers.get("x-paystack-signature", "")
+    if not verify_webhook_signature(request.body, signature):
         return Response(
-            {"message": "Payment already processed"},
-            status=status.HTTP_200_OK
+            {"error": "Invalid signature"},
+            status=status.HTTP_401_UNAUTHORIZED
         )
 
-    # Verify payment with Paystack
-    result = verify_paystack_payment(reference)
-
-    if not result.get("status") or result["data"]["status"] != "success":
-        payment.status = "failed"
-        payment.save(update_fields=["status"])
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
         return Response(
-            {"status": "failed"},
+            {"error": "Invalid JSON payload"},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # ---- PAYMENT SUCCESSFUL ----
-    with transaction.atomic():
-        payment.status = "success"
-        payment.save(update_fields=["status"])
-
-        order = payment.order
-        order.payment_status = "completed"
-        order.status = "processing"
-        order.save(update_fields=["payment_status", "status"])
-
-        # Clear user's active cart
-        cart = (
-            Cart.objects
-            .filter(user=payment.user, is_active=True)
-            .prefetch_related("items")
-            .first()
-        )
-
-        if cart:
-            cart.items.all().delete()
-            cart.is_active = False
-            cart.save(update_fields=["is_active"])
-
-    return Response(
-        {
-            "status": "success",
-            "order_id": str(order.id),
-            "message": "Payment successful and cart cleared"
-        },
-        status=status.HTTP_200_OK
-    )
\ No newline at end of file
+    events = payload if isinstance(payload, list) else [payload]
+    return Response(apply_webhook_events(events), status=status.HTTP_200_OK)
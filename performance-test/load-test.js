@@ -1,16 +1,18 @@
 import http from 'k6/http';
 import { check, sleep } from 'k6';
-import { config } from "./utils/config.js";
+import { config, buildThresholds } from "./utils/config.js";
+import { exportSummary } from "./utils/summary.js";
 
 
 export const options = {
   vus: config.vus,
   duration: config.duration,
+  thresholds: buildThresholds(["products_list"]),
 };
 
 export default function () {
   // Test the /products/ endpoint
-  let res = http.get(`${config.baseUrl}/products/`);
+  let res = http.get(`${config.baseUrl}/products/`, { tags: { endpoint: "products_list" } });
 
   check(res, {
     'status is 200': (r) => r.status === 200,
@@ -19,4 +21,8 @@ export default function () {
   });
 
   sleep(1); // Wait 1s between iterations
-}
\ No newline at end of file
+}
+
+export function handleSummary(data) {
+  return exportSummary(data);
+}
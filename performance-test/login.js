@@ -1,20 +1,28 @@
 import http from "k6/http";
 import { check } from "k6";
 import { config } from "./utils/config.js";
+import { userEmail } from "./utils/auth.js";
+import { exportSummary } from "./utils/summary.js";
 
 export const options = {
   vus: config.vus,
   duration: config.duration,
+  thresholds: {
+    ...config.thresholds,
+    "http_req_duration{endpoint:auth_login}": ["p(95)<500"],
+  },
 };
 
 export default function () {
+  // Spread logins over the pre-seeded users
   const payload = JSON.stringify({
-    email: "user@example.com",
-    password: "Qwertyu1@",
+    email: userEmail((__VU - 1) % config.users.count),
+    password: config.users.password,
   });
 
   const res = http.post(`${config.baseUrl}/auth/login`, payload, {
-    headers: config.headers
+    headers: config.headers,
+    tags: { endpoint: "auth_login" },
   });
 
   check(res, {
@@ -22,3 +30,7 @@ export default function () {
     "response time is less than 200ms": (r) => r.timings.duration < 200
   });
 }
+
+export function handleSummary(data) {
+  return exportSummary(data);
+}
@@ -0,0 +1,131 @@
+import http from "k6/http";
+import { check, group, sleep } from "k6";
+import { config, buildThresholds } from "./utils/config.js";
+import { loginPool, authHeaders } from "./utils/auth.js";
+import { exportSummary } from "./utils/summary.js";
+
+// End-to-end traffic mix: anonymous browsing plus authenticated checkouts
+// (browse -> search -> add to cart -> create order -> initiate payment).
+//
+//   k6 run performance-test/scenarios.js
+//   k6 run -e BASE_URL=http://gunicorn:8000/api -e CHECKOUT_RATE=20 performance-test/scenarios.js
+
+const SEARCH_TERMS = ["samsung", "phone", "laptop", "shoes", "lotion", "desk", "blender", "pro"];
+
+function arrivalScenario(name, exec) {
+  const scenario = config.scenarios[name];
+  return {
+    executor: "ramping-arrival-rate",
+    exec,
+    startRate: scenario.startRate,
+    timeUnit: "1s",
+    stages: scenario.stages,
+    preAllocatedVUs: scenario.preAllocatedVUs,
+    maxVUs: scenario.maxVUs,
+    tags: { scenario_name: name },
+  };
+}
+
+export const options = {
+  scenarios: {
+    browse: arrivalScenario("browse", "browse"),
+    checkout: arrivalScenario("checkout", "checkout"),
+  },
+  thresholds: buildThresholds(),
+};
+
+function pick(items) {
+  return items[Math.floor(Math.random() * items.length)];
+}
+
+function listProducts(params, endpoint) {
+  const res = http.get(`${config.baseUrl}/products/?${params}`, { tags: { endpoint } });
+  check(res, {
+    [`${endpoint} status is 200`]: (r) => r.status === 200,
+    [`${endpoint} returns results`]: (r) => Array.isArray(r.json("results")),
+  });
+  return res.status === 200 ? res.json("results") : [];
+}
+
+// Returns a product id seen while browsing, or null when the catalogue is empty
+function browseCatalogue() {
+  let products = [];
+  group("browse", () => {
+    products = listProducts(`page=${1 + Math.floor(Math.random() * 3)}`, "products_list");
+    const searched = listProducts(`search=${pick(SEARCH_TERMS)}`, "products_search");
+    products = searched.length ? searched : products;
+
+    if (products.length) {
+      const res = http.get(`${config.baseUrl}/products/${pick(products).id}`, {
+        tags: { endpoint: "products_detail" },
+      });
+      check(res, { "products_detail status is 200": (r) => r.status === 200 });
+    }
+  });
+  return products.length ? pick(products).id : null;
+}
+
+export function setup() {
+  return { tokens: loginPool() };
+}
+
+export function browse() {
+  browseCatalogue();
+  sleep(Math.random());
+}
+
+export function checkout(data) {
+  const productId = browseCatalogue();
+  if (!productId) {
+    return;
+  }
+  const headers = authHeaders(data.tokens);
+
+  group("cart", () => {
+    // Start from an empty cart; a user with no cart yet gets a 404
+    http.del(`${config.baseUrl}/cart/empty`, null, {
+      headers,
+      tags: { endpoint: "cart_clear" },
+      responseCallback: http.expectedStatuses(200, 404),
+    });
+
+    const res = http.post(
+      `${config.baseUrl}/cart/add-item`,
+      JSON.stringify({ product_id: productId, quantity: 1 }),
+      { headers, tags: { endpoint: "cart_add" } }
+    );
+    check(res, { "cart_add status is 200": (r) => r.status === 200 });
+  });
+
+  let orderId = null;
+  group("order", () => {
+    const res = http.post(
+      `${config.baseUrl}/orders/create`,
+      JSON.stringify({ shipping_address: "1 Load Test Street", phone_number: "08000000000" }),
+      { headers, tags: { endpoint: "order_create" } }
+    );
+    if (check(res, { "order_create status is 201": (r) => r.status === 201 })) {
+      orderId = res.json("id");
+    }
+  });
+
+  if (orderId && config.paymentStep) {
+    group("payment", () => {
+      const res = http.post(
+        `${config.baseUrl}/payments/initiate`,
+        JSON.stringify({ order_id: orderId }),
+        { headers, tags: { endpoint: "payment_initiate" } }
+      );
+      check(res, {
+        "payment_initiate status is 200": (r) => r.status === 200,
+        "payment_initiate returns authorization url": (r) => !!r.json("authorization_url"),
+      });
+    });
+  }
+
+  sleep(Math.random());
+}
+
+export function handleSummary(data) {
+  return exportSummary(data);
+}
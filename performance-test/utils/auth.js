@@ -0,0 +1,60 @@
+import http from "k6/http";
+import { check } from "k6";
+import { config } from "./config.js";
+
+// Access tokens live 5 minutes; refresh a little before that
+const REFRESH_AFTER_MS = 4 * 60 * 1000;
+
+// Per-VU copy of the pool, so refreshed tokens are reused by later iterations
+let pool = null;
+
+export function userEmail(i) {
+  return config.users.emailPattern.replace("{i}", String(i));
+}
+
+// Logs in every pre-seeded user once (call from setup()); returns the token pool
+export function loginPool() {
+  const tokens = [];
+  for (let i = 0; i < config.users.count; i++) {
+    const res = http.post(
+      `${config.baseUrl}/auth/login`,
+      JSON.stringify({ email: userEmail(i), password: config.users.password }),
+      { headers: config.headers, tags: { endpoint: "auth_login" } }
+    );
+    if (check(res, { "pool login success": (r) => r.status === 200 })) {
+      const result = res.json("result");
+      tokens.push({ access: result.access_token, refresh: result.refresh_token, issuedAt: Date.now() });
+    }
+  }
+  if (tokens.length === 0) {
+    throw new Error("No pool user could log in; run `python manage.py seed_users` first");
+  }
+  return tokens;
+}
+
+// Returns auth headers for this VU's own pooled user, refreshing its access token when old.
+// Refresh tokens rotate (and the old one is blacklisted), so each user belongs to one VU only.
+export function authHeaders(tokens) {
+  if (pool === null) {
+    pool = tokens.map((token) => ({ ...token }));
+  }
+  if (__VU > pool.length) {
+    throw new Error(`VU ${__VU} has no pool user of its own; raise USER_POOL_SIZE and seed that many users`);
+  }
+  const token = pool[__VU - 1];
+
+  if (Date.now() - token.issuedAt > REFRESH_AFTER_MS) {
+    const res = http.post(
+      `${config.baseUrl}/auth/token/refresh`,
+      JSON.stringify({ refresh: token.refresh }),
+      { headers: config.headers, tags: { endpoint: "auth_refresh" } }
+    );
+    if (check(res, { "token refresh success": (r) => r.status === 200 })) {
+      token.access = res.json("access");
+      token.refresh = res.json("refresh") || token.refresh;
+      token.issuedAt = Date.now();
+    }
+  }
+
+  return { ...config.headers, Authorization: `Bearer ${token.access}` };
+}
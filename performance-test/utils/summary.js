@@ -0,0 +1,10 @@
+import { textSummary } from "https://jslib.k6.io/k6-summary/0.0.2/index.js";
+import { config } from "./config.js";
+
+// Prints the usual end-of-test summary and exports the full data as JSON
+export function exportSummary(data) {
+  return {
+    stdout: textSummary(data, { indent: " ", enableColors: true }),
+    [config.summaryExport]: JSON.stringify(data, null, 2),
+  };
+}
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from .search import install_search_backend
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(install_search_backend, sender=self)
@@ -0,0 +1,141 @@
+from decimal import Decimal, InvalidOperation
+from django.db.models import Case, CharField, Count, Value, When
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+import uuid
+
+from .pricing import annotate_final_price
+
+# Storefront price ranges (in Naira) reported in the price facet; None means unbounded
+PRICE_FACET_BUCKETS = [
+    (0, 10000),
+    (10000, 50000),
+    (50000, 100000),
+    (100000, 500000),
+    (500000, None),
+]
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def bucket_label(low, high):
+    return f"{low}+" if high is None else f"{low}-{high}"
+
+
+class ProductFacetFilter(filters.BaseFilterBackend):
+    """
+    Catalogue filters: `category` and `brand` (comma separated for several), `min_price` /
+    `max_price` on the flash-sale aware final price, `in_stock` and `min_rating`.
+    """
+    filter_params = ('category', 'brand', 'min_price', 'max_price', 'in_stock', 'min_rating')
+
+    def parse_list(self, request, param):
+        raw = request.query_params.get(param, '')
+        return [value.strip() for value in raw.split(',') if value.strip()]
+
+    def parse_number(self, request, param, cast):
+        raw = request.query_params.get(param)
+        if raw in (None, ''):
+            return None
+        try:
+            return cast(raw)
+        except (InvalidOperation, ValueError):
+            raise ValidationError({param: f"'{raw}' is not a valid number."})
+
+    def filter_queryset(self, request, queryset, view):
+        categories = self.parse_list(request, 'category')
+        if categories:
+            try:
+                queryset = queryset.filter(category_id__in=[uuid.UUID(value) for value in categories])
+            except ValueError:
+                raise ValidationError({'category': "Expected category ids."})
+
+        brands = self.parse_list(request, 'brand')
+        if brands:
+            queryset = queryset.filter(brand__in=brands)
+
+        min_price = self.parse_number(request, 'min_price', Decimal)
+        max_price = self.parse_number(request, 'max_price', Decimal)
+        if min_price is not None or max_price is not None:
+            queryset = annotate_final_price(queryset)
+            if min_price is not None:
+                queryset = queryset.filter(effective_price__gte=min_price)
+            if max_price is not None:
+                queryset = queryset.filter(effective_price__lte=max_price)
+
+        if request.query_params.get('in_stock', '').lower() in TRUE_VALUES:
+            queryset = queryset.filter(in_stock__gt=0)
+
+        min_rating = self.parse_number(request, 'min_rating', float)
+        if min_rating is not None:
+            queryset = queryset.filter(rating__gte=min_rating)
+
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        descriptions = {
+            'category': 'Category id, comma separated for several',
+            'brand': 'Brand name, comma separated for several',
+            'min_price': 'Minimum final price',
+            'max_price': 'Maximum final price',
+            'in_stock': 'Only products with stock left (true/false)',
+            'min_rating': 'Minimum rating',
+        }
+        return [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': {'type': 'string'},
+            }
+            for name, description in descriptions.items()
+        ]
+
+
+def compute_facets(queryset):
+    """
+    Returns facet counts per category, brand and price bucket for a filtered queryset,
+    computed in a single grouped query.
+    """
+    queryset = annotate_final_price(queryset.order_by())
+    price_bucket = Case(
+        *[
+            When(
+                effective_price__gte=low,
+                **({'effective_price__lt': high} if high is not None else {}),
+                then=Value(bucket_label(low, high)),
+            )
+            for low, high in PRICE_FACET_BUCKETS
+        ],
+        output_field=CharField(),
+    )
+    rows = (
+        queryset
+        .annotate(price_bucket=price_bucket)
+        .values('category_id', 'category__name', 'brand', 'price_bucket')
+        .annotate(total=Count('pk'))
+    )
+
+    categories, brands, prices = {}, {}, {}
+    for row in rows:
+        category = categories.setdefault(row['category_id'], {
+            'id': str(row['category_id']), 'name': row['category__name'], 'count': 0,
+        })
+        category['count'] += row['total']
+        if row['brand']:
+            brands[row['brand']] = brands.get(row['brand'], 0) + row['total']
+        if row['price_bucket']:
+            prices[row['price_bucket']] = prices.get(row['price_bucket'], 0) + row['total']
+
+    return {
+        'categories': sorted(categories.values(), key=lambda item: (-item['count'], item['name'])),
+        'brands': [
+            {'name': name, 'count': count}
+            for name, count in sorted(brands.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        'price_ranges': [
+            {'range': bucket_label(low, high), 'count': prices.get(bucket_label(low, high), 0)}
+            for low, high in PRICE_FACET_BUCKETS
+        ],
+    }
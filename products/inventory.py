@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+
+from .models import Product
+
+
+class InsufficientStock(Exception):
+    """Raised when a reservation cannot be met; `shortages` maps product id -> units available"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Insufficient stock for {len(shortages)} product(s)")
+
+
+def stock_case(quantities, sign):
+    return Case(
+        *(When(pk=pk, then=F('in_stock') + sign * quantity) for pk, quantity in quantities.items()),
+        default=F('in_stock'),
+        output_field=PositiveIntegerField(),
+    )
+
+
+def reserve_stock(quantities):
+    """
+    Takes `quantities` ({product_id: units}) out of stock with a single conditional
+    `UPDATE ... SET in_stock = in_stock - n WHERE in_stock >= n` covering the whole batch.
+
+    The database checks and decrements each row atomically, so concurrent checkouts on a
+    hot product cannot oversell, and the row locks are held only by that statement until
+    the surrounding transaction commits. If any product falls short nothing is reserved
+    and InsufficientStock is raised.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+
+    available = Q()
+    for pk, quantity in quantities.items():
+        available |= Q(pk=pk, in_stock__gte=quantity)
+
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(available).update(in_stock=stock_case(quantities, -1))
+            if updated != len(quantities):
+                # Roll back the rows that did have enough stock
+                raise InsufficientStock({})
+    except InsufficientStock:
+        stock = dict(Product.objects.filter(pk__in=quantities).values_list('pk', 'in_stock'))
+        raise InsufficientStock({
+            pk: stock.get(pk, 0) for pk, quantity in quantities.items() if stock.get(pk, 0) < quantity
+        })
+
+
+def release_stock(quantities):
+    """
+    Returns `quantities` ({product_id: units}) to stock in a single UPDATE.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    if quantities:
+        Product.objects.filter(pk__in=quantities).update(in_stock=stock_case(quantities, 1))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_published', '-created_at', '-id'], name='products_pr_is_publ_485f1a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_published', 'price', 'id'], name='products_pr_is_publ_261723_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_published', 'rating', 'id'], name='products_pr_is_publ_5f4ac1_idx'),
+        ),
+    ]
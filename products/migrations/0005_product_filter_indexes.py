@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_published', 'category', '-created_at'], name='products_pr_is_publ_c188c5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_published', 'brand'], name='products_pr_is_publ_93e3bc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_published', 'in_stock'], name='products_pr_is_publ_f1e1c9_idx'),
+        ),
+    ]
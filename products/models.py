@@ -1,6 +1,9 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 import uuid
 
+from .pricing import price_at
+
 
 class Category(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -8,6 +11,7 @@ class Category(models.Model):
     description = models.TextField(blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
@@ -16,6 +20,34 @@ class Category(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    """
+    Shared scopes and projections for products, used by the product, cart and order paths.
+    """
+
+    def published(self):
+        return self.filter(is_published=True)
+
+    def visible_to(self, user):
+        # Staff see unpublished products too
+        if user is not None and user.is_authenticated and user.is_staff:
+            return self.all()
+        return self.published()
+
+    def with_category(self):
+        return self.select_related('category')
+
+    def project(self, columns):
+        """
+        Loads only the given columns (related ones as `category__name`), joining the category when needed.
+        """
+        columns = list(dict.fromkeys(columns))
+        queryset = self
+        if any(column.startswith('category__') for column in columns):
+            queryset = queryset.with_category()
+        return queryset.only(*columns)
+
+
 class Product(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     category = models.ForeignKey(Category, related_name="products", on_delete=models.CASCADE)
@@ -35,23 +67,33 @@ class Product(models.Model):
     is_published = models.BooleanField(default=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Weighted full-text document, maintained by a database trigger (see products/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     @property
     def final_price(self):
-        """Return the final price considering flash sale"""
-        from django.utils import timezone
-
-        # Check if flash sale is active
-        if (
-            self.flash_price is not None and
-            self.flash_sale_ends_at is not None and
-            timezone.now() < self.flash_sale_ends_at
-        ):
-            return self.flash_price
-        return self.price
+        """Return the final price considering flash sale (see products/pricing.py)"""
+        # Querysets priced in bulk carry the SQL-computed price
+        if hasattr(self, 'effective_price'):
+            return self.effective_price
+        return price_at(self)
 
     class Meta:
         ordering = ['-created_at']
+        # Composite (field, id) indexes backing keyset pagination on each allowed ordering
+        indexes = [
+            models.Index(fields=['is_published', '-created_at', '-id']),
+            models.Index(fields=['is_published', 'price', 'id']),
+            models.Index(fields=['is_published', 'rating', 'id']),
+            # Catalogue filters and facets
+            models.Index(fields=['is_published', 'category', '-created_at']),
+            models.Index(fields=['is_published', 'brand']),
+            models.Index(fields=['is_published', 'in_stock']),
+        ]
 
     def __str__(self):
         return self.name
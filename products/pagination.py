@@ -0,0 +1,136 @@
+from base64 import b64decode, b64encode
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+import json
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on a composite (field, id) position.
+
+    Each page is a `WHERE (field, id) < (last_field, last_id) ORDER BY field, id LIMIT n`
+    backed by a composite index, so latency stays flat regardless of depth and
+    no COUNT(*) query is issued. The ordering follows the `ordering` query param
+    when it names one of `ordering_fields`, otherwise `default_ordering`.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering_param = 'ordering'
+    ordering_fields = ('created_at', 'price', 'rating')
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, request):
+        """
+        Returns (field, descending) from the first term of the ordering param.
+        """
+        params = request.query_params.get(self.ordering_param, '')
+        term = params.split(',')[0].strip()
+        if term.lstrip('-') not in self.ordering_fields:
+            term = self.default_ordering
+        return term.lstrip('-'), term.startswith('-')
+
+    def decode_cursor(self, request, model):
+        """
+        Returns (value, pk, reverse) from the cursor param, the value and pk converted by
+        the model fields so a tampered cursor is a 404 rather than an error in the query.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            value = model._meta.get_field(self.field).to_python(cursor['v'])
+            pk = model._meta.pk.to_python(cursor['id'])
+            if value is None or pk is None:
+                raise ValueError(cursor)
+            return value, pk, bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        value = getattr(instance, self.field)
+        value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        token = json.dumps({'v': value, 'id': str(instance.pk), 'r': int(reverse)})
+        encoded = b64encode(token.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field, descending = self.get_ordering(request)
+
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = cursor[2] if cursor else False
+
+        # Walking backwards flips both the sort and the comparison
+        step_back = descending != reverse
+        prefix = '-' if step_back else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}pk')
+
+        if cursor:
+            value, pk, _ = cursor
+            lookup = 'lt' if step_back else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value}) |
+                Q(**{self.field: value, f'pk__{lookup}': pk})
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next, self.has_previous = has_following, cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
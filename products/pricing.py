@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, DecimalField, F, Min, Q, When
+from django.utils import timezone
+
+"""
+Single source of the flash-sale pricing rule: a product sells at `flash_price` while
+`flash_sale_ends_at` is in the future, otherwise at `price`. Callers take `now` once
+per request and pass it down, so every line of a listing, cart or order is priced
+against the same instant.
+"""
+
+
+def flash_sale_active(now=None, prefix=''):
+    """
+    Condition matching products whose flash sale is running at `now`.
+    `prefix` addresses the product through a relation, e.g. 'product__'.
+    """
+    now = now or timezone.now()
+    return Q(**{
+        f'{prefix}flash_price__isnull': False,
+        f'{prefix}flash_sale_ends_at__isnull': False,
+        f'{prefix}flash_sale_ends_at__gt': now,
+    })
+
+
+def final_price_expression(now=None, prefix=''):
+    """
+    Database-side equivalent of Product.final_price.
+    """
+    return Case(
+        When(flash_sale_active(now, prefix), then=F(f'{prefix}flash_price')),
+        default=F(f'{prefix}price'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def annotate_final_price(queryset, now=None, prefix=''):
+    """
+    Annotates `effective_price` once; calling it again on the same queryset is a no-op.
+    """
+    if 'effective_price' in queryset.query.annotations:
+        return queryset
+    return queryset.annotate(effective_price=final_price_expression(now, prefix))
+
+
+def price_at(product, now=None):
+    """
+    Python-side pricing rule for a loaded product.
+    """
+    now = now or timezone.now()
+    if (
+        product.flash_price is not None and
+        product.flash_sale_ends_at is not None and
+        now < product.flash_sale_ends_at
+    ):
+        return product.flash_price
+    return product.price
+
+
+def flash_sale_timeout(products, now):
+    """
+    Seconds until the first flash sale running among `products` ends, None when none is
+    running. Caches holding their prices must not outlive it.
+    """
+    ends = [
+        product.flash_sale_ends_at for product in products
+        if product.flash_sale_ends_at is not None and product.flash_sale_ends_at > now
+    ]
+    if not ends:
+        return None
+    return max(int((min(ends) - now).total_seconds()), 1)
+
+
+def queryset_flash_sale_timeout(queryset, now):
+    """
+    flash_sale_timeout for a whole queryset (e.g. the filtered catalogue behind facet
+    counts), found with a single MIN query instead of loading the products.
+    """
+    ends_at = queryset.order_by().filter(flash_sale_active(now)).aggregate(ends_at=Min('flash_sale_ends_at'))['ends_at']
+    if ends_at is None:
+        return None
+    return max(int((ends_at - now).total_seconds()), 1)
+
+
+def price_cache_key(product_id):
+    return f"product_price_{product_id}"
+
+
+def price_cache_timeout(flash_sale_ends_at, now):
+    """
+    PRICE_CACHE_TIMEOUT, shortened so a cached flash price expires when the sale ends.
+    """
+    timeout = settings.PRICE_CACHE_TIMEOUT
+    if flash_sale_ends_at is not None and flash_sale_ends_at > now:
+        timeout = min(timeout, int((flash_sale_ends_at - now).total_seconds()))
+    return max(timeout, 1)
+
+
+def effective_prices(product_ids, now=None):
+    """
+    Returns {product_id: effective price} for many products: cached prices in one
+    cache round-trip, the rest computed in one annotated query and cached per product.
+    """
+    from .models import Product
+
+    now = now or timezone.now()
+    product_ids = set(product_ids)
+    keys = {price_cache_key(pk): pk for pk in product_ids}
+    prices = {keys[key]: price for key, price in cache.get_many(list(keys)).items()}
+
+    missing = product_ids - set(prices)
+    if missing:
+        rows = (
+            annotate_final_price(Product.objects.filter(pk__in=missing), now)
+            .values_list('pk', 'effective_price', 'flash_sale_ends_at')
+        )
+        for pk, price, ends_at in rows:
+            prices[pk] = price
+            cache.set(price_cache_key(pk), price, timeout=price_cache_timeout(ends_at, now))
+    return prices
+
+
+def invalidate_price(product_id):
+    cache.delete(price_cache_key(product_id))
@@ -0,0 +1,167 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import BooleanField, F
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+import re
+
+# Relative weight of each indexed column: name > brand > category > description
+SQLITE_FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+SQLITE_FTS_TABLE = "products_product_fts"
+
+POSTGRES_SEARCH_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION products_product_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.brand, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT name FROM products_category WHERE id = NEW.category_id), '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS products_product_search_vector_trigger ON products_product",
+    """
+    CREATE TRIGGER products_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, brand, description, category_id ON products_product
+    FOR EACH ROW EXECUTE FUNCTION products_product_search_vector_update()
+    """,
+    # A renamed category re-fires the product trigger for its products
+    """
+    CREATE OR REPLACE FUNCTION products_category_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE products_product SET name = name WHERE category_id = NEW.id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS products_category_search_vector_trigger ON products_category",
+    """
+    CREATE TRIGGER products_category_search_vector_trigger
+    AFTER UPDATE OF name ON products_category
+    FOR EACH ROW EXECUTE FUNCTION products_category_search_vector_update()
+    """,
+    "CREATE INDEX IF NOT EXISTS products_product_search_vector_gin ON products_product USING gin (search_vector)",
+    "UPDATE products_product SET name = name WHERE search_vector IS NULL",
+]
+
+SQLITE_FTS_ROW = f"""
+    INSERT INTO {SQLITE_FTS_TABLE}(rowid, name, brand, category, description)
+    SELECT new.rowid, new.name, coalesce(new.brand, ''),
+           coalesce((SELECT name FROM products_category WHERE id = new.category_id), ''),
+           coalesce(new.description, '');
+"""
+
+SQLITE_SEARCH_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5(name, brand, category, description)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_insert AFTER INSERT ON products_product BEGIN
+        {SQLITE_FTS_ROW}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_update AFTER UPDATE ON products_product BEGIN
+        DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = old.rowid;
+        {SQLITE_FTS_ROW}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_delete AFTER DELETE ON products_product BEGIN
+        DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = old.rowid;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_category_fts_update AFTER UPDATE OF name ON products_category BEGIN
+        UPDATE {SQLITE_FTS_TABLE} SET category = new.name
+        WHERE rowid IN (SELECT rowid FROM products_product WHERE category_id = new.id);
+    END
+    """,
+]
+
+
+def install_search_backend(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate hook creating the full-text search structures for the current database:
+    the tsvector trigger and GIN index on PostgreSQL, an FTS5 table kept in sync by
+    triggers on SQLite. Every statement is idempotent.
+    """
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            for sql in POSTGRES_SEARCH_SQL:
+                cursor.execute(sql)
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [SQLITE_FTS_TABLE])
+            created = cursor.fetchone() is None
+            for sql in SQLITE_SEARCH_SQL:
+                cursor.execute(sql)
+            if created:
+                cursor.execute(f"""
+                    INSERT INTO {SQLITE_FTS_TABLE}(rowid, name, brand, category, description)
+                    SELECT p.rowid, p.name, coalesce(p.brand, ''), coalesce(c.name, ''), coalesce(p.description, '')
+                    FROM products_product p LEFT JOIN products_category c ON c.id = p.category_id
+                """)
+
+
+def tokenize(terms):
+    """
+    Keeps only word characters of each search term, dropping terms left empty.
+    """
+    cleaned = (re.sub(r"[^\w]", "", term, flags=re.UNICODE) for term in terms)
+    return [term.lower() for term in cleaned if term]
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Full-text product search on the `search` param with weighted ranking
+    (name > brand > category > description) and prefix matching on every term,
+    so typeahead queries like `?search=sams gal` match. Uses the tsvector column on
+    PostgreSQL and the FTS5 table on SQLite; other databases fall back to SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = tokenize(self.get_search_terms(request))
+        if not terms:
+            return super().filter_queryset(request, queryset, view)
+
+        vendor = connections[queryset.db].vendor
+        if vendor == "postgresql":
+            return self.filter_postgres(queryset, terms)
+        if vendor == "sqlite":
+            return self.filter_sqlite(queryset, terms)
+        return super().filter_queryset(request, queryset, view)
+
+    def filter_postgres(self, queryset, terms):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(" & ".join(f"{term}:*" for term in terms), search_type="raw", config="english")
+        return (
+            queryset
+            .filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "-created_at")
+        )
+
+    def filter_sqlite(self, queryset, terms):
+        match = " ".join(f'"{term}"*' for term in terms)
+        weights = ", ".join(str(weight) for weight in SQLITE_FTS_WEIGHTS)
+        matches = RawSQL(
+            f"products_product.rowid IN (SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s)",
+            (match,),
+            output_field=BooleanField(),
+        )
+        # bm25() is lower for better matches
+        rank = RawSQL(
+            f"SELECT bm25({SQLITE_FTS_TABLE}, {weights}) FROM {SQLITE_FTS_TABLE} "
+            f"WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid = products_product.rowid",
+            (match,),
+        )
+        return (
+            queryset
+            .filter(matches)
+            .annotate(search_rank=rank)
+            .order_by("search_rank", "-created_at")
+        )
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from common.serializers import SparseFieldsetMixin
 from ..models import Product, Category
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -7,17 +8,40 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category_detail = CategorySerializer(source='category', read_only=True)
+    final_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ('search_vector',)
+
+
+# Compact serializer for product listings
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    final_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    category_name = serializers.CharField(source='category.name', read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ('id', 'name', 'price', 'final_price', 'brand', 'rating', 'category_name')
+
+    # Model columns each field needs, used to build the .only() projection
+    columns = {
+        'id': ['id'],
+        'name': ['name'],
+        'price': ['price'],
+        # Priced in SQL by the listing queryset (products/pricing.py)
+        'final_price': ['price'],
+        'brand': ['brand'],
+        'rating': ['rating'],
+        'category_name': ['category', 'category__name'],
+    }
 
 
 # Admin Product Serializer, with all fields exposed
 class AdminProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ("search_vector",)
         read_only_fields = ("id", "created_at")
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, Product
+from .pricing import invalidate_price
+from .suggest import suggestion_index
+
+
+"""
+Keep the typeahead index in step with product and category writes: this worker's copy
+is updated in place (once built), and the change is published for the other workers.
+"""
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    key = ('product', instance.pk)
+    if suggestion_index.built:
+        if instance.is_published:
+            suggestion_index.upsert(key, suggestion_index.product_doc(
+                instance.pk, instance.name, instance.brand, instance.rating, instance.total_views
+            ))
+        else:
+            suggestion_index.remove(key)
+    suggestion_index.publish(key)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    key = ('product', instance.pk)
+    if suggestion_index.built:
+        suggestion_index.remove(key)
+    suggestion_index.publish(key)
+
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, **kwargs):
+    if suggestion_index.built:
+        suggestion_index.upsert_category(instance.pk, instance.name)
+    suggestion_index.publish(('category', instance.pk))
+
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    key = ('category', instance.pk)
+    if suggestion_index.built:
+        suggestion_index.remove(key)
+    suggestion_index.publish(key)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def forget_price(sender, instance, **kwargs):
+    invalidate_price(instance.pk)
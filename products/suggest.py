@@ -0,0 +1,249 @@
+from bisect import bisect_left, insort
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+import threading
+import time
+
+from .models import Category, Product
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Longest run of missed changes replayed from the change log before a full rebuild is cheaper
+MAX_REPLAYED_CHANGES = 500
+CHANGE_TIMEOUT = 60 * 60
+
+
+def split_words(text):
+    return [word for word in "".join(c.lower() if c.isalnum() else " " for c in text or "").split() if word]
+
+
+class SuggestionIndex:
+    """
+    In-process prefix index over published product names/brands and category names,
+    answering typeahead queries without touching the database.
+
+    Words are kept in a sorted array of (word, doc_key) pairs searched with bisect.
+    The index is built at worker startup from two compact queries and updated in place by
+    the product/category signals of this worker. Every committed write also appends the
+    changed doc key to a shared change log numbered by the `<prefix>_generation` counter,
+    so other workers replay only the docs they missed; a full rebuild happens only when
+    the log no longer covers the gap (counter or entries evicted).
+    """
+
+    def __init__(self, prefix="suggestions"):
+        self.prefix = prefix
+        self.generation = None
+        self._lock = threading.RLock()
+        self._keys = []
+        self._docs = {}
+
+    @property
+    def built(self):
+        return self.generation is not None
+
+    @property
+    def version_key(self):
+        return f"{self.prefix}_generation"
+
+    def change_key(self, generation):
+        return f"{self.prefix}_change_{generation}"
+
+    def get_version(self):
+        """
+        Returns the number of the latest published change.
+        """
+        version = cache.get(self.version_key)
+        if version is None:
+            # Seed from the clock so a counter lost to eviction never reuses an old generation
+            cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def build(self):
+        generation = self.get_version()
+        docs = {}
+        products = Product.objects.filter(is_published=True).values_list(
+            'id', 'name', 'brand', 'rating', 'total_views'
+        )
+        for pk, name, brand, rating, total_views in products:
+            docs[('product', pk)] = self.product_doc(pk, name, brand, rating, total_views)
+
+        categories = Category.objects.annotate(
+            published=Count('products', filter=Q(products__is_published=True))
+        ).values_list('id', 'name', 'published')
+        for pk, name, published in categories:
+            docs[('category', pk)] = self.category_doc(pk, name, published)
+
+        keys = sorted((word, key) for key, doc in docs.items() for word in doc['words'])
+        with self._lock:
+            self._docs, self._keys = docs, keys
+            self.generation = generation
+
+    def warm(self):
+        """
+        Builds the index when a worker starts, so the first keystroke does not pay for it.
+        A failure (e.g. database not reachable yet) leaves it to be built on first use.
+        """
+        try:
+            self.build()
+        except Exception:
+            logger.exception("Could not build the suggestion index at startup")
+
+    def ensure_fresh(self):
+        """
+        Applies the changes published by other workers since this index was last synced.
+        """
+        if not self.built:
+            self.build()
+            return
+
+        generation = self.get_version()
+        if generation == self.generation:
+            return
+        if not self.replay(self.generation, generation):
+            logger.info(f"Suggestion index rebuilt (change log does not cover {self.generation}..{generation})")
+            self.build()
+
+    def replay(self, since, until):
+        """
+        Reloads the docs changed between two generations in at most two queries.
+        Returns False when the change log does not cover the range.
+        """
+        if not since < until <= since + MAX_REPLAYED_CHANGES:
+            return False
+        keys = [self.change_key(generation) for generation in range(since + 1, until + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return False
+
+        product_ids = {pk for kind, pk in changes.values() if kind == 'product'}
+        category_ids = {pk for kind, pk in changes.values() if kind == 'category'}
+        if product_ids:
+            products = Product.objects.filter(pk__in=product_ids, is_published=True).values_list(
+                'id', 'name', 'brand', 'rating', 'total_views'
+            )
+            found = set()
+            for pk, name, brand, rating, total_views in products:
+                found.add(pk)
+                self.upsert(('product', pk), self.product_doc(pk, name, brand, rating, total_views))
+            for pk in product_ids - found:
+                self.remove(('product', pk))
+        if category_ids:
+            found = set()
+            for pk, name in Category.objects.filter(pk__in=category_ids).values_list('id', 'name'):
+                found.add(pk)
+                self.upsert_category(pk, name)
+            for pk in category_ids - found:
+                self.remove(('category', pk))
+
+        with self._lock:
+            if self.generation == since:
+                self.generation = until
+        return True
+
+    def publish(self, key):
+        """
+        Appends a changed doc key to the shared change log once the write commits, so
+        other workers replay it. This worker has applied it already and skips its own entry.
+        """
+        transaction.on_commit(lambda: self._publish(key))
+
+    def _publish(self, key):
+        self.get_version()
+        try:
+            generation = cache.incr(self.version_key)
+        except ValueError:
+            # Counter evicted between the read and the increment, other workers rebuild
+            return
+        cache.set(self.change_key(generation), key, timeout=CHANGE_TIMEOUT)
+        with self._lock:
+            if self.generation == generation - 1:
+                self.generation = generation
+
+    @staticmethod
+    def product_doc(pk, name, brand, rating, total_views):
+        return {
+            'type': 'product',
+            'id': str(pk),
+            'text': name,
+            'brand': brand,
+            'score': (rating, total_views),
+            'words': set(split_words(name) + split_words(brand)),
+        }
+
+    @staticmethod
+    def category_doc(pk, name, published=0):
+        return {
+            'type': 'category',
+            'id': str(pk),
+            'text': name,
+            'score': (published,),
+            'words': set(split_words(name)),
+        }
+
+    def upsert(self, key, doc):
+        with self._lock:
+            self.remove(key)
+            self._docs[key] = doc
+            for word in doc['words']:
+                insort(self._keys, (word, key))
+
+    def upsert_category(self, pk, name):
+        """
+        Indexes a saved category, keeping its published product count from the last build.
+        """
+        with self._lock:
+            existing = self._docs.get(('category', pk))
+            published = existing['score'][0] if existing else 0
+            self.upsert(('category', pk), self.category_doc(pk, name, published))
+
+    def remove(self, key):
+        with self._lock:
+            doc = self._docs.pop(key, None)
+            if doc is None:
+                return
+            for word in doc['words']:
+                index = bisect_left(self._keys, (word, key))
+                if index < len(self._keys) and self._keys[index] == (word, key):
+                    del self._keys[index]
+
+    def search(self, query, limit=10):
+        """
+        Returns {'products': [...], 'categories': [...]} whose words start with every query word,
+        each list holding the top `limit` docs by score (rating then total views for products).
+        """
+        words = split_words(query)
+        if not words:
+            return {'products': [], 'categories': []}
+
+        # Walk the range of the longest (most selective) word, then check the others per doc
+        anchor = max(words, key=len)
+        with self._lock:
+            candidates = set()
+            index = bisect_left(self._keys, (anchor,))
+            while index < len(self._keys) and self._keys[index][0].startswith(anchor):
+                candidates.add(self._keys[index][1])
+                index += 1
+            docs = [self._docs[key] for key in candidates]
+
+        matches = [
+            doc for doc in docs
+            if all(any(word.startswith(term) for word in doc['words']) for term in words)
+        ]
+        matches.sort(key=lambda doc: doc['score'], reverse=True)
+
+        results = {'products': [], 'categories': []}
+        for doc in matches:
+            bucket = results['products' if doc['type'] == 'product' else 'categories']
+            if len(bucket) < limit:
+                item = {'id': doc['id'], 'name': doc['text']}
+                if doc['type'] == 'product':
+                    item['brand'] = doc['brand']
+                bucket.append(item)
+        return results
+
+
+suggestion_index = SuggestionIndex()
@@ -1,3 +1,897 @@
-from django.test import TestCase
+import time
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import QueryDict
+from rest_framework.test import APIClient
+from products.models import Product, Category
+from products.utils.cache_manager import CacheManager, build_query_identifier, MAX_KEY_LENGTH
+from products.views import ProductListCreateView
 
-# Create your tests here.
+User = get_user_model()
+
+"""
+Tests for Product catalogue and caching.
+"""
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def category():
+    return Category.objects.create(name="Electronics")
+
+
+"""Tests for query-aware cache identifiers."""
+def test_query_identifier_is_order_and_whitespace_insensitive():
+    first = build_query_identifier("list", QueryDict("search=phone&ordering=price"))
+    second = build_query_identifier("list", QueryDict("ordering=price&search=  phone "))
+    assert first == second
+
+
+def test_query_identifier_follows_the_last_value_of_repeated_params():
+    first = build_query_identifier("list", QueryDict("ordering=price&ordering=-price"))
+    second = build_query_identifier("list", QueryDict("ordering=-price&ordering=price"))
+    assert first != second
+    assert first == build_query_identifier("list", QueryDict("ordering=-price"))
+    assert build_query_identifier("list", QueryDict("page=2&page=1"), defaults={'page': '1'}) == "list"
+
+
+def test_query_identifier_ignores_unknown_and_default_params():
+    allowed = ['page', 'search']
+    plain = build_query_identifier("list", QueryDict(""), allowed=allowed, defaults={'page': '1'})
+    assert build_query_identifier("list", QueryDict("page=1&_=123"), allowed=allowed, defaults={'page': '1'}) == plain
+    assert build_query_identifier("list", QueryDict("page=2"), allowed=allowed, defaults={'page': '1'}) != plain
+
+
+def test_cache_key_length_is_bounded():
+    manager = CacheManager(prefix="products")
+    key = manager.get_cache_key("x" * 500)
+    assert len(key) <= MAX_KEY_LENGTH
+    assert key.startswith("products_")
+
+
+"""Tests for search/ordering variants getting their own cache entry."""
+@pytest.mark.django_db
+def test_product_list_search_is_cached_separately(category):
+    client = APIClient()
+    Product.objects.create(category=category, name="Phone", price=100, in_stock=5)
+    Product.objects.create(category=category, name="Laptop", price=300, in_stock=5)
+
+    response = client.get('/api/products/')
+    assert response["X-Cache"] == "MISS"
+    assert response.json()['count'] == 2
+
+    response = client.get('/api/products/', {'search': 'phone'})
+    assert response["X-Cache"] == "MISS"
+    assert response.json()['count'] == 1
+
+    response = client.get('/api/products/', {'search': ' phone'})
+    assert response["X-Cache"] == "HIT"
+    assert response.json()['count'] == 1
+
+    response = client.get('/api/products/', {'page': 1})
+    assert response["X-Cache"] == "HIT"
+    assert response.json()['count'] == 2
+
+
+@pytest.mark.django_db
+def test_product_list_ordering_is_cached_separately(category):
+    client = APIClient()
+    Product.objects.create(category=category, name="Cheap", price=10, in_stock=5)
+    Product.objects.create(category=category, name="Pricey", price=900, in_stock=5)
+
+    ascending = client.get('/api/products/', {'ordering': 'price'})
+    descending = client.get('/api/products/', {'ordering': '-price'})
+
+    assert descending["X-Cache"] == "MISS"
+    assert ascending.json()['results'][0]['name'] == "Cheap"
+    assert descending.json()['results'][0]['name'] == "Pricey"
+
+
+"""Tests for generation-based namespace invalidation."""
+def test_invalidate_bumps_generation_and_hides_old_entries():
+    manager = CacheManager(prefix="products")
+    manager.set("public_list", {"count": 1})
+    version = manager.get_version()
+
+    manager.invalidate()
+
+    assert manager.get_version() == version + 1
+    assert manager.get("public_list") is None
+
+
+def test_invalidate_single_identifier_keeps_namespace():
+    manager = CacheManager(prefix="products")
+    manager.set("product_1", {"id": 1})
+    manager.set("product_2", {"id": 2})
+
+    manager.invalidate("product_1")
+
+    assert manager.get("product_1") is None
+    assert manager.get("product_2") == {"id": 2}
+
+
+def test_invalidate_recovers_from_missing_counter():
+    manager = CacheManager(prefix="products")
+    manager.set("public_list", {"count": 1})
+    cache.delete(manager.version_key)
+
+    manager.invalidate()
+
+    assert manager.get("public_list") is None
+
+
+@pytest.mark.django_db
+def test_product_update_invalidates_list_and_detail(category):
+    from authentication.models import User
+
+    client = APIClient()
+    admin = User.objects.create_user(email='admin@example.com', username='admin', password='testpass', is_staff=True)
+    product = Product.objects.create(category=category, name="Phone", price=100, in_stock=5)
+
+    assert client.get(f'/api/products/{product.id}')["X-Cache"] == "MISS"
+    assert client.get(f'/api/products/{product.id}')["X-Cache"] == "HIT"
+    assert client.get('/api/products/')["X-Cache"] == "MISS"
+
+    client.force_authenticate(user=admin)
+    response = client.patch(f'/api/products/{product.id}', {"name": "Smart Phone"}, format='json')
+    assert response.status_code == 200
+    client.force_authenticate(user=None)
+
+    detail = client.get(f'/api/products/{product.id}')
+    assert detail["X-Cache"] == "MISS"
+    assert detail.json()['name'] == "Smart Phone"
+    listing = client.get('/api/products/')
+    assert listing["X-Cache"] == "MISS"
+    assert listing.json()['results'][0]['name'] == "Smart Phone"
+
+
+"""Tests for stampede protection in get_or_compute."""
+def test_get_or_compute_caches_result():
+    manager = CacheManager(prefix="products")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"count": 1}
+
+    assert manager.get_or_compute("public_list", compute) == ({"count": 1}, "MISS")
+    assert manager.get_or_compute("public_list", compute) == ({"count": 1}, "HIT")
+    assert len(calls) == 1
+
+
+def test_get_or_compute_serves_stale_while_another_worker_refreshes():
+    manager = CacheManager(prefix="products", timeout=60)
+    manager.set("public_list", {"count": 1})
+    key = manager.get_cache_key("public_list")
+    entry = cache.get(key)
+    entry["expires_at"] = 0
+    cache.set(key, entry)
+
+    # Another worker holds the recompute lock
+    cache.add(f"{key}_lock", 1)
+
+    data, status = manager.get_or_compute("public_list", lambda: {"count": 2})
+    assert data == {"count": 1}
+    assert status == "STALE"
+
+
+def test_get_or_compute_refreshes_expired_entry_when_lock_is_free():
+    manager = CacheManager(prefix="products", timeout=60)
+    manager.set("public_list", {"count": 1})
+    key = manager.get_cache_key("public_list")
+    entry = cache.get(key)
+    entry["expires_at"] = 0
+    cache.set(key, entry)
+
+    assert manager.get_or_compute("public_list", lambda: {"count": 2}) == ({"count": 2}, "MISS")
+    assert cache.get(f"{key}_lock") is None
+
+
+def test_get_or_compute_refreshes_early_for_expensive_entries(monkeypatch):
+    manager = CacheManager(prefix="products", timeout=60, beta=1.0)
+    key = manager.get_cache_key("public_list")
+    cache.set(key, {"value": {"count": 1}, "expires_at": time.time() + 1, "delta": 30.0})
+
+    # random() close to 1 makes -log(1 - r) large, forcing an early refresh
+    monkeypatch.setattr("products.utils.cache_manager.random.random", lambda: 0.999)
+
+    assert manager.get_or_compute("public_list", lambda: {"count": 2}) == ({"count": 2}, "MISS")
+
+
+def test_get_or_compute_waits_for_lock_holder_when_nothing_cached():
+    manager = CacheManager(prefix="products")
+    key = manager.get_cache_key("public_list")
+    cache.add(f"{key}_lock", 1)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"count": 3}
+
+    data, status = manager.get_or_compute("public_list", compute, wait=0.1)
+    assert data == {"count": 3}
+    assert status == "MISS"
+    assert len(calls) == 1
+
+
+"""Tests for the per-process L1 tier."""
+def test_local_lru_evicts_least_recently_used():
+    from products.utils.cache_manager import LocalLRUCache
+
+    local = LocalLRUCache(max_entries=2, timeout=30)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("b") is None
+    assert local.get("a") == 1
+    assert local.get("c") == 3
+    assert len(local) == 2
+
+
+def test_local_lru_respects_ttl():
+    from products.utils.cache_manager import LocalLRUCache
+
+    local = LocalLRUCache(max_entries=2, timeout=30)
+    local.set("a", 1, expires_at=time.time() - 1)
+    assert local.get("a") is None
+
+
+def test_l1_tier_serves_hits_without_shared_cache():
+    manager = CacheManager(prefix="products", local_max_entries=8)
+    manager.get_or_compute("product_1", lambda: {"id": 1})
+
+    # Drop the shared entry, L1 still answers
+    cache.delete(manager.get_cache_key("product_1"))
+    assert manager.get_or_compute("product_1", lambda: {"id": 2}) == ({"id": 1}, "HIT")
+
+    stats = manager.stats()
+    assert stats["l1"]["hits"] == 1
+    assert stats["l2"]["misses"] == 1
+
+
+@pytest.mark.django_db
+def test_cache_stats_are_exposed_to_admins(category, settings):
+    product = Product.objects.create(category=category, name="Kettle", price=10, in_stock=5)
+    client = APIClient()
+    client.get(f'/api/products/{product.id}')
+    client.get(f'/api/products/{product.id}')
+
+    assert client.get('/api/products/admin-products/cache-stats').status_code in (401, 403)
+
+    admin = User.objects.create_user(email='admin@example.com', username='admin', password='testpass', is_staff=True)
+    client.force_authenticate(user=admin)
+    body = client.get('/api/products/admin-products/cache-stats').json()
+    if settings.PRODUCT_CACHE_LOCAL_ENTRIES:
+        assert body['product_detail']['l1']['hits'] >= 1
+    assert set(body) == {'pid', 'product_list', 'product_detail'}
+
+
+def test_l1_tier_is_invalidated_by_generation_bump_from_another_worker():
+    worker_a = CacheManager(prefix="products", local_max_entries=8)
+    worker_b = CacheManager(prefix="products", local_max_entries=8)
+    worker_a.get_or_compute("product_1", lambda: {"id": 1})
+
+    worker_b.invalidate()
+
+    assert worker_a.get_or_compute("product_1", lambda: {"id": 2}) == ({"id": 2}, "MISS")
+
+
+"""Tests for serving pre-rendered JSON bodies from the cache."""
+@pytest.mark.django_db
+def test_product_detail_hit_serves_rendered_body_with_stable_etag(category):
+    client = APIClient()
+    product = Product.objects.create(category=category, name="Phone", price=100, in_stock=5)
+
+    miss = client.get(f'/api/products/{product.id}')
+    hit = client.get(f'/api/products/{product.id}')
+
+    assert miss["X-Cache"] == "MISS"
+    assert hit["X-Cache"] == "HIT"
+    assert hit["Content-Type"] == "application/json"
+    assert hit["ETag"] == miss["ETag"]
+    assert hit.content == miss.content
+    assert hit.json()['price'] == "100.00"
+
+
+@pytest.mark.django_db
+def test_product_list_serves_gzip_body_when_accepted(category):
+    import gzip
+    import json
+
+    client = APIClient()
+    for i in range(10):
+        Product.objects.create(category=category, name=f"Phone {i}", description="x" * 100, price=100, in_stock=5)
+
+    response = client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+    assert response["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response["Vary"]
+    assert json.loads(gzip.decompress(response.content))['count'] == 10
+
+
+@pytest.mark.django_db
+def test_product_list_falls_back_to_serializer_data_when_disabled(category, settings):
+    settings.PRODUCT_CACHE_RENDERED = False
+    client = APIClient()
+    Product.objects.create(category=category, name="Phone", price=100, in_stock=5)
+
+    client.get('/api/products/')
+    response = client.get('/api/products/')
+
+    assert response["X-Cache"] == "HIT"
+    assert response.data['count'] == 1
+
+
+"""Tests for conditional GET on products and categories."""
+@pytest.mark.django_db
+def test_product_detail_returns_304_for_matching_etag(category):
+    client = APIClient()
+    product = Product.objects.create(category=category, name="Phone", price=100, in_stock=5)
+
+    first = client.get(f'/api/products/{product.id}')
+    response = client.get(f'/api/products/{product.id}', HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response["ETag"] == first["ETag"]
+    assert "Last-Modified" in first
+
+
+@pytest.mark.django_db
+def test_product_list_etag_changes_after_update(category):
+    client = APIClient()
+    product = Product.objects.create(category=category, name="Phone", price=100, in_stock=5)
+    etag = client.get('/api/products/')["ETag"]
+
+    product.name = "Smart Phone"
+    product.save()
+    ProductListCreateView.cache_manager.invalidate()
+
+    response = client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_category_list_conditional_get(category):
+    client = APIClient()
+
+    first = client.get('/api/products/categories')
+    assert first.status_code == 200
+
+    not_modified = client.get('/api/products/categories', HTTP_IF_NONE_MATCH=first["ETag"])
+    assert not_modified.status_code == 304
+
+    Category.objects.create(name="Fashion")
+    modified = client.get('/api/products/categories', HTTP_IF_NONE_MATCH=first["ETag"])
+    assert modified.status_code == 200
+    assert modified.data['count'] == 2
+
+
+@pytest.mark.django_db
+def test_category_list_etag_changes_when_category_is_edited(category):
+    client = APIClient()
+    first = client.get('/api/products/categories')
+
+    category.description = "Phones and laptops"
+    category.save()
+
+    response = client.get('/api/products/categories', HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 200
+    assert response.data['results'][0]['description'] == "Phones and laptops"
+
+
+"""Tests for keyset (cursor) pagination on the product list."""
+@pytest.mark.django_db
+def test_product_list_keyset_pagination_walks_all_pages(category):
+    client = APIClient()
+    for i in range(5):
+        Product.objects.create(category=category, name=f"Phone {i}", price=100 + (i % 2), in_stock=5)
+
+    seen = []
+    response = client.get('/api/products/', {'cursor': '', 'page_size': 2, 'ordering': 'price'})
+    while True:
+        body = response.json()
+        assert 'count' not in body
+        seen.extend(item['id'] for item in body['results'])
+        if not body['next']:
+            break
+        response = client.get(body['next'])
+
+    expected = list(Product.objects.order_by('price', 'id').values_list('id', flat=True))
+    assert seen == [str(pk) for pk in expected]
+
+
+@pytest.mark.django_db
+def test_product_list_keyset_previous_link_returns_prior_page(category):
+    client = APIClient()
+    for i in range(5):
+        Product.objects.create(category=category, name=f"Phone {i}", price=100, in_stock=5)
+
+    first = client.get('/api/products/', {'cursor': '', 'page_size': 2}).json()
+    assert first['previous'] is None
+    second = client.get(first['next']).json()
+    back = client.get(second['previous']).json()
+
+    assert [item['id'] for item in back['results']] == [item['id'] for item in first['results']]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("first, second", [({'cursor': ''}, {}), ({}, {'cursor': ''})])
+def test_product_list_caches_keyset_and_page_modes_apart(category, first, second):
+    client = APIClient()
+    Product.objects.create(category=category, name="Kettle", price=10, in_stock=5)
+
+    client.get('/api/products/', first)
+    response = client.get('/api/products/', second)
+
+    assert response["X-Cache"] == "MISS"
+    assert ('count' in response.json()) == ('cursor' not in second)
+
+
+@pytest.mark.django_db
+def test_product_search_keeps_relevance_order_with_cursor(category):
+    named = Product.objects.create(category=category, name="Kettle", price=10, in_stock=5)
+    described = Product.objects.create(category=category, name="Jug", description="Pairs with a kettle", price=10, in_stock=5)
+
+    body = APIClient().get('/api/products/', {'search': 'kettle', 'cursor': ''}).json()
+
+    assert 'count' in body
+    assert [item['id'] for item in body['results']] == [str(named.id), str(described.id)]
+
+
+@pytest.mark.django_db
+def test_product_list_keyset_rejects_invalid_cursor(category):
+    client = APIClient()
+    response = client.get('/api/products/', {'cursor': 'not-a-cursor'})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("ordering, cursor", [
+    ('-created_at', {'v': '2024-01-01T00:00:00+00:00', 'id': 'not-a-uuid'}),
+    ('-created_at', {'v': 'yesterday', 'id': '6f1c1d6e-8e1b-4f4b-9b1a-2f0f4c1d2e3a'}),
+    ('price', {'v': 'cheap', 'id': '6f1c1d6e-8e1b-4f4b-9b1a-2f0f4c1d2e3a'}),
+    ('rating', {'v': None, 'id': '6f1c1d6e-8e1b-4f4b-9b1a-2f0f4c1d2e3a'}),
+])
+def test_product_list_keyset_rejects_cursor_with_invalid_values(category, ordering, cursor):
+    import json
+    from base64 import b64encode
+
+    Product.objects.create(category=category, name="Kettle", price=10, in_stock=5)
+    encoded = b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+    response = APIClient().get('/api/products/', {'cursor': encoded, 'ordering': ordering})
+    assert response.status_code == 404
+
+
+"""Tests for cached / estimated pagination counts."""
+@pytest.mark.django_db
+def test_cached_count_paginator_runs_count_once(category, django_assert_num_queries):
+    from common.pagination import CachedCountPaginator
+
+    Product.objects.create(category=category, name="Phone", price=100, in_stock=5)
+    queryset = Product.objects.filter(is_published=True)
+
+    with django_assert_num_queries(1):
+        assert CachedCountPaginator(queryset, 20).count == 1
+    with django_assert_num_queries(0):
+        paginator = CachedCountPaginator(queryset, 20)
+        assert paginator.count == 1
+        assert paginator.count_is_exact
+
+
+@pytest.mark.django_db
+def test_cached_count_key_ignores_request_time_price_annotation(category):
+    from datetime import timedelta
+    from django.utils import timezone
+    from common.pagination import CachedCountPaginator
+    from products.pricing import annotate_final_price
+
+    queryset = Product.objects.filter(is_published=True)
+    now = timezone.now()
+    first = CachedCountPaginator(annotate_final_price(queryset, now), 20)
+    later = CachedCountPaginator(annotate_final_price(queryset, now + timedelta(seconds=1)), 20)
+    other = CachedCountPaginator(annotate_final_price(queryset.filter(brand="Tecno"), now), 20)
+
+    assert first.get_count_cache_key() == later.get_count_cache_key()
+    assert first.get_count_cache_key() != other.get_count_cache_key()
+
+
+@pytest.mark.django_db
+def test_cached_count_paginator_uses_estimate_above_threshold(category, settings, monkeypatch):
+    from django.db import connections
+    from common import pagination
+
+    settings.COUNT_ESTIMATE_THRESHOLD = 1000
+    monkeypatch.setattr(connections['default'], 'vendor', 'postgresql')
+    monkeypatch.setattr(pagination, 'estimate_count', lambda queryset: 250000)
+
+    paginator = pagination.CachedCountPaginator(Product.objects.all(), 20)
+    assert paginator.count == 250000
+    assert paginator.count_is_exact is False
+
+
+@pytest.mark.django_db
+def test_product_list_reports_count_exactness_and_refreshes_after_create(category):
+    from authentication.models import User
+
+    client = APIClient()
+    Product.objects.create(category=category, name="Phone", price=100, in_stock=5)
+
+    body = client.get('/api/products/').json()
+    assert body['count'] == 1
+    assert body['count_is_exact'] is True
+
+    admin = User.objects.create_user(email='admin@example.com', username='admin', password='testpass', is_staff=True)
+    client.force_authenticate(user=admin)
+    response = client.post('/api/products/', {"name": "Laptop", "price": "300.00", "category": str(category.id)}, format='json')
+    assert response.status_code == 201
+    client.force_authenticate(user=None)
+
+    assert client.get('/api/products/').json()['count'] == 2
+
+
+"""Tests for full-text product search."""
+@pytest.mark.django_db
+def test_search_ranks_name_matches_above_description_matches(category):
+    client = APIClient()
+    Product.objects.create(category=category, name="Blender", description="Pairs well with a Samsung phone", price=10, in_stock=5)
+    Product.objects.create(category=category, name="Samsung Galaxy", price=500, in_stock=5)
+
+    results = client.get('/api/products/', {'search': 'samsung'}).json()['results']
+
+    assert [item['name'] for item in results] == ["Samsung Galaxy", "Blender"]
+    assert 'search_vector' not in results[0]
+
+
+@pytest.mark.django_db
+def test_search_matches_prefixes_across_fields(category):
+    client = APIClient()
+    Product.objects.create(category=category, name="Galaxy S23", brand="Samsung", price=500, in_stock=5)
+    Product.objects.create(category=category, name="Spark 10", brand="Tecno", price=100, in_stock=5)
+
+    results = client.get('/api/products/', {'search': 'sams gal'}).json()['results']
+    assert [item['name'] for item in results] == ["Galaxy S23"]
+
+    results = client.get('/api/products/', {'search': 'electro'}).json()['results']
+    assert len(results) == 2
+
+
+@pytest.mark.django_db
+def test_search_index_follows_updates_and_category_renames(category):
+    client = APIClient()
+    product = Product.objects.create(category=category, name="Old Name", price=10, in_stock=5)
+
+    product.name = "Kettle"
+    product.save()
+    category.name = "Kitchen"
+    category.save()
+
+    assert client.get('/api/products/', {'search': 'kettle'}).json()['count'] == 1
+    assert client.get('/api/products/', {'search': 'old'}).json()['count'] == 0
+    assert client.get('/api/products/', {'search': 'kitchen'}).json()['count'] == 1
+
+
+"""Tests for typeahead suggestions."""
+@pytest.mark.django_db
+def test_suggest_returns_top_products_and_categories_by_prefix(category):
+    client = APIClient()
+    Product.objects.create(category=category, name="Samsung Galaxy S23", brand="Samsung", rating=4.8, price=500, in_stock=5)
+    Product.objects.create(category=category, name="Samsung Galaxy A14", brand="Samsung", rating=4.1, price=200, in_stock=5)
+    Product.objects.create(category=category, name="Samsung Draft", brand="Samsung", price=1, in_stock=5, is_published=False)
+    Product.objects.create(category=category, name="Tecno Spark", brand="Tecno", price=100, in_stock=5)
+
+    body = client.get('/api/products/suggest', {'q': 'sam gal'}).json()
+
+    assert [item['name'] for item in body['products']] == ["Samsung Galaxy S23", "Samsung Galaxy A14"]
+    assert client.get('/api/products/suggest', {'q': 'elec'}).json()['categories'][0]['name'] == "Electronics"
+    assert client.get('/api/products/suggest', {'q': 'sam', 'limit': 1}).json()['products'][0]['name'] == "Samsung Galaxy S23"
+
+
+@pytest.mark.django_db
+def test_suggest_does_not_query_database_once_built(category, django_assert_num_queries):
+    client = APIClient()
+    Product.objects.create(category=category, name="Samsung Galaxy", price=500, in_stock=5)
+    client.get('/api/products/suggest', {'q': 's'})
+
+    with django_assert_num_queries(0):
+        response = client.get('/api/products/suggest', {'q': 'sams'})
+    assert response.json()['products'][0]['name'] == "Samsung Galaxy"
+
+
+@pytest.mark.django_db
+def test_suggest_index_follows_product_saves_and_deletes(category):
+    client = APIClient()
+    product = Product.objects.create(category=category, name="Kettle", price=10, in_stock=5)
+    assert client.get('/api/products/suggest', {'q': 'ket'}).json()['products']
+
+    product.name = "Toaster"
+    product.save()
+    assert not client.get('/api/products/suggest', {'q': 'ket'}).json()['products']
+    assert client.get('/api/products/suggest', {'q': 'toa'}).json()['products']
+
+    product.delete()
+    assert not client.get('/api/products/suggest', {'q': 'toa'}).json()['products']
+
+
+@pytest.mark.django_db
+def test_suggest_applies_writes_without_rebuilding(category, django_assert_num_queries, django_capture_on_commit_callbacks):
+    from products.suggest import suggestion_index
+    from products.utils.cache_manager import CacheManager
+
+    client = APIClient()
+    client.get('/api/products/suggest', {'q': 's'})
+    with django_capture_on_commit_callbacks(execute=True):
+        Product.objects.create(category=category, name="Samsung Galaxy", price=500, in_stock=5)
+    CacheManager(prefix="products").invalidate()
+
+    with django_assert_num_queries(0):
+        response = client.get('/api/products/suggest', {'q': 'sams'})
+    assert response.json()['products'][0]['name'] == "Samsung Galaxy"
+    assert suggestion_index.generation == suggestion_index.get_version()
+
+
+@pytest.mark.django_db
+def test_suggest_replays_writes_published_by_other_workers(category, django_assert_num_queries, django_capture_on_commit_callbacks):
+    from products.suggest import SuggestionIndex
+
+    other = SuggestionIndex()
+    other.build()
+    product = Product.objects.create(category=category, name="Kettle", price=10, in_stock=5)
+    with django_capture_on_commit_callbacks(execute=True):
+        product.name = "Toaster"
+        product.save()
+        Category.objects.create(name="Kitchen")
+
+    with django_assert_num_queries(2):
+        other.ensure_fresh()
+    assert other.search('toa')['products'][0]['id'] == str(product.pk)
+    assert other.search('kit')['categories'][0]['name'] == "Kitchen"
+    assert other.generation == other.get_version()
+
+
+"""Tests for catalogue filters and facets."""
+@pytest.fixture
+def catalogue(category):
+    from datetime import timedelta
+    from django.utils import timezone
+
+    fashion = Category.objects.create(name="Fashion")
+    Product.objects.create(category=category, name="Galaxy", brand="Samsung", price=580000, rating=4.5, in_stock=3)
+    Product.objects.create(category=category, name="Spark", brand="Tecno", price=145000, rating=3.9, in_stock=0)
+    Product.objects.create(
+        category=category, name="Blender", brand="Binatone", price=28000, rating=4.0, in_stock=2,
+        flash_price=9000, flash_sale_ends_at=timezone.now() + timedelta(hours=1),
+    )
+    Product.objects.create(category=fashion, name="Runners", brand="Adidas", price=42000, rating=4.7, in_stock=8)
+    return {"electronics": category, "fashion": fashion}
+
+
+@pytest.mark.django_db
+def test_product_list_filters(catalogue):
+    client = APIClient()
+
+    def names(**params):
+        return sorted(item['name'] for item in client.get('/api/products/', params).json()['results'])
+
+    assert names(category=str(catalogue['fashion'].id)) == ["Runners"]
+    assert names(brand="Samsung,Tecno") == ["Galaxy", "Spark"]
+    assert names(max_price=10000) == ["Blender"]
+    assert names(min_price=100000, max_price=200000) == ["Spark"]
+    assert names(in_stock="true", category=str(catalogue['electronics'].id)) == ["Blender", "Galaxy"]
+    assert names(min_rating=4.5) == ["Galaxy", "Runners"]
+
+
+@pytest.mark.django_db
+def test_product_list_rejects_invalid_filter_values(catalogue):
+    client = APIClient()
+    assert client.get('/api/products/', {'min_price': 'cheap'}).status_code == 400
+    assert client.get('/api/products/', {'category': 'nope'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_product_list_facets_in_one_query(catalogue, django_assert_max_num_queries):
+    from products.filters import compute_facets
+
+    with django_assert_max_num_queries(1):
+        facets = compute_facets(Product.objects.filter(is_published=True))
+
+    assert facets['categories'][0] == {'id': str(catalogue['electronics'].id), 'name': "Electronics", 'count': 3}
+    assert {'name': "Samsung", 'count': 1} in facets['brands']
+    assert {'range': "0-10000", 'count': 1} in facets['price_ranges']
+    assert {'range': "500000+", 'count': 1} in facets['price_ranges']
+
+    body = APIClient().get('/api/products/', {'facets': 'true', 'in_stock': 'true'}).json()
+    assert sum(item['count'] for item in body['facets']['categories']) == 3
+
+
+"""Tests for the compact list serializer and sparse fieldsets."""
+@pytest.mark.django_db
+def test_product_list_uses_compact_serializer(category, django_assert_max_num_queries):
+    client = APIClient()
+    for i in range(5):
+        Product.objects.create(category=category, name=f"Phone {i}", description="long text", price=100, in_stock=5)
+
+    # One query for the page, one for the count
+    with django_assert_max_num_queries(2):
+        item = client.get('/api/products/').json()['results'][0]
+
+    assert set(item) == {'id', 'name', 'price', 'final_price', 'brand', 'rating', 'category_name'}
+    assert item['category_name'] == "Electronics"
+
+
+@pytest.mark.django_db
+def test_product_list_sparse_fieldsets(category):
+    client = APIClient()
+    Product.objects.create(category=category, name="Phone", description="long text", price=100, in_stock=5)
+
+    item = client.get('/api/products/', {'fields': 'id,name'}).json()['results'][0]
+    assert set(item) == {'id', 'name'}
+
+    item = client.get('/api/products/', {'fields': 'name,description,category_detail'}).json()['results'][0]
+    assert set(item) == {'name', 'description', 'category_detail'}
+    assert item['category_detail']['name'] == "Electronics"
+
+    assert client.get('/api/products/', {'fields': 'name,secret'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_product_list_only_loads_needed_columns(category):
+    from products.views import ProductListCreateView
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.request import Request
+
+    view = ProductListCreateView()
+    view.request = Request(APIRequestFactory().get('/api/products/', {'fields': 'id,name'}))
+    view.format_kwarg = None
+
+    deferred = view.get_queryset().query.deferred_loading
+    assert set(deferred[0]) == {'id', 'name', 'created_at', 'price', 'rating', 'flash_sale_ends_at'}
+    assert deferred[1] is False
+
+
+"""Tests for query counts of the product endpoints."""
+@pytest.mark.django_db
+def test_product_list_full_fields_query_count_is_constant(category, django_assert_max_num_queries):
+    client = APIClient()
+    for i in range(10):
+        Product.objects.create(category=category, name=f"Phone {i}", price=100, in_stock=5)
+
+    # Page and count, whatever the page size
+    with django_assert_max_num_queries(2):
+        results = client.get('/api/products/', {'fields': 'id,name,category_detail'}).json()['results']
+    assert len(results) == 10
+    assert results[0]['category_detail']['name'] == "Electronics"
+
+
+@pytest.mark.django_db
+def test_product_detail_loads_category_in_same_query(category, django_assert_num_queries):
+    product = Product.objects.create(category=category, name="Phone", price=100, in_stock=5)
+
+    with django_assert_num_queries(1):
+        response = APIClient().get(f'/api/products/{product.id}')
+    assert response.json()['category_detail']['name'] == "Electronics"
+
+
+@pytest.mark.django_db
+def test_unpublished_products_are_listed_for_staff_only(category):
+    Product.objects.create(category=category, name="Draft", price=100, in_stock=5, is_published=False)
+    staff = User.objects.create_user(email='staff@example.com', username='staff', password='pass', is_staff=True)
+
+    assert APIClient().get('/api/products/').json()['count'] == 0
+
+    client = APIClient()
+    client.force_authenticate(user=staff)
+    assert client.get('/api/products/').json()['count'] == 1
+
+
+"""Tests for the shared pricing module."""
+@pytest.mark.django_db
+def test_product_list_reports_flash_price(catalogue):
+    results = APIClient().get('/api/products/', {'fields': 'name,price,final_price'}).json()['results']
+    prices = {item['name']: item['final_price'] for item in results}
+    assert prices['Blender'] == "9000.00"
+    assert prices['Galaxy'] == "580000.00"
+
+
+@pytest.mark.django_db
+def test_effective_prices_are_cached_until_the_flash_sale_ends(category, settings, monkeypatch):
+    from datetime import timedelta
+    from decimal import Decimal
+    from django.utils import timezone
+    from products import pricing
+
+    settings.PRICE_CACHE_TIMEOUT = 300
+    now = timezone.now()
+    sale = Product.objects.create(
+        category=category, name="Iron", price=50, in_stock=3,
+        flash_price=30, flash_sale_ends_at=now + timedelta(seconds=45),
+    )
+    plain = Product.objects.create(category=category, name="Fan", price=20, in_stock=3)
+
+    timeouts = {}
+    real_set = pricing.cache.set
+
+    def recording_set(key, value, timeout):
+        timeouts[key] = timeout
+        real_set(key, value, timeout)
+
+    monkeypatch.setattr(pricing.cache, 'set', recording_set)
+
+    prices = pricing.effective_prices([sale.pk, plain.pk], now)
+    assert prices == {sale.pk: Decimal("30.00"), plain.pk: Decimal("20.00")}
+    assert timeouts == {pricing.price_cache_key(sale.pk): 45, pricing.price_cache_key(plain.pk): 300}
+
+
+@pytest.mark.django_db
+def test_effective_prices_are_served_from_cache_and_invalidated_on_save(category, django_assert_num_queries):
+    from decimal import Decimal
+    from products.pricing import effective_prices
+
+    product = Product.objects.create(category=category, name="Iron", price=50, in_stock=3)
+    effective_prices([product.pk])
+    with django_assert_num_queries(0):
+        assert effective_prices([product.pk]) == {product.pk: Decimal("50.00")}
+
+    product.price = 60
+    product.save()
+    assert effective_prices([product.pk]) == {product.pk: Decimal("60.00")}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("path", ["/api/products/", "detail"])
+def test_cached_product_responses_expire_when_a_flash_sale_ends(category, monkeypatch, path):
+    from datetime import timedelta
+    from django.utils import timezone
+
+    product = Product.objects.create(
+        category=category, name="Blender", price=100, in_stock=3,
+        flash_price=60, flash_sale_ends_at=timezone.now() + timedelta(seconds=60),
+    )
+    url = f"/api/products/{product.id}" if path == "detail" else path
+
+    def final_price():
+        data = APIClient().get(url).json()
+        return (data if path == "detail" else data['results'][0])['final_price']
+
+    assert final_price() == "60.00"
+
+    # The sale ends without a product write to invalidate anything
+    Product.objects.filter(pk=product.pk).update(flash_sale_ends_at=timezone.now() - timedelta(seconds=1))
+    assert final_price() == "60.00"
+
+    real_time = time.time
+    monkeypatch.setattr(time, 'time', lambda: real_time() + 61)
+    assert final_price() == "100.00"
+
+
+@pytest.mark.django_db
+def test_cached_price_facets_expire_when_a_flash_sale_ends(category, monkeypatch):
+    from datetime import timedelta
+    from django.utils import timezone
+
+    product = Product.objects.create(
+        category=category, name="Blender", price=20000, in_stock=3,
+        flash_price=5000, flash_sale_ends_at=timezone.now() + timedelta(seconds=60),
+    )
+
+    def price_ranges(params):
+        ranges = APIClient().get('/api/products/', {'facets': 'true', **params}).json()['facets']['price_ranges']
+        return [item for item in ranges if item['count']]
+
+    assert price_ranges({}) == [{'range': "0-10000", 'count': 1}]
+
+    Product.objects.filter(pk=product.pk).update(flash_sale_ends_at=timezone.now() - timedelta(seconds=1))
+    real_time = time.time
+    monkeypatch.setattr(time, 'time', lambda: real_time() + 61)
+    # A different page recomputes the list entry but shares the facet entry
+    assert price_ranges({'page_size': 5}) == [{'range': "10000-50000", 'count': 1}]
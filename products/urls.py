@@ -3,6 +3,7 @@ from .views import (
     CategoryListCreateView,
     ProductListCreateView,
     ProductDetailView,
+    ProductSuggestView,
     AdminProductViewSet
 )
 
@@ -11,7 +12,9 @@ app_name = 'products'
 urlpatterns = [
     path('categories', CategoryListCreateView.as_view()),
     path('', ProductListCreateView.as_view()),
+    path('suggest', ProductSuggestView.as_view(), name='product-suggest'),
     path('<uuid:pk>', ProductDetailView.as_view()),
+    path('admin-products/cache-stats', AdminProductViewSet.as_view({'get': 'cache_stats'}), name="admin-product-cache-stats"),
     path('admin-products/seed', AdminProductViewSet.as_view({'post': 'seed'}), name="seed-admin-products"),
     path('admin-products/<uuid:pk>/publish', AdminProductViewSet.as_view({'post': 'publish'}), name="admin-publish-product"),
     path('admin-products/<uuid:pk>/unpublish', AdminProductViewSet.as_view({'post': 'unpublish'}), name="admin-unpublish-product"),
@@ -1,46 +1,320 @@
 from django.core.cache import cache
+from collections import OrderedDict
+from urllib.parse import urlencode
+import hashlib
+import math
+import random
+import threading
+import time
 
 import logging
 
 logger = logging.getLogger(__name__)
 logger.info("Cache HIT for key xyz")
 
+# Memcached rejects keys longer than 250 chars, keep well below that
+MAX_KEY_LENGTH = 200
+
+
+def normalize_query_params(query_params, allowed=None, defaults=None):
+    """
+    Returns a canonical, sorted list of (key, value) pairs for a QueryDict or dict.
+    A repeated key keeps only its last value, the one QueryDict.get (and so DRF) reads.
+
+    allowed: iterable - only these params take part in the key, anything else (e.g. cache busters) is ignored
+    defaults: dict - params whose value equals the default are dropped, so `?page=1` and `` share an entry
+    """
+    defaults = defaults or {}
+    if hasattr(query_params, "lists"):
+        items = query_params.lists()
+    else:
+        items = ((k, v if isinstance(v, (list, tuple)) else [v]) for k, v in query_params.items())
+
+    normalized = []
+    for key, values in items:
+        if allowed is not None and key not in allowed:
+            continue
+        if not values:
+            continue
+        value = " ".join(str(values[-1]).split())
+        if value == "" or value == str(defaults.get(key, "")):
+            continue
+        normalized.append((key, value))
+    return sorted(normalized)
+
+
+def build_query_identifier(base, query_params, allowed=None, defaults=None):
+    """
+    Builds a cache identifier for a list endpoint, e.g. `public_list_3f2a...`.
+    The normalized query string is hashed so every filter/search/ordering combination
+    gets its own entry while the key length stays bounded.
+    """
+    params = normalize_query_params(query_params, allowed=allowed, defaults=defaults)
+    if not params:
+        return base
+    digest = hashlib.sha256(urlencode(params).encode("utf-8")).hexdigest()[:32]
+    return f"{base}_{digest}"
+
+
+class Expiring:
+    """
+    A computed value whose cache entry must expire sooner than the manager's timeout
+    (e.g. when a flash sale shown in it ends). A `timeout` of None keeps the default.
+    """
+
+    def __init__(self, value, timeout=None):
+        self.value = value
+        self.timeout = timeout
+
+
+class LocalLRUCache:
+    """
+    Bounded, TTL-aware LRU held in the worker process memory (the L1 tier in front of Redis).
+    """
+
+    def __init__(self, max_entries=256, timeout=30):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[1] <= time.time():
+                if item is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, expires_at=None):
+        expires_at = min(expires_at or math.inf, time.time() + self.timeout)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class CacheManager:
-    def __init__(self, prefix, timeout=300):
+    def __init__(self, prefix, timeout=300, stale_timeout=None, lock_timeout=10, beta=1.0,
+                 local_max_entries=0, local_timeout=30):
         """
         prefix: str - cache key prefix for namespace separation (e.g., 'products', 'categories')
         timeout: int - cache TTL in seconds
+        stale_timeout: int - how long an expired entry is kept around to be served while it is refreshed (defaults to timeout)
+        lock_timeout: int - lifetime in seconds of the recompute lock taken by get_or_compute
+        beta: float - probabilistic early refresh factor for get_or_compute, 0 disables it
+        local_max_entries: int - size of the per-process L1 LRU in front of the shared cache, 0 disables it
+        local_timeout: int - upper bound in seconds on how long an entry lives in L1
         """
         self.prefix = prefix
         self.timeout = timeout
+        self.stale_timeout = timeout if stale_timeout is None else stale_timeout
+        self.lock_timeout = lock_timeout
+        self.beta = beta
+        self.local = LocalLRUCache(local_max_entries, local_timeout) if local_max_entries else None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version_key(self):
+        return f"{self.prefix}_generation"
+
+    def get_version(self):
+        """
+        Returns the current generation of the namespace. Every key embeds it, so bumping
+        the generation makes all existing entries unreachable; they then age out via TTL.
+        """
+        version = cache.get(self.version_key)
+        if version is None:
+            # Seed from the clock so a counter lost to eviction never reuses an old generation
+            cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = cache.get(self.version_key)
+        return version
 
     def get_cache_key(self, identifier):
         """
-        Returns a fully qualified cache key based on prefix and identifier (e.g., page number, user role)
+        Returns a fully qualified cache key based on prefix, generation and identifier (e.g., page number, user role)
+        """
+        namespace = f"{self.prefix}_v{self.get_version()}"
+        key = f"{namespace}_{identifier}"
+        if len(key) > MAX_KEY_LENGTH:
+            key = f"{namespace}_{hashlib.sha256(str(identifier).encode('utf-8')).hexdigest()}"
+        return key
+
+    def build_identifier(self, base, query_params, allowed=None, defaults=None):
+        """
+        Returns a query-aware identifier, see build_query_identifier
+        """
+        return build_query_identifier(base, query_params, allowed=allowed, defaults=defaults)
+
+    def _read(self, key):
+        """
+        Returns the cached entry for a key. Entries are stored as dicts holding the value,
+        its logical expiry and how long it took to compute.
+        """
+        entry = cache.get(key)
+        if isinstance(entry, dict) and "value" in entry and "expires_at" in entry:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def _write(self, key, data, delta=0.0):
+        timeout, stale_timeout = self.timeout, self.stale_timeout
+        if isinstance(data, Expiring):
+            if data.timeout is not None and data.timeout < timeout:
+                # A capped entry must not be served at all past its deadline, not even stale
+                timeout, stale_timeout = max(int(data.timeout), 1), 0
+            data = data.value
+
+        entry = {"value": data, "expires_at": time.time() + timeout, "delta": delta}
+        # The physical TTL outlives the logical one so a stale copy can be served during refresh
+        cache.set(key, entry, timeout=timeout + stale_timeout)
+        self._remember(key, entry)
+        logger.info(f"Cache SET: {key} for {timeout} seconds")
+        return data
+
+    def _remember(self, key, entry):
+        """
+        Copies a fresh entry into L1. L1 keys embed the generation, so a namespace invalidation
+        in any worker makes every other worker's L1 copies unreachable on their next lookup.
         """
-        return f"{self.prefix}_{identifier}"
+        if self.local is not None and time.time() < entry["expires_at"]:
+            self.local.set(key, entry["value"], expires_at=entry["expires_at"])
+
+    def stats(self):
+        """
+        Returns hit/miss counters per tier for this process, used to size the L1 tier.
+        """
+        stats = {"l2": {"hits": self.hits, "misses": self.misses}}
+        if self.local is not None:
+            stats["l1"] = {
+                "hits": self.local.hits,
+                "misses": self.local.misses,
+                "size": len(self.local),
+                "max_entries": self.local.max_entries,
+            }
+        return stats
+
+    def _should_refresh(self, entry):
+        """
+        Probabilistic early expiration (XFetch): the closer an entry is to expiry and the more
+        expensive it was to compute, the more likely a request refreshes it ahead of time.
+        """
+        now = time.time()
+        if now >= entry["expires_at"]:
+            return True
+        if not self.beta or not entry.get("delta"):
+            return False
+        return now - entry["delta"] * self.beta * math.log(1.0 - random.random()) >= entry["expires_at"]
 
     def get(self, identifier):
         key = self.get_cache_key(identifier)
-        data = cache.get(key)
-        if data:
+        if self.local is not None:
+            data = self.local.get(key)
+            if data is not None:
+                return data
+
+        entry = self._read(key)
+        if entry and time.time() < entry["expires_at"]:
             logger.info(f"Cache HIT: {key}")
-        else:
-            logger.info(f"Cache MISS: {key}")
-        return data
+            self._remember(key, entry)
+            return entry["value"]
+        logger.info(f"Cache MISS: {key}")
+        return None
 
     def set(self, identifier, data):
+        self._write(self.get_cache_key(identifier), data)
+
+    def get_or_compute(self, identifier, compute, wait=2.0):
+        """
+        Returns (data, status) for an identifier, where status is "HIT", "STALE" or "MISS".
+        `compute` may wrap its result in Expiring to cache it for less than `timeout`.
+
+        Only one worker recomputes an expired or missing entry: the recompute lock is a
+        cache.add (SET NX on Redis, atomic on locmem). Other workers serve the stale copy, or
+        when there is none, wait up to `wait` seconds for the lock holder before computing themselves.
+        """
         key = self.get_cache_key(identifier)
-        cache.set(key, data, timeout=self.timeout)
-        logger.info(f"Cache SET: {key} for {self.timeout} seconds")
+        if self.local is not None:
+            data = self.local.get(key)
+            if data is not None:
+                return data, "HIT"
+
+        lock_key = f"{key}_lock"
+        entry = self._read(key)
+
+        if entry and not self._should_refresh(entry):
+            logger.info(f"Cache HIT: {key}")
+            self._remember(key, entry)
+            return entry["value"], "HIT"
 
-    def invalidate(self):
+        if not cache.add(lock_key, 1, timeout=self.lock_timeout):
+            if entry:
+                status = "HIT" if time.time() < entry["expires_at"] else "STALE"
+                logger.info(f"Cache {status}: {key} (refresh in progress)")
+                return entry["value"], status
+
+            deadline = time.monotonic() + wait
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = self._read(key)
+                if entry:
+                    logger.info(f"Cache HIT: {key} (after wait)")
+                    return entry["value"], "HIT"
+            logger.info(f"Cache MISS: {key} (lock wait timed out)")
+            data = compute()
+            return (data.value if isinstance(data, Expiring) else data), "MISS"
+
+        try:
+            logger.info(f"Cache MISS: {key}")
+            started = time.monotonic()
+            data = self._write(key, compute(), delta=time.monotonic() - started)
+        finally:
+            cache.delete(lock_key)
+        return data, "MISS"
+
+    def invalidate(self, identifier=None):
         """
-        Deletes all keys with the current prefix.
+        Invalidates a single entry when an identifier is given, otherwise the whole namespace
+        by bumping its generation (a single INCR, no keyspace scan).
+
+        With the L1 tier enabled, a single-entry invalidation only evicts this worker's L1
+        copy: other workers keep serving theirs for up to `local_timeout` seconds. Writes
+        that must be visible everywhere at once invalidate the namespace instead.
         """
-        pattern = f"{self.prefix}_*"
+        if identifier is not None:
+            key = self.get_cache_key(identifier)
+            cache.delete(key)
+            if self.local is not None:
+                self.local.delete(key)
+            logger.info(f"Cache INVALIDATED: {key}")
+            return
+
         try:
-            cache.delete_pattern(pattern)
-            logger.info(f"Cache INVALIDATED for pattern: {pattern}")
-        except NotImplementedError:
-            logger.warning("Cache backend does not support delete_pattern. Manual invalidation needed.")
+            version = cache.incr(self.version_key)
+        except ValueError:
+            # Counter missing (never read or evicted), start a fresh generation
+            version = time.time_ns()
+            cache.set(self.version_key, version, timeout=None)
+        if self.local is not None:
+            self.local.clear()
+        logger.info(f"Cache INVALIDATED namespace: {self.prefix} (generation {version})")
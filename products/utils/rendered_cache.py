@@ -0,0 +1,56 @@
+from rest_framework.renderers import JSONRenderer
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+import gzip
+import hashlib
+import time
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 512
+
+
+def render_payload(data, last_modified=None):
+    """
+    Renders response data once into the form that is cached: the JSON body, an optional
+    gzip copy of it, a stable ETag derived from the body and a Last-Modified timestamp
+    (the given datetime, or the render time for lists).
+    """
+    body = JSONRenderer().render(data)
+    compressed = None
+    if len(body) >= GZIP_MIN_SIZE:
+        # mtime=0 keeps the compressed bytes identical across workers
+        compressed = gzip.compress(body, compresslevel=6, mtime=0)
+    return {
+        "body": body,
+        "gzip": compressed,
+        "etag": f'"{hashlib.sha1(body).hexdigest()}"',
+        "last_modified": int(last_modified.timestamp()) if last_modified else int(time.time()),
+    }
+
+
+def rendered_response(payload, request, cache_status):
+    """
+    Builds an HttpResponse straight from a cached payload, skipping DRF rendering and content negotiation.
+    Answers 304 Not Modified when the client's If-None-Match / If-Modified-Since still matches.
+    """
+    not_modified = get_conditional_response(
+        request, etag=payload["etag"], last_modified=payload["last_modified"]
+    )
+    if not_modified is not None:
+        not_modified["ETag"] = payload["etag"]
+        not_modified["X-Cache"] = cache_status
+        return not_modified
+
+    accepts_gzip = "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+    if payload["gzip"] is not None and accepts_gzip:
+        response = HttpResponse(payload["gzip"], content_type="application/json")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(payload["body"], content_type="application/json")
+
+    response["ETag"] = payload["etag"]
+    response["Last-Modified"] = http_date(payload["last_modified"])
+    response["X-Cache"] = cache_status
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
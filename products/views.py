@@ -2,20 +2,31 @@ from rest_framework import generics, permissions, filters, status
 
 from authentication.models import User
 from .models import Product, Category
-from .serializers.serializers import ProductSerializer, CategorySerializer, AdminProductSerializer
+from .serializers.serializers import ProductSerializer, ProductListSerializer, CategorySerializer, AdminProductSerializer
 from drf_spectacular.utils import extend_schema
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from common.permissions import IsAdmin
+from common.conditional import ConditionalGetMixin
+from common.pagination import CachedCountPagination
+from common.serializers import parse_fields_param
 from django.conf import settings
+from django.utils import timezone
 from rest_framework.decorators import action
 from rest_framework import viewsets
-from .utils.cache_manager import CacheManager
+from .utils.cache_manager import CacheManager, Expiring
+from .utils.rendered_cache import render_payload, rendered_response
+from .pagination import KeysetPagination
+from .search import ProductSearchFilter
+from .filters import ProductFacetFilter, TRUE_VALUES, compute_facets
+from .pricing import annotate_final_price, flash_sale_timeout, queryset_flash_sale_timeout
+from .suggest import suggestion_index
+import os
 
 # Category List and Create
 @extend_schema(tags=["Products"])
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
@@ -29,22 +40,91 @@ class CategoryListCreateView(generics.ListCreateAPIView):
 @extend_schema(tags=["Products"])
 class ProductListCreateView(generics.ListCreateAPIView):
     serializer_class = ProductSerializer
+    pagination_class = CachedCountPagination
 
     # Filtering and searching
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [ProductFacetFilter, ProductSearchFilter, filters.OrderingFilter]
 
-    # Search fields for filtering
+    # Search fields for the SearchFilter fallback on databases without full-text support
     search_fields = ['name', 'brand', 'category__name']
     ordering_fields = ['price', 'rating', 'created_at']
 
     # Cache manager config for product list
     cache_manager = CacheManager(prefix="products", timeout=300)
 
+    # Query params that change the response and therefore take part in the cache key
+    cache_query_params = ['page', 'page_size', 'search', 'ordering', 'cursor', 'facets', 'fields', *ProductFacetFilter.filter_params]
+
+    # Columns always loaded on listings: ordering and keyset cursors read them, and the
+    # cached page must expire when a flash sale on it ends
+    list_base_columns = ['id', 'created_at', 'price', 'rating', 'flash_sale_ends_at']
+
+    def uses_keyset(self):
+        """
+        Keyset pagination when the client sends a `cursor` param (`?cursor=` for the first page),
+        page numbers otherwise. Searches always use page numbers: a keyset orders by a column,
+        which would replace the full-text relevance ranking.
+        """
+        params = self.request.query_params if self.request is not None else {}
+        return 'cursor' in params and not params.get('search', '').strip()
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.uses_keyset():
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+
+    def get_count_version(self):
+        return self.cache_manager.get_version()
+
     def get_queryset(self):
-        user = getattr(self.request, "user", None)
-        if user and user.is_authenticated and user.is_staff:
-            return Product.objects.all()
-        return Product.objects.filter(is_published=True)
+        queryset = Product.objects.visible_to(getattr(self.request, "user", None))
+        if self.request.method == "GET":
+            # Price the whole page in SQL against a single `now`
+            queryset = annotate_final_price(self.project_queryset(queryset), timezone.now())
+        return queryset
+
+    def get_serializer_class(self):
+        """
+        Listings use the compact serializer; `?fields=` naming anything outside it
+        selects from the full product serializer instead.
+        """
+        if self.request is None or self.request.method != "GET":
+            return ProductSerializer
+        fields = parse_fields_param(self.request)
+        if fields and not set(fields) <= set(ProductListSerializer.Meta.fields):
+            return ProductSerializer
+        return ProductListSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request is not None and self.request.method == "GET":
+            context['fields'] = parse_fields_param(self.request)
+        return context
+
+    def project_queryset(self, queryset):
+        """
+        Loads only the columns the serialized fields need.
+        """
+        serializer_class = self.get_serializer_class()
+        fields = parse_fields_param(self.request)
+        columns = list(self.list_base_columns)
+
+        if serializer_class is ProductListSerializer:
+            for name in fields or ProductListSerializer.Meta.fields:
+                columns += ProductListSerializer.columns[name]
+        else:
+            concrete = {field.name for field in Product._meta.concrete_fields}
+            columns += [name for name in fields if name in concrete]
+            if 'final_price' in fields:
+                columns += ['price']
+            if 'category_detail' in fields:
+                columns += ['category', 'category__id', 'category__name', 'category__description', 'category__created_at', 'category__updated_at']
+
+        return queryset.project(columns)
     
     def get_permissions(self):
         if self.request.method == "POST":
@@ -55,39 +135,92 @@ class ProductListCreateView(generics.ListCreateAPIView):
     def list(self, request, *args, **kwargs):
 
         user = request.user
-        page_number = request.query_params.get('page', '1')
-        identifier = f"products_staff_page_{page_number}" if (user.is_authenticated and user.is_staff) else f"products_public_page_{page_number}"
-
-        cached_data = self.cache_manager.get(identifier)
-        if cached_data:
-            response = Response(cached_data)
-            response["X-Cache"] = "HIT"
-            return response
+        scope = "staff" if (user.is_authenticated and user.is_staff) else "public"
+        # Both pagination modes share the other params (`?cursor=` is empty), so key them apart
+        mode = "keyset" if self.uses_keyset() else "list"
+        identifier = self.cache_manager.build_identifier(
+            f"products_{scope}_{mode}",
+            request.query_params,
+            allowed=self.cache_query_params,
+            defaults={'page': '1'},
+        )
 
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-        serializer = self.get_serializer(page, many=True)
-        data = serializer.data
+        def compute():
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            data = self.get_paginated_response(serializer.data).data
+            if request.query_params.get('facets', '').lower() in TRUE_VALUES:
+                data['facets'] = self.get_facets(request, queryset, scope)
+            # Flash prices on the page are only valid until the first of their sales ends
+            return Expiring(data, flash_sale_timeout(page, timezone.now()))
 
-        paginated_response = self.get_paginated_response(data)
+        def compute_payload():
+            result = compute()
+            return Expiring(render_payload(result.value), result.timeout)
 
-        self.cache_manager.set(identifier, paginated_response.data)
-        paginated_response["X-Cache"] = "MISS"
+        # Serve the cached, pre-rendered JSON body directly (stored under its own key so both modes never mix)
+        if settings.PRODUCT_CACHE_RENDERED:
+            payload, cache_status = self.cache_manager.get_or_compute(f"{identifier}_rendered", compute_payload)
+            return rendered_response(payload, request, cache_status)
 
-        return paginated_response
+        data, cache_status = self.cache_manager.get_or_compute(identifier, compute)
+        response = Response(data)
+        response["X-Cache"] = cache_status
+        return response
     
+    def get_facets(self, request, queryset, scope):
+        """
+        Facet counts only depend on the filters and search, not on paging or ordering,
+        so they are cached once per filter combination.
+        """
+        identifier = self.cache_manager.build_identifier(
+            f"products_{scope}_facets",
+            request.query_params,
+            allowed=['search', *ProductFacetFilter.filter_params],
+        )
+
+        def compute():
+            # Price buckets count flash prices, so the entry expires with the first sale to end
+            return Expiring(compute_facets(queryset), queryset_flash_sale_timeout(queryset, timezone.now()))
+
+        facets, _ = self.cache_manager.get_or_compute(identifier, compute)
+        return facets
+
     # invalidate cache to fetch latedt data from the DB
     def perform_create(self, serializer):
         serializer.save()
         self.cache_manager.invalidate()
 
 
+# Typeahead suggestions served from the in-process index
+@extend_schema(tags=["Products"])
+class ProductSuggestView(APIView):
+    permission_classes = [AllowAny]
+    max_limit = 25
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), self.max_limit)
+        except ValueError:
+            limit = 10
+
+        suggestion_index.ensure_fresh()
+        return Response({"query": query, **suggestion_index.search(query, limit=max(limit, 1))})
+
+
 # Product Detail for Admin
 @extend_schema(tags=["Products"])
 class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Product.objects.all()
+    queryset = Product.objects.with_category()
     serializer_class = ProductSerializer
-    cache_manager = CacheManager(prefix="products", timeout=300)
+    cache_manager = CacheManager(
+        prefix="products",
+        timeout=300,
+        local_max_entries=settings.PRODUCT_CACHE_LOCAL_ENTRIES,
+        local_timeout=settings.PRODUCT_CACHE_LOCAL_TIMEOUT,
+    )
 
     def get_permissions(self):
         if self.request.method in ["PUT", "PATCH", "DELETE"]:
@@ -98,34 +231,36 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
         product_id = self.kwargs.get(self.lookup_field or 'pk')
         cache_key = f"product_{product_id}"
 
-        cached_data = self.cache_manager.get(cache_key)
-        if cached_data:
-            response = Response(cached_data)
-            response["X-Cache"] = "HIT"
-            return response
+        def compute():
+            instance = self.get_object()
+            serializer = self.get_serializer(instance)
+            return Expiring(serializer.data, flash_sale_timeout([instance], timezone.now()))
 
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        data = serializer.data
+        def compute_payload():
+            instance = self.get_object()
+            serializer = self.get_serializer(instance)
+            return Expiring(
+                render_payload(serializer.data, last_modified=instance.updated_at),
+                flash_sale_timeout([instance], timezone.now()),
+            )
 
-        self.cache_manager.set(cache_key, data)
+        if settings.PRODUCT_CACHE_RENDERED:
+            payload, cache_status = self.cache_manager.get_or_compute(f"{cache_key}_rendered", compute_payload)
+            return rendered_response(payload, request, cache_status)
+
+        data, cache_status = self.cache_manager.get_or_compute(cache_key, compute)
         response = Response(data)
-        response["X-Cache"] = "MISS"
+        response["X-Cache"] = cache_status
         return response
 
+    # Product data also appears on the cached list pages, so the whole namespace is invalidated
     def perform_update(self, serializer):
-        instance = serializer.save()
-        # Invalidate cache for this product after update
-        product_id = instance.pk
-        cache_key = f"product_{product_id}"
-        self.cache_manager.invalidate(cache_key)
+        serializer.save()
+        self.cache_manager.invalidate()
 
     def perform_destroy(self, instance):
-        product_id = instance.pk
         instance.delete()
-        # Invalidate cache for this product after deletion
-        cache_key = f"product_{product_id}"
-        self.cache_manager.invalidate(cache_key)
+        self.cache_manager.invalidate()
 
 
 @extend_schema(tags=["Admin Management"])
@@ -133,12 +268,26 @@ class AdminProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = AdminProductSerializer
     permission_classes = [IsAdmin]
+    cache_manager = CacheManager(prefix="products", timeout=300)
+
+    def perform_create(self, serializer):
+        serializer.save()
+        self.cache_manager.invalidate()
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.cache_manager.invalidate()
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        self.cache_manager.invalidate()
 
     @action(detail=True, methods=["post"])
     def publish(self, request, pk=None):
         product = self.get_object()
         product.is_published = True
         product.save()
+        self.cache_manager.invalidate()
         return Response({"message": "Product published"})
 
     @action(detail=True, methods=["post"])
@@ -146,6 +295,7 @@ class AdminProductViewSet(viewsets.ModelViewSet):
         product = self.get_object()
         product.is_published = False
         product.save()
+        self.cache_manager.invalidate()
         return Response({"message": "Product unpublished"})
 
     @action(detail=False, methods=["post"])
@@ -184,4 +334,14 @@ class AdminProductViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=initial_data, many=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        return Response({"message": "Products seeded successfully"}, status=201)
\ No newline at end of file
+        self.cache_manager.invalidate()
+        return Response({"message": "Products seeded successfully"}, status=201)
+
+    @action(detail=False, methods=["get"], url_path="cache-stats")
+    def cache_stats(self, request):
+        # Hit/miss counters are per worker process, sample several requests to cover the pool
+        return Response({
+            "pid": os.getpid(),
+            "product_list": ProductListCreateView.cache_manager.stats(),
+            "product_detail": ProductDetailView.cache_manager.stats(),
+        })
\ No newline at end of file